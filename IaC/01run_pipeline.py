@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+========================================================================
+PIPELINE BEIRA MAR - ETL COMPLETO
+========================================================================
+Executa o pipeline como um DAG de etapas (ver orquestracao.py):
+
+    tratamento (RAW -> TRUSTED)
+      └─ refined (TRUSTED -> REFINED + modelagem estrela)
+           ├─ catalogo_refined ─ contagem_clinica_com_clima
+           └─ catalogo_estrela ─ contagem_dim_paciente, contagem_dim_data,
+                                 contagem_dim_bairro, contagem_dim_clima,
+                                 contagem_fato_consultas
+
+Não há crawler: a Lambda REFINED publica as tabelas no catálogo e as
+etapas catalogo_* só conferem que elas existem. As contagens do Athena
+rodam ao mesmo tempo e a espera por elas usa backoff exponencial com
+jitter.
+
+Cada etapa é pulada quando as suas entradas não mudaram desde a última
+execução bem-sucedida (ETags dos objetos lidos no S3 e, nas Lambdas, o
+código e as variáveis de ambiente da função); --forcar executa todas.
+O estado fica em .estado_pipeline.json.
+
+Com --backend local nada é enviado à AWS: o pipeline roda contra uma
+simulação em memória (ver backends_pipeline.py), útil para testar o
+orquestrador sem credenciais.
+
+Uso:
+    python3 01run_pipeline.py [--forcar] [--paralelismo 6]
+    python3 01run_pipeline.py --backend local [--simular-alteracao clima.csv]
+        [--simular-falha LambdaRefinedBeiraMar]
+========================================================================
+"""
+
+import argparse
+import sys
+
+import backends_pipeline
+import orquestracao
+
+LAMBDA_TRATAMENTO = 'LambdaTratamentoBeiraMar'
+LAMBDA_REFINED = 'LambdaRefinedBeiraMar'
+
+# Nomes criados pelo Terraform; nas Lambdas os buckets vêm das variáveis de ambiente
+BUCKETS = {
+    'raw': 'raw-beira-mar-2025',
+    'trusted': 'trusted-beira-mar-2025',
+    'refined': 'refined-beira-mar-2025',
+}
+BANCOS = {
+    'refined': 'refined_beira_mar',
+    'estrela': 'star_schema_beira_mar',
+}
+WORKGROUP = 'beira-mar-analytics'
+TABELAS_ESTRELA = ['dim_paciente', 'dim_data', 'dim_bairro', 'dim_clima', 'fato_consultas']
+
+ESTADO_PADRAO = {'aws': '.estado_pipeline.json', 'local': '.estado_pipeline_local.json'}
+
+
+def bucket(backend, funcao, zona):
+    """Bucket da zona configurado na Lambda (BUCKET_RAW, BUCKET_TRUSTED...)"""
+    variaveis = backend.configuracao_funcao(funcao)['variaveis']
+    return variaveis.get(f"BUCKET_{zona.upper()}", BUCKETS[zona])
+
+
+def executar_consulta(backend, sql, banco):
+    """Executa a consulta no Athena, aguardando com backoff, e devolve as linhas"""
+    execucao = backend.iniciar_consulta(sql, banco, WORKGROUP)
+
+    def verificar():
+        estado, motivo = backend.estado_consulta(execucao)
+        return (estado, motivo) if estado in ('SUCCEEDED', 'FAILED', 'CANCELLED') else None
+
+    estado, motivo = orquestracao.aguardar(verificar, sql, dormir=backend.dormir,
+                                           inicial_s=0.5, maximo_s=8.0, limite_s=300)
+    if estado != 'SUCCEEDED':
+        raise backends_pipeline.FalhaBackend(f"{sql}: {estado} ({motivo})")
+    return backend.resultado_consulta(execucao)
+
+
+# ------------------------------------------------------
+# Etapas
+# ------------------------------------------------------
+def entradas_tratamento(backend):
+    return orquestracao.impressao_digital(
+        backend.configuracao_funcao(LAMBDA_TRATAMENTO),
+        backend.listar_etags(bucket(backend, LAMBDA_TRATAMENTO, 'raw'))
+    )
+
+
+def entradas_refined(backend):
+    trusted = bucket(backend, LAMBDA_REFINED, 'trusted')
+    return orquestracao.impressao_digital(
+        backend.configuracao_funcao(LAMBDA_REFINED),
+        backend.listar_etags(trusted, 'clinica/'),
+        backend.listar_etags(trusted, 'clima/')
+    )
+
+
+def entradas_refined_prefixo(prefixo):
+    def entradas(backend):
+        return orquestracao.impressao_digital(
+            backend.listar_etags(bucket(backend, LAMBDA_REFINED, 'refined'), prefixo)
+        )
+    return entradas
+
+
+def invocar(funcao, campo_registros):
+    def executar(backend):
+        body = backend.invocar_lambda(funcao)
+        resumo = f"{body.get(campo_registros, 0):,} registros, {len(body.get('arquivos_gerados', []))} arquivos"
+        return {'resposta': body, 'resumo': resumo}
+    return executar
+
+
+def verificar_catalogo(banco, tabelas):
+    def executar(backend):
+        tipos = {tabela: backend.tipo_tabela(banco, tabela) for tabela in tabelas}
+        ausentes = {tabela: tipo or 'AUSENTE' for tabela, tipo in tipos.items() if tipo != 'EXTERNAL_TABLE'}
+        if ausentes:
+            raise backends_pipeline.FalhaBackend(f"tabelas não publicadas pela Lambda REFINED: {ausentes}")
+        return {'resumo': f"{len(tipos)} tabela(s) publicada(s) em {banco}"}
+    return executar
+
+
+def contar(banco, tabela):
+    def executar(backend):
+        linhas = executar_consulta(backend, f"SELECT COUNT(*) AS total FROM {banco}.{tabela}", banco)
+        total = int(linhas[0][0])
+        return {'total': total, 'resumo': f"{total:,} registros"}
+    return executar
+
+
+def montar_etapas():
+    Etapa = orquestracao.Etapa
+    etapas = [
+        Etapa('tratamento', invocar(LAMBDA_TRATAMENTO, 'registros_medicos'), entradas=entradas_tratamento,
+              descricao='Lambda RAW → TRUSTED'),
+        Etapa('refined', invocar(LAMBDA_REFINED, 'registros_totais'), depende_de=['tratamento'],
+              entradas=entradas_refined, descricao='Lambda TRUSTED → REFINED'),
+        Etapa('catalogo_refined', verificar_catalogo(BANCOS['refined'], ['clinica_com_clima']),
+              depende_de=['refined'], entradas=entradas_refined_prefixo('clinica_com_clima/'),
+              descricao='Catálogo da zona REFINED'),
+        Etapa('catalogo_estrela', verificar_catalogo(BANCOS['estrela'], TABELAS_ESTRELA), depende_de=['refined'],
+              entradas=entradas_refined_prefixo('star_schema/'), descricao='Catálogo da modelagem estrela'),
+        Etapa('contagem_clinica_com_clima', contar(BANCOS['refined'], 'clinica_com_clima'),
+              depende_de=['catalogo_refined'], entradas=entradas_refined_prefixo('clinica_com_clima/'),
+              descricao='Contagem clinica_com_clima'),
+    ]
+    for tabela in TABELAS_ESTRELA:
+        etapas.append(Etapa(
+            f"contagem_{tabela}", contar(BANCOS['estrela'], tabela), depende_de=['catalogo_estrela'],
+            entradas=entradas_refined_prefixo(f"star_schema/{tabela}/"), descricao=f"Contagem {tabela}"
+        ))
+    return etapas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backend', choices=['aws', 'local'], default='aws')
+    parser.add_argument('--estado', help='Arquivo de estado (padrão: .estado_pipeline.json; '
+                                         '.estado_pipeline_local.json com --backend local)')
+    parser.add_argument('--forcar', action='store_true', help='Executa todas as etapas, mesmo sem alterações')
+    parser.add_argument('--paralelismo', type=int, default=6, help='Etapas executadas ao mesmo tempo')
+    parser.add_argument('--simular-alteracao', action='append', default=[], metavar='CHAVE',
+                        help='(local) Arquivo da zona RAW alterado nesta execução')
+    parser.add_argument('--simular-falha', action='append', default=[], metavar='NOME',
+                        help='(local) Lambda ou tabela (nas consultas) que falha')
+    parser.add_argument('--escala-tempo', type=float, default=0.01,
+                        help='(local) Fração das durações reais usada na simulação')
+    args = parser.parse_args()
+
+    if args.backend == 'aws':
+        backend = backends_pipeline.BackendAWS()
+    else:
+        backend = backends_pipeline.BackendLocal(
+            BUCKETS, BANCOS, escala_tempo=args.escala_tempo,
+            falhas=args.simular_falha, alteracoes=args.simular_alteracao
+        )
+    estado = orquestracao.EstadoPipeline(args.estado or ESTADO_PADRAO[args.backend])
+
+    print("═══════════════════════════════════════════════════════")
+    print(f"🚀 PIPELINE BEIRA MAR - ETL COMPLETO (backend {backend.nome})")
+    print("═══════════════════════════════════════════════════════")
+
+    resultados, duracao = orquestracao.executar_dag(
+        montar_etapas(), backend, estado, forcar=args.forcar, paralelismo=args.paralelismo
+    )
+    orquestracao.imprimir_relatorio(resultados, duracao, resumir=lambda detalhes: detalhes.get('resumo', ''))
+
+    if any(resultado.situacao in (orquestracao.FALHOU, orquestracao.BLOQUEADA) for resultado in resultados):
+        print("\n❌ Pipeline terminou com falhas")
+        return 1
+
+    print("\n═══════════════════════════════════════════════════════")
+    print("✅ PIPELINE COMPLETO EXECUTADO COM SUCESSO!")
+    print("═══════════════════════════════════════════════════════")
+    print("\n📊 Modelagem Estrela:")
+    for tabela in TABELAS_ESTRELA:
+        print(f"   - {tabela}")
+    print("\n🔗 Conecte o Grafana:")
+    print(f"   Database: {BANCOS['estrela']}")
+    print(f"   Workgroup: {WORKGROUP}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,22 @@
-import pandas as pd
-import boto3
+import numpy as np
 import io
+import json
 import os
+from datetime import datetime, timezone
+
+import codec_datas
+import esquemas
+import execucao_paralela
+import inicializacao
+import metricas
+import transferencias_s3
+
+# Bibliotecas da camada AWSSDKPandas: importadas em segundo plano enquanto
+# a Lambda já inicia as leituras no S3 (ver inicializacao.py)
+pd = inicializacao.importar('pandas')
+pa = inicializacao.importar('pyarrow')
+pq = inicializacao.importar('pyarrow.parquet')
+inicializacao.preaquecer('pandas', 'pyarrow.parquet')
 
 # Configuração direta dos buckets
 BUCKET_RAW = 'raw-beira-mar'
@@ -10,15 +25,64 @@ BUCKET_TRUSTED = 'trusted-beira-mar'
 CHAVE_MED = "medical_appointments.csv"
 CHAVE_CLIMA = "meteorologia2016.csv"
 
-# Cliente S3
-s3_client = boto3.client('s3')
+# Arquivos gerados no bucket trusted (a extensão acompanha o formato)
+CHAVE_MED_TRUSTED = "clinica/medical_appointment_no_show.csv"
+CHAVE_CLIMA_TRUSTED = "clima/clima.csv"
+
+# Formato de saída da zona TRUSTED: 'parquet' (padrão) ou 'csv'
+FORMATO_ARQUIVO = 'parquet'
+FORMATOS_SUPORTADOS = ('parquet', 'csv')
+
+# Modo de processamento dos dados médicos: 'completo' (padrão) carrega o
+# arquivo inteiro em memória; 'streaming' lê e grava em lotes de linhas;
+# 'incremental' processa apenas os arquivos novos e atualiza as partições
+MODO_PROCESSAMENTO = 'completo'
+MODOS_SUPORTADOS = ('completo', 'streaming', 'incremental')
+TAMANHO_LOTE = 100_000
+
+# Processos da cadeia de limpeza dos dados médicos: 0 (padrão) usa uma
+# por vCPU disponível, 1 executa tudo no próprio processo (ver
+# execucao_paralela.py); vale para todos os modos de processamento
+PROCESSOS_TRATAMENTO = 0
 
+# Modo incremental: arquivos médicos novos chegam em prefixos de data
+# (ex.: medical_appointments/2016-05-01/lote.csv); o histórico em
+# CHAVE_MED também é tratado como entrada na primeira execução
+PREFIXO_MED_INCREMENTAL = "medical_appointments"
+# Partições ano=/mes= pela data da consulta (APPOINTMENTDAY)
+PREFIXO_MED_PARTICIONADO = "clinica"
+NOME_ARQUIVO_MED_PARTICAO = "medical_appointment_no_show"
+CHAVE_UNICA_MED = 'APPOINTMENTID'
+# Manifesto com as entradas já processadas (chave -> ETag)
+CHAVE_MANIFESTO = "_manifesto/tratamento_lambda.json"
 
-def ler_csv_do_s3(bucket, key, **kwargs):
-    """Lê arquivo CSV do S3 usando boto3"""
+# Tamanho de cada parte do multipart upload (o S3 exige no mínimo 5 MB)
+TAMANHO_PARTE_UPLOAD = 8 * 1024 * 1024
+
+# Cliente S3 (pool de conexões dimensionado para transferências concorrentes),
+# criado uma vez por ambiente de execução e reaproveitado nas invocações aquecidas
+s3_client = transferencias_s3.criar_cliente_s3()
+
+
+@metricas.medir
+def ler_csv_do_s3(bucket, key, esquema=None, **kwargs):
+    """
+    Lê arquivo CSV do S3 usando boto3
+    Com um esquema, carrega só as colunas dele já com os tipos definidos
+    e falha se alguma estiver ausente
+    """
     try:
-        obj = s3_client.get_object(Bucket=bucket, Key=key)
-        return pd.read_csv(io.BytesIO(obj['Body'].read()), **kwargs)
+        corpo = transferencias_s3.baixar_bytes(s3_client, bucket, key)
+        if esquema is None:
+            return pd.read_csv(io.BytesIO(corpo), **kwargs)
+        df = pd.read_csv(
+            io.BytesIO(corpo),
+            usecols=lambda coluna: coluna in esquema,
+            dtype=esquema,
+            **kwargs
+        )
+        esquemas.validar_colunas(df.columns, esquema, key)
+        return df
     except Exception as e:
         raise Exception(f"Erro ao ler {key} do bucket {bucket}: {str(e)}")
 
@@ -28,90 +92,456 @@ def salvar_csv_no_s3(df, bucket, key):
     try:
         csv_buffer = io.StringIO()
         df.to_csv(csv_buffer, index=False)
-        s3_client.put_object(
-            Bucket=bucket,
-            Key=key,
-            Body=csv_buffer.getvalue()
+        transferencias_s3.enviar_bytes(s3_client, bucket, key, csv_buffer.getvalue())
+    except Exception as e:
+        raise Exception(f"Erro ao salvar {key} no bucket {bucket}: {str(e)}")
+
+
+def salvar_parquet_no_s3(df, bucket, key):
+    """Salva DataFrame como Parquet (snappy) no S3, preservando os tipos das colunas"""
+    try:
+        parquet_buffer = io.BytesIO()
+        df.to_parquet(
+            parquet_buffer,
+            index=False,
+            engine='pyarrow',
+            compression='snappy',
+            # Athena/Glue leem timestamps em milissegundos, não em nanossegundos
+            coerce_timestamps='ms',
+            allow_truncated_timestamps=True
         )
+        transferencias_s3.enviar_bytes(s3_client, bucket, key, parquet_buffer.getvalue())
     except Exception as e:
         raise Exception(f"Erro ao salvar {key} no bucket {bucket}: {str(e)}")
 
 
+def chave_no_formato(key, formato):
+    """Troca a extensão da chave pela do formato informado"""
+    return f"{os.path.splitext(key)[0]}.{formato}"
+
+
+@metricas.medir
+def salvar_df_no_s3(df, bucket, key, formato):
+    """
+    Salva DataFrame no formato configurado e remove a versão do outro formato,
+    para que o crawler não encontre CSV e Parquet misturados no mesmo prefixo
+    """
+    chave = chave_no_formato(key, formato)
+    if formato == 'parquet':
+        salvar_parquet_no_s3(df, bucket, chave)
+    else:
+        salvar_csv_no_s3(df, bucket, chave)
+
+    remover_outros_formatos(bucket, key, formato)
+    return chave
+
+
+def remover_outros_formatos(bucket, key, formato):
+    """
+    Remove do S3 as versões da chave gravadas nos demais formatos
+    (com formato=None remove a chave em todos os formatos)
+    """
+    for outro_formato in FORMATOS_SUPORTADOS:
+        if outro_formato != formato:
+            s3_client.delete_object(Bucket=bucket, Key=chave_no_formato(key, outro_formato))
+
+
+@metricas.medir
+def ler_clima_do_s3(bucket, key):
+    """
+    Lê o arquivo do INMET em uma única passada: colunas pela posição (sem
+    DESCARTAR), vírgula decimal, tipos numéricos fixos e marcadores de
+    ausência explícitos
+    """
+    try:
+        corpo = transferencias_s3.baixar_bytes(s3_client, bucket, key)
+        return pd.read_csv(
+            io.BytesIO(corpo),
+            sep=';',
+            decimal=',',
+            header=0,
+            names=esquemas.COLUNAS_CLIMA_RAW,
+            usecols=esquemas.colunas_lidas(
+                esquemas.COLUNAS_CLIMA_RAW, esquemas.COLUNAS_CLIMA_DESCARTADAS
+            ),
+            dtype=esquemas.CLIMA_RAW,
+            na_values=esquemas.NA_CLIMA
+        )
+    except Exception as e:
+        raise Exception(f"Erro ao ler {key} do bucket {bucket}: {str(e)}")
+
+
+def ler_df_do_s3(bucket, key, formato):
+    """
+    Lê DataFrame gravado pela própria Lambda no formato configurado, com os
+    tipos da zona TRUSTED (datas em texto de arquivos anteriores são convertidas)
+    """
+    try:
+        corpo = io.BytesIO(transferencias_s3.baixar_bytes(s3_client, bucket, key))
+        if formato == 'parquet':
+            df = pd.read_parquet(corpo, engine='pyarrow')
+        else:
+            df = pd.read_csv(corpo, dtype=esquemas.tipos_csv(esquemas.MEDICO_TRUSTED))
+        return esquemas.aplicar_esquema(df, esquemas.MEDICO_TRUSTED, key)
+    except Exception as e:
+        raise Exception(f"Erro ao ler {key} do bucket {bucket}: {str(e)}")
+
+
+def listar_objetos_s3(bucket, prefixo):
+    """Lista todas as chaves do prefixo (com paginação) e seus ETags"""
+    objetos = {}
+    paginador = s3_client.get_paginator('list_objects_v2')
+    for pagina in paginador.paginate(Bucket=bucket, Prefix=prefixo):
+        for obj in pagina.get('Contents', []):
+            objetos[obj['Key']] = obj['ETag']
+    return objetos
+
+
+def ler_manifesto(bucket, key):
+    """Lê o manifesto de entradas processadas (vazio na primeira execução)"""
+    try:
+        obj = s3_client.get_object(Bucket=bucket, Key=key)
+        return json.loads(obj['Body'].read())
+    except s3_client.exceptions.NoSuchKey:
+        return {'entradas': {}}
+
+
+def salvar_manifesto(bucket, key, manifesto):
+    """Grava o manifesto de entradas processadas no S3"""
+    manifesto['atualizado_em'] = datetime.now(timezone.utc).isoformat()
+    s3_client.put_object(
+        Bucket=bucket,
+        Key=key,
+        Body=json.dumps(manifesto, indent=2, ensure_ascii=False).encode('utf-8'),
+        ContentType='application/json'
+    )
+
+
+def chave_particao(prefixo, ano, mes, nome_arquivo, formato):
+    """Monta a chave de uma partição no estilo Hive (ano=/mes=)"""
+    return f"{prefixo}/ano={ano}/mes={mes:02d}/{nome_arquivo}.{formato}"
+
+
+def dividir_por_particao(df, coluna_data):
+    """Agrupa o DataFrame por ano e mês da coluna de data"""
+    datas = codec_datas.para_timestamp(df[coluna_data])
+    for (ano, mes), df_particao in df.groupby([datas.dt.year, datas.dt.month], sort=True):
+        yield int(ano), int(mes), df_particao
+
+
+@metricas.medir
+def mesclar_particoes(df_novo, bucket, formato):
+    """
+    Mescla os registros novos nas partições ano=/mes= do bucket trusted
+    Apenas as partições afetadas são lidas e regravadas; registros com a
+    mesma CHAVE_UNICA_MED são substituídos pela versão mais recente
+    Retorna as chaves das partições gravadas
+    """
+    existentes = listar_objetos_s3(bucket, f"{PREFIXO_MED_PARTICIONADO}/ano=")
+
+    def _mesclar(key, df_particao):
+        if key in existentes:
+            df_atual = ler_df_do_s3(bucket, key, formato)
+            df_particao = (
+                pd.concat([df_atual, df_particao], ignore_index=True)
+                .drop_duplicates(subset=[CHAVE_UNICA_MED], keep='last')
+            )
+            # O concat de categorias diferentes volta para object
+            df_particao = esquemas.aplicar_esquema(df_particao, esquemas.MEDICO_TRUSTED, key)
+        salvar_df_no_s3(df_particao, bucket, key, formato)
+        print(f"   📂 {key}: {len(df_particao)} registros")
+
+    # Partições são independentes: leitura e gravação de cada uma em paralelo
+    tarefas = {}
+    for ano, mes, df_particao in dividir_por_particao(df_novo, 'APPOINTMENTDAY'):
+        key = chave_particao(PREFIXO_MED_PARTICIONADO, ano, mes, NOME_ARQUIVO_MED_PARTICAO, formato)
+        tarefas[key] = lambda key=key, df_particao=df_particao: _mesclar(key, df_particao)
+    if tarefas:
+        transferencias_s3.executar_em_paralelo(tarefas)
+
+    return list(tarefas)
+
+
+class UploadMultipartS3(io.RawIOBase):
+    """
+    Arquivo somente-escrita que envia o conteúdo ao S3 em partes de um
+    multipart upload, mantendo em memória no máximo uma parte por vez
+    """
+
+    def __init__(self, bucket, key, tamanho_parte=TAMANHO_PARTE_UPLOAD):
+        self.bucket = bucket
+        self.key = key
+        self.tamanho_parte = tamanho_parte
+        self._buffer = bytearray()
+        self._partes = []
+        self._upload_id = None
+        self._posicao = 0
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        return self._posicao
+
+    def write(self, dados):
+        self._buffer.extend(dados)
+        self._posicao += len(dados)
+        while len(self._buffer) >= self.tamanho_parte:
+            self._enviar_parte(bytes(self._buffer[:self.tamanho_parte]))
+            del self._buffer[:self.tamanho_parte]
+        return len(dados)
+
+    def _enviar_parte(self, dados):
+        if self._upload_id is None:
+            resposta = s3_client.create_multipart_upload(Bucket=self.bucket, Key=self.key)
+            self._upload_id = resposta['UploadId']
+        numero = len(self._partes) + 1
+        resposta = s3_client.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self._upload_id,
+            PartNumber=numero,
+            Body=dados
+        )
+        self._partes.append({'ETag': resposta['ETag'], 'PartNumber': numero})
+
+    def close(self):
+        """Envia o restante do buffer e conclui o upload"""
+        if self.closed:
+            return
+        if self._upload_id is None:
+            # Arquivo menor que uma parte: um único put_object basta
+            s3_client.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self._buffer))
+        else:
+            if self._buffer:
+                self._enviar_parte(bytes(self._buffer))
+            s3_client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self._upload_id,
+                MultipartUpload={'Parts': self._partes}
+            )
+        self._buffer = bytearray()
+        super().close()
+
+    def abortar(self):
+        """Cancela o upload para não deixar partes órfãs cobradas no bucket"""
+        if self._upload_id is not None:
+            s3_client.abort_multipart_upload(
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self._upload_id
+            )
+        self._buffer = bytearray()
+        super().close()
+
+
+@metricas.medir
 def padronizar_data_hora(df, coluna):
-    """Padroniza colunas de data e hora para formato brasileiro"""
-    df[coluna] = pd.to_datetime(df[coluna])
-    df[coluna] = df[coluna].dt.strftime('%d/%m/%Y %H:%M:%S')
+    """Converte datas e horas ISO-8601 em UTC (2016-04-29T18:38:08Z) em timestamps"""
+    df[coluna] = codec_datas.converter(df[coluna], codec_datas.FORMATO_ISO_UTC)
     return df
 
 
+@metricas.medir
 def padronizar_data(df, coluna):
-    """Padroniza datas no formato MM/DD/YYYY para DD/MM/YYYY"""
-    df[coluna] = pd.to_datetime(df[coluna], format='%m/%d/%Y')
-    df[coluna] = df[coluna].dt.strftime('%d/%m/%Y')
+    """Converte datas no formato MM/DD/YYYY em timestamps"""
+    df[coluna] = codec_datas.converter(df[coluna], '%m/%d/%Y')
     return df
 
 
+@metricas.medir
 def padronizar_data2(df, coluna):
-    """Padroniza datas no formato YYYY-MM-DD para DD/MM/YYYY"""
-    df[coluna] = pd.to_datetime(df[coluna], format='%Y-%m-%d')
-    df[coluna] = df[coluna].dt.strftime('%d/%m/%Y')
+    """Converte datas no formato YYYY-MM-DD (INMET) em timestamps"""
+    df[coluna] = codec_datas.converter(df[coluna], codec_datas.FORMATO_DATA_INMET)
     return df
 
 
+@metricas.medir
 def padronizar_colunas(df):
     """Converte nomes das colunas para maiúsculas"""
     df.columns = df.columns.str.upper()
     return df
 
 
+@metricas.medir
 def converter_para_binario(df, coluna):
-    """Converte valores Yes/No para 1/0"""
+    """Converte valores Yes/No para 1/0 (uint8), falhando em valores inesperados"""
     mapeamento = {'Yes': 1, 'No': 0}
-    df[coluna] = df[coluna].replace(mapeamento)
+    binario = df[coluna].map(mapeamento)
+    if binario.isna().any():
+        inesperados = df.loc[binario.isna(), coluna].unique()[:5].tolist()
+        raise esquemas.EsquemaDivergente(f"Valores inesperados em {coluna}: {inesperados}")
+    df[coluna] = binario.astype('uint8')
     return df
 
 
-def remover_acentos(df):
-    """Remove acentos de todas as colunas de texto"""
+def normalizar_valores(valores, sem_acentos, maiusculo):
+    """Remove acentos e/ou converte para maiúsculas uma série de valores distintos"""
+    valores = pd.Series(valores, dtype='object').astype(str)
+    if sem_acentos:
+        valores = (
+            valores
+            .str.normalize('NFKD')
+            .str.encode('ascii', errors='ignore')
+            .str.decode('utf-8')
+        )
+    if maiusculo:
+        valores = valores.str.upper()
+    return valores.to_numpy(dtype='object')
+
+
+@metricas.medir
+def normalizar_texto(df, sem_acentos=True, maiusculo=True):
+    """
+    Remove acentos e converte para maiúsculas todas as colunas de texto
+    em uma única passada. Cada valor distinto é normalizado uma só vez e o
+    resultado é devolvido às linhas pelos códigos do factorize, o que evita
+    arrays intermediários do tamanho da coluna em cada operação .str
+    Colunas categóricas continuam categóricas, com as categorias normalizadas
+    """
     for coluna in df.columns:
         if df[coluna].dtype == 'object':
-            df[coluna] = (
-                df[coluna]
-                .astype(str)
-                .str.normalize('NFKD')
-                .str.encode('ascii', errors='ignore')
-                .str.decode('utf-8')
+            # use_na_sentinel=False mantém nulos como valor ('nan' -> 'NAN'),
+            # igual ao astype(str) aplicado linha a linha
+            codigos, unicos = pd.factorize(df[coluna], use_na_sentinel=False)
+            df[coluna] = normalizar_valores(unicos, sem_acentos, maiusculo)[codigos]
+        elif isinstance(df[coluna].dtype, pd.CategoricalDtype):
+            codigos = df[coluna].cat.codes.to_numpy()
+            categorias = list(df[coluna].cat.categories)
+            if (codigos < 0).any():
+                # Nulos viram a categoria 'NAN', como nas colunas de texto
+                codigos = np.where(codigos < 0, len(categorias), codigos)
+                categorias.append(np.nan)
+            # Categorias que se tornam iguais após a normalização são unificadas
+            novos_codigos, novas_categorias = pd.factorize(
+                normalizar_valores(categorias, sem_acentos, maiusculo)
             )
+            df[coluna] = pd.Categorical.from_codes(novos_codigos[codigos], categories=novas_categorias)
     return df
 
 
+def remover_acentos(df):
+    """Remove acentos de todas as colunas de texto"""
+    return normalizar_texto(df, sem_acentos=True, maiusculo=False)
+
+
 def padronizar_maiusculo(df):
     """Converte todas as strings para maiúsculas"""
-    for coluna in df.columns:
-        if df[coluna].dtype == 'object':
-            df[coluna] = df[coluna].astype(str).str.upper()
-    return df
+    return normalizar_texto(df, sem_acentos=False, maiusculo=True)
 
 
-def padronizar_decimal_para_ponto(df):
-    """Converte vírgulas decimais para pontos e tenta converter para numérico"""
-    colunas_string = df.select_dtypes(include=['object']).columns
-    
-    for coluna in colunas_string:
-        # Substituir vírgula por ponto
-        coluna_limpa = df[coluna].astype(str).str.replace(',', '.', regex=False)
-        
-        # Tentar converter para numérico
-        coluna_convertida = pd.to_numeric(coluna_limpa, errors='coerce')
-        
-        # Se mais de 80% dos valores forem convertidos com sucesso, usar a conversão
-        limiar_sucesso = 0.8
-        if coluna_convertida.count() / len(coluna_convertida) > limiar_sucesso:
-            df[coluna] = coluna_convertida
+@metricas.medir
+def tratar_df_med(df_med):
+    """
+    Aplica a cadeia de limpeza dos dados médicos
+    Retorna o DataFrame tratado e a quantidade de registros removidos
+    """
+    df_med = padronizar_data_hora(df_med, 'ScheduledDay')
+    df_med = padronizar_data_hora(df_med, 'AppointmentDay')
+    df_med = padronizar_colunas(df_med)
+    df_med = converter_para_binario(df_med, 'NO-SHOW')
+    df_med = normalizar_texto(df_med)
     
-    return df
+    # Filtrar idades inválidas
+    registros_antes = len(df_med)
+    df_med = df_med[df_med['AGE'] >= 0]
+    df_med = esquemas.aplicar_esquema(df_med, esquemas.MEDICO_TRUSTED, 'dados médicos')
+    return df_med, registros_antes - len(df_med)
+
+
+@metricas.medir
+def tratar_df_med_em_processos(df_med, processos=PROCESSOS_TRATAMENTO):
+    """
+    Aplica a cadeia de limpeza (por linha) em faixas de linhas executadas
+    em processos paralelos e junta as faixas na ordem original
+    Com uma vCPU ou poucas linhas equivale a tratar_df_med
+    """
+    partes = execucao_paralela.executar_em_faixas(df_med, tratar_df_med, processos)
+    df_med = execucao_paralela.concatenar([df for df, _ in partes])
+    return df_med, sum(removidos for _, removidos in partes)
+
 
+def schema_dos_lotes(schema):
+    """
+    Schema do primeiro lote com índices int32 nas colunas categóricas: o
+    pandas usa o menor inteiro que comporta as categorias do lote (int8
+    até 127), e um lote seguinte com mais categorias (ex.: bairros) não
+    caberia no schema fixado pelo primeiro
+    """
+    campos = [
+        campo.with_type(pa.dictionary(pa.int32(), campo.type.value_type, campo.type.ordered))
+        if pa.types.is_dictionary(campo.type) else campo
+        for campo in schema
+    ]
+    return pa.schema(campos, metadata=schema.metadata)
+
+
+@metricas.medir
+def processar_med_em_lotes(bucket_origem, key_origem, bucket_destino, key_destino,
+                           formato, tamanho_lote=TAMANHO_LOTE, processos=PROCESSOS_TRATAMENTO):
+    """
+    Lê o CSV médico do S3 em lotes de linhas, aplica a cadeia de limpeza a
+    cada lote e grava o resultado via multipart upload, sem nunca carregar
+    o arquivo inteiro em memória
+    Retorna a quantidade de registros gravados e de registros removidos
+    """
+    try:
+        obj = s3_client.get_object(Bucket=bucket_origem, Key=key_origem)
+        leitor = pd.read_csv(
+            obj['Body'],
+            chunksize=tamanho_lote,
+            usecols=lambda coluna: coluna in esquemas.MEDICO_RAW,
+            dtype=esquemas.MEDICO_RAW
+        )
+    except Exception as e:
+        raise Exception(f"Erro ao ler {key_origem} do bucket {bucket_origem}: {str(e)}")
+
+    destino = UploadMultipartS3(bucket_destino, key_destino)
+    escritor_parquet = None
+    schema = None
+    registros_gravados = 0
+    registros_removidos = 0
+
+    try:
+        for numero_lote, lote in enumerate(leitor, start=1):
+            lote, removidos = tratar_df_med_em_processos(lote, processos)
+            registros_gravados += len(lote)
+            registros_removidos += removidos
+
+            if formato == 'parquet':
+                # O schema do primeiro lote vale para o arquivo inteiro
+                tabela = pa.Table.from_pandas(lote, schema=schema, preserve_index=False)
+                if escritor_parquet is None:
+                    schema = schema_dos_lotes(tabela.schema)
+                    tabela = tabela.cast(schema)
+                    escritor_parquet = pq.ParquetWriter(
+                        destino,
+                        schema,
+                        compression='snappy',
+                        coerce_timestamps='ms',
+                        allow_truncated_timestamps=True
+                    )
+                escritor_parquet.write_table(tabela)
+            else:
+                destino.write(lote.to_csv(index=False, header=(numero_lote == 1)).encode('utf-8'))
+
+            print(f"   🔄 Lote {numero_lote}: {registros_gravados} registros gravados")
+
+        if escritor_parquet is not None:
+            escritor_parquet.close()
+        destino.close()
+    except Exception as e:
+        destino.abortar()
+        raise Exception(f"Erro ao processar {key_origem} em lotes: {str(e)}")
+
+    remover_outros_formatos(bucket_destino, key_destino, formato)
+    return registros_gravados, registros_removidos
 
+
+@metricas.instrumentar_handler(
+    'tratamento', s3_client, lambda: os.environ.get('BUCKET_TRUSTED', BUCKET_TRUSTED)
+)
 def lambda_handler(event, context):
     """
     Handler principal da Lambda Function
@@ -125,22 +555,85 @@ def lambda_handler(event, context):
     # Usar variáveis de ambiente do Terraform ou valores padrão
     bucket_raw = os.environ.get('BUCKET_RAW', BUCKET_RAW)
     bucket_trusted = os.environ.get('BUCKET_TRUSTED', BUCKET_TRUSTED)
+    formato = os.environ.get('FORMATO_ARQUIVO', FORMATO_ARQUIVO).lower()
+    modo = os.environ.get('MODO_PROCESSAMENTO', MODO_PROCESSAMENTO).lower()
+    tamanho_lote = int(os.environ.get('TAMANHO_LOTE', TAMANHO_LOTE))
+    processos = int(os.environ.get('PROCESSOS_TRATAMENTO', PROCESSOS_TRATAMENTO))
+    streaming = modo == 'streaming'
+    incremental = modo == 'incremental'
     
     print(f"\n📦 Buckets configurados:")
     print(f"   RAW: {bucket_raw}")
     print(f"   TRUSTED: {bucket_trusted}")
+    print(f"   Formato de saída: {formato}")
+    print(f"   Modo de processamento: {modo}")
+    print(f"   Processos de tratamento: {processos or 'automático'} "
+          f"({execucao_paralela.vcpus_disponiveis()} vCPU(s))")
+    
+    if formato not in FORMATOS_SUPORTADOS:
+        print(f"\n❌ ERRO: formato não suportado: {formato}")
+        return {
+            'statusCode': 400,
+            'body': f'Formato não suportado: {formato}'
+        }
+    
+    if modo not in MODOS_SUPORTADOS:
+        print(f"\n❌ ERRO: modo de processamento não suportado: {modo}")
+        return {
+            'statusCode': 400,
+            'body': f'Modo de processamento não suportado: {modo}'
+        }
+    
+    key_med = chave_no_formato(CHAVE_MED_TRUSTED, formato)
+    key_clima = chave_no_formato(CHAVE_CLIMA_TRUSTED, formato)
     
     # 1. Leitura dos dados do S3
     try:
-        print(f"\n📖 Lendo dados de medical_appointments...")
-        print(f"   Origem: s3://{bucket_raw}/{CHAVE_MED}")
-        df_med = ler_csv_do_s3(bucket_raw, CHAVE_MED)
-        print(f"   ✅ {len(df_med)} registros lidos")
+        if incremental:
+            # Apenas entradas ainda não registradas no manifesto (chave + ETag)
+            print(f"\n🗂️  Consultando manifesto: s3://{bucket_trusted}/{CHAVE_MANIFESTO}")
+            manifesto = ler_manifesto(bucket_trusted, CHAVE_MANIFESTO)
+            processadas = manifesto['entradas']
+            entradas_med = {
+                key: etag
+                for key, etag in listar_objetos_s3(bucket_raw, PREFIXO_MED_INCREMENTAL).items()
+                if key.endswith('.csv') and processadas.get(key) != etag
+            }
+            etag_clima = listar_objetos_s3(bucket_raw, CHAVE_CLIMA).get(CHAVE_CLIMA)
+            clima_alterado = processadas.get(CHAVE_CLIMA) != etag_clima
+            print(f"   {len(entradas_med)} arquivo(s) médico(s) novo(s)")
+            print(f"   Clima {'alterado' if clima_alterado else 'sem alterações'}")
+        else:
+            clima_alterado = True
+        
+        # Todas as entradas são baixadas ao mesmo tempo; no modo streaming
+        # os dados médicos são lidos lote a lote na etapa 2
+        leituras = {}
+        if incremental:
+            print(f"\n📖 Lendo arquivos médicos novos...")
+            for key in sorted(entradas_med):
+                print(f"   Origem: s3://{bucket_raw}/{key}")
+                leituras[key] = lambda key=key: ler_csv_do_s3(bucket_raw, key, esquemas.MEDICO_RAW)
+        elif not streaming:
+            print(f"\n📖 Lendo dados de medical_appointments...")
+            print(f"   Origem: s3://{bucket_raw}/{CHAVE_MED}")
+            leituras[CHAVE_MED] = lambda: ler_csv_do_s3(bucket_raw, CHAVE_MED, esquemas.MEDICO_RAW)
         
-        print(f"\n📖 Lendo dados de clima...")
-        print(f"   Origem: s3://{bucket_raw}/{CHAVE_CLIMA}")
-        df_clima = ler_csv_do_s3(bucket_raw, CHAVE_CLIMA, sep=';')
-        print(f"   ✅ {len(df_clima)} registros lidos")
+        if clima_alterado:
+            print(f"\n📖 Lendo dados de clima...")
+            print(f"   Origem: s3://{bucket_raw}/{CHAVE_CLIMA}")
+            leituras[CHAVE_CLIMA] = lambda: ler_clima_do_s3(bucket_raw, CHAVE_CLIMA)
+        
+        lidos = transferencias_s3.executar_em_paralelo(leituras) if leituras else {}
+        df_clima = lidos.pop(CHAVE_CLIMA, None)
+        if incremental:
+            df_med = pd.concat(lidos.values(), ignore_index=True) if lidos else None
+            print(f"   ✅ {sum(len(df) for df in lidos.values())} registros médicos lidos")
+        elif not streaming:
+            df_med = lidos[CHAVE_MED]
+            print(f"   ✅ {len(df_med)} registros médicos lidos")
+        if df_clima is not None:
+            print(f"   ✅ {len(df_clima)} registros de clima lidos")
         
     except Exception as e:
         print(f"\n❌ ERRO ao ler dados do S3: {e}")
@@ -152,22 +645,23 @@ def lambda_handler(event, context):
     # 2. Tratamento dos dados médicos
     print(f"\n🔧 Tratando dados médicos...")
     try:
-        df_med = padronizar_data_hora(df_med, 'ScheduledDay')
-        df_med = padronizar_data_hora(df_med, 'AppointmentDay')
-        df_med = padronizar_colunas(df_med)
-        df_med = converter_para_binario(df_med, 'NO-SHOW')
-        df_med = remover_acentos(df_med)
-        df_med = padronizar_maiusculo(df_med)
-        
-        # Filtrar idades inválidas
-        registros_antes = len(df_med)
-        df_med = df_med[df_med['AGE'] >= 0]
-        registros_removidos = registros_antes - len(df_med)
+        if streaming:
+            print(f"   Origem: s3://{bucket_raw}/{CHAVE_MED}")
+            print(f"   Destino: s3://{bucket_trusted}/{key_med}")
+            print(f"   Lotes de {tamanho_lote} linhas")
+            registros_medicos, registros_removidos = processar_med_em_lotes(
+                bucket_raw, CHAVE_MED, bucket_trusted, key_med, formato, tamanho_lote, processos
+            )
+        elif df_med is None:
+            registros_medicos, registros_removidos = 0, 0
+        else:
+            df_med, registros_removidos = tratar_df_med_em_processos(df_med, processos)
+            registros_medicos = len(df_med)
         
         if registros_removidos > 0:
             print(f"   ⚠️  {registros_removidos} registros com idade negativa removidos")
         
-        print(f"   ✅ Dados médicos tratados: {len(df_med)} registros")
+        print(f"   ✅ Dados médicos tratados: {registros_medicos} registros")
         
     except Exception as e:
         print(f"\n❌ ERRO no tratamento de dados médicos: {e}")
@@ -179,24 +673,15 @@ def lambda_handler(event, context):
     # 3. Tratamento dos dados climáticos
     print(f"\n🔧 Tratando dados climáticos...")
     try:
-        # Renomear colunas
-        df_clima.columns = [
-            "DATA", "HORA_UTC", "PRECIPITACAO_MM", "PRESSAO_ESTACAO_MB", 
-            "PRESSAO_MAX_MB", "PRESSAO_MIN_MB", "RADIACAO_KJ_M2", "TEMP_AR_C", 
-            "TEMP_ORVALHO_C", "TEMP_MAX_C", "TEMP_MIN_C", "TEMP_ORVALHO_MAX_C", 
-            "TEMP_ORVALHO_MIN_C", "UMIDADE_MAX", "UMIDADE_MIN", "UMIDADE_RELATIVA", 
-            "VENTO_DIRECAO_GRAUS", "VENTO_RAJADA_MAX_MS", "VENTO_VELOCIDADE_MS", 
-            "DESCARTAR"
-        ]
-        
-        # Remover coluna desnecessária
-        df_clima = df_clima.drop(columns=["DESCARTAR"])
+        if not clima_alterado:
+            print(f"   ⏭️  Clima sem alterações desde a última execução")
+            df_clima = None
+        else:
+            # Decimais e ausências já foram convertidos na leitura
+            df_clima = padronizar_data2(df_clima, 'DATA')
+            df_clima = esquemas.aplicar_esquema(df_clima, esquemas.CLIMA_TRUSTED, CHAVE_CLIMA)
         
-        # Padronizar data e decimais
-        df_clima = padronizar_data2(df_clima, 'DATA')
-        df_clima = padronizar_decimal_para_ponto(df_clima)
-        
-        print(f"   ✅ Dados climáticos tratados: {len(df_clima)} registros")
+            print(f"   ✅ Dados climáticos tratados: {len(df_clima)} registros")
         
     except Exception as e:
         print(f"\n❌ ERRO no tratamento de dados climáticos: {e}")
@@ -207,17 +692,41 @@ def lambda_handler(event, context):
     
     # 4. Salvar dados tratados no bucket trusted
     try:
-        print(f"\n💾 Salvando dados médicos...")
-        key_med = "clinica/medical_appointment_no_show.csv"
-        print(f"   Destino: s3://{bucket_trusted}/{key_med}")
-        salvar_csv_no_s3(df_med, bucket_trusted, key_med)
-        print(f"   ✅ Salvo com sucesso")
+        # No modo streaming os dados médicos já foram gravados na etapa 2
+        arquivos_gerados = []
+        if incremental:
+            print(f"\n💾 Mesclando partições de dados médicos...")
+            if df_med is not None:
+                arquivos_gerados += mesclar_particoes(df_med, bucket_trusted, formato)
+            # O arquivo único do modo completo não convive com as partições
+            remover_outros_formatos(bucket_trusted, key_med, None)
+            print(f"   ✅ {len(arquivos_gerados)} partição(ões) atualizada(s)")
+        else:
+            arquivos_gerados.append(key_med)
+        
+        # Dados médicos (modo completo) e clima são gravados ao mesmo tempo
+        gravacoes = {}
+        if not incremental and not streaming:
+            print(f"\n💾 Salvando dados médicos...")
+            print(f"   Destino: s3://{bucket_trusted}/{key_med}")
+            gravacoes[key_med] = lambda: salvar_df_no_s3(df_med, bucket_trusted, key_med, formato)
+        
+        if clima_alterado:
+            print(f"\n💾 Salvando dados climáticos...")
+            print(f"   Destino: s3://{bucket_trusted}/{key_clima}")
+            gravacoes[key_clima] = lambda: salvar_df_no_s3(df_clima, bucket_trusted, key_clima, formato)
+            arquivos_gerados.append(key_clima)
+        
+        if gravacoes:
+            transferencias_s3.executar_em_paralelo(gravacoes)
+            print(f"   ✅ Salvo com sucesso")
         
-        print(f"\n💾 Salvando dados climáticos...")
-        key_clima = "clima/clima.csv"
-        print(f"   Destino: s3://{bucket_trusted}/{key_clima}")
-        salvar_csv_no_s3(df_clima, bucket_trusted, key_clima)
-        print(f"   ✅ Salvo com sucesso")
+        # O manifesto só é atualizado depois que todas as saídas foram gravadas
+        if incremental:
+            processadas.update(entradas_med)
+            processadas[CHAVE_CLIMA] = etag_clima
+            salvar_manifesto(bucket_trusted, CHAVE_MANIFESTO, manifesto)
+            print(f"\n🗂️  Manifesto atualizado: {len(processadas)} entradas processadas")
         
     except Exception as e:
         print(f"\n❌ ERRO ao salvar dados no S3: {e}")
@@ -235,11 +744,10 @@ def lambda_handler(event, context):
         'statusCode': 200,
         'body': {
             'mensagem': 'Processamento de dados concluído com sucesso',
-            'registros_medicos': len(df_med),
-            'registros_clima': len(df_clima),
-            'arquivos_gerados': [
-                f"s3://{bucket_trusted}/clinica/medical_appointment_no_show.csv",
-                f"s3://{bucket_trusted}/clima/clima.csv"
-            ]
+            'registros_medicos': registros_medicos,
+            'registros_clima': len(df_clima) if df_clima is not None else 0,
+            'formato': formato,
+            'modo_processamento': modo,
+            'arquivos_gerados': [f"s3://{bucket_trusted}/{key}" for key in arquivos_gerados]
         }
     }
\ No newline at end of file
@@ -1,7 +1,21 @@
-import pandas as pd
-import boto3
+import numpy as np
 import io
+import json
 import os
+import time
+from datetime import datetime, timezone
+
+import catalogo_glue
+import codec_datas
+import esquemas
+import inicializacao
+import metricas
+import transferencias_s3
+
+# Bibliotecas da camada AWSSDKPandas: importadas em segundo plano enquanto
+# a Lambda já inicia as leituras no S3 (ver inicializacao.py)
+pd = inicializacao.importar('pandas')
+inicializacao.preaquecer('pandas', 'pyarrow.parquet')
 
 # Configuração dos buckets
 BUCKET_TRUSTED = 'trusted-beira-mar'
@@ -12,95 +26,269 @@ CHAVE_MED_TRUSTED = "clinica/medical_appointment_no_show.csv"
 CHAVE_CLIMA_TRUSTED = "clima/clima.csv"
 CHAVE_REFINED = "clinica_com_clima/cancelamentos_com_clima.csv"
 
-# Cliente S3
-s3_client = boto3.client('s3')
+# Formato das zonas TRUSTED e REFINED: 'parquet' (padrão) ou 'csv'
+FORMATO_ARQUIVO = 'parquet'
+FORMATOS_SUPORTADOS = ('parquet', 'csv')
+
+# Modo de processamento: 'completo' (padrão) reprocessa todo o histórico;
+# 'incremental' integra apenas as partições ano=/mes= do bucket trusted
+# alteradas desde a última execução
+MODO_PROCESSAMENTO = 'completo'
+MODOS_SUPORTADOS = ('completo', 'incremental')
+
+# Partições ano=/mes= pela data da consulta (APPOINTMENTDAY)
+PREFIXO_MED_PARTICIONADO = "clinica"
+PREFIXO_REFINED_PARTICIONADO = "clinica_com_clima"
+NOME_ARQUIVO_REFINED_PARTICAO = "cancelamentos_com_clima"
+# Tabela da zona REFINED no catálogo, publicada pela própria Lambda com
+# os tipos de esquemas.REFINED (sem crawler): no modo incremental é
+# particionada por ano=/mes= com projeção, sem partições a registrar
+BANCO_REFINED = 'refined_beira_mar'
+TABELA_REFINED = 'clinica_com_clima'
+DESCRICAO_REFINED = 'Consultas médicas com a leitura de clima do horário do agendamento'
+# Colunas lidas da zona TRUSTED: as descartadas na REFINED nem são carregadas
+ESQUEMA_MED_LIDO = {
+    coluna: tipo
+    for coluna, tipo in esquemas.MEDICO_TRUSTED.items()
+    if coluna not in esquemas.COLUNAS_DESCARTADAS_REFINED
+}
+ESQUEMA_CLIMA_LIDO = {
+    coluna: tipo
+    for coluna, tipo in esquemas.CLIMA_TRUSTED.items()
+    if coluna not in esquemas.COLUNAS_DESCARTADAS_REFINED
+}
+
+# Manifesto com as entradas já integradas (chave trusted -> ETag)
+CHAVE_MANIFESTO = "_manifesto/refined_lambda.json"
+
+# Junção consultas x clima: 'exata' casa a hora cheia do agendamento com a
+# leitura da mesma hora; 'anterior' usa a leitura mais recente até o
+# agendamento e 'proxima' a leitura mais próxima, ambas dentro da tolerância
+ESTRATEGIA_JUNCAO = 'anterior'
+ESTRATEGIAS_JUNCAO = {'exata': None, 'anterior': 'backward', 'proxima': 'nearest'}
+TOLERANCIA_JUNCAO_MIN = 120
+
+# Modelagem estrela: dimensões e fato em Parquet no bucket refined
+# (star_schema/<tabela>/), publicados como tabelas no banco do catálogo
+BANCO_ESTRELA = 'star_schema_beira_mar'
+PREFIXO_ESTRELA = "star_schema"
+TABELAS_ESTRELA = {
+    'dim_paciente': esquemas.DIM_PACIENTE,
+    'dim_data': esquemas.DIM_DATA,
+    'dim_bairro': esquemas.DIM_BAIRRO,
+    'dim_clima': esquemas.DIM_CLIMA,
+    'fato_consultas': esquemas.FATO_CONSULTAS,
+}
+DESCRICOES_ESTRELA = {
+    'dim_paciente': 'Pacientes com os atributos da consulta mais recente',
+    'dim_data': 'Dias de agendamento e de consulta',
+    'dim_bairro': 'Bairros das consultas',
+    'dim_clima': 'Leituras horárias do INMET',
+    'fato_consultas': 'Consultas (uma linha por consulta), particionadas pela data da consulta',
+}
+
+# Faixas etárias da dim_paciente (fechadas à esquerda)
+LIMITES_FAIXA_ETARIA = [-np.inf, 18, 60, np.inf]
+FAIXAS_ETARIAS = ['CRIANCA', 'ADULTO', 'IDOSO']
+
+# Cliente S3 (pool de conexões dimensionado para transferências concorrentes),
+# criado uma vez por ambiente de execução e reaproveitado nas invocações aquecidas
+s3_client = transferencias_s3.criar_cliente_s3()
+glue_client = catalogo_glue.criar_cliente_glue()
 
 
 def ler_csv_do_s3(bucket, key, **kwargs):
     """Lê arquivo CSV do S3 usando boto3"""
     try:
         print(f"   📥 Lendo: s3://{bucket}/{key}")
-        obj = s3_client.get_object(Bucket=bucket, Key=key)
-        df = pd.read_csv(io.BytesIO(obj['Body'].read()), **kwargs)
+        corpo = transferencias_s3.baixar_bytes(s3_client, bucket, key)
+        df = pd.read_csv(io.BytesIO(corpo), **kwargs)
         print(f"   ✅ {len(df)} registros lidos")
         return df
     except Exception as e:
         raise Exception(f"Erro ao ler {key} do bucket {bucket}: {str(e)}")
 
 
+def ler_parquet_do_s3(bucket, key, **kwargs):
+    """Lê arquivo Parquet do S3 mantendo os tipos gravados pela etapa anterior"""
+    try:
+        print(f"   📥 Lendo: s3://{bucket}/{key}")
+        corpo = transferencias_s3.baixar_bytes(s3_client, bucket, key)
+        df = pd.read_parquet(io.BytesIO(corpo), engine='pyarrow', **kwargs)
+        print(f"   ✅ {len(df)} registros lidos")
+        return df
+    except Exception as e:
+        raise Exception(f"Erro ao ler {key} do bucket {bucket}: {str(e)}")
+
+
+def chave_no_formato(key, formato):
+    """Troca a extensão da chave pela do formato informado"""
+    return f"{os.path.splitext(key)[0]}.{formato}"
+
+
+@metricas.medir
+def ler_df_do_s3(bucket, key, formato, esquema):
+    """
+    Lê DataFrame do S3 no formato configurado, carregando só as colunas do
+    esquema com os tipos definidos nele; falha se alguma estiver ausente
+    """
+    chave = chave_no_formato(key, formato)
+    if formato == 'parquet':
+        df = ler_parquet_do_s3(bucket, chave, columns=list(esquema))
+    else:
+        df = ler_csv_do_s3(bucket, chave, usecols=lambda coluna: coluna in esquema, dtype=esquemas.tipos_csv(esquema))
+    # Datas em texto (CSV, arquivos anteriores) viram timestamps aqui
+    return esquemas.aplicar_esquema(df, esquema, chave)
+
+
 def salvar_csv_no_s3(df, bucket, key):
     """Salva DataFrame como CSV no S3"""
     try:
         print(f"   💾 Salvando: s3://{bucket}/{key}")
         csv_buffer = io.StringIO()
         df.to_csv(csv_buffer, index=False)
-        s3_client.put_object(
-            Bucket=bucket,
-            Key=key,
-            Body=csv_buffer.getvalue()
+        transferencias_s3.enviar_bytes(s3_client, bucket, key, csv_buffer.getvalue())
+        print(f"   ✅ {len(df)} registros salvos")
+    except Exception as e:
+        raise Exception(f"Erro ao salvar {key} no bucket {bucket}: {str(e)}")
+
+
+def salvar_parquet_no_s3(df, bucket, key):
+    """Salva DataFrame como Parquet (snappy) no S3, preservando os tipos das colunas"""
+    try:
+        print(f"   💾 Salvando: s3://{bucket}/{key}")
+        parquet_buffer = io.BytesIO()
+        df.to_parquet(
+            parquet_buffer,
+            index=False,
+            engine='pyarrow',
+            compression='snappy',
+            # Athena/Glue leem timestamps em milissegundos, não em nanossegundos
+            coerce_timestamps='ms',
+            allow_truncated_timestamps=True
         )
+        transferencias_s3.enviar_bytes(s3_client, bucket, key, parquet_buffer.getvalue())
         print(f"   ✅ {len(df)} registros salvos")
     except Exception as e:
         raise Exception(f"Erro ao salvar {key} no bucket {bucket}: {str(e)}")
 
 
+@metricas.medir
+def salvar_df_no_s3(df, bucket, key, formato):
+    """
+    Salva DataFrame no formato configurado e remove a versão do outro formato,
+    para que a tabela do catálogo não encontre CSV e Parquet misturados no mesmo prefixo
+    """
+    chave = chave_no_formato(key, formato)
+    if formato == 'parquet':
+        salvar_parquet_no_s3(df, bucket, chave)
+    else:
+        salvar_csv_no_s3(df, bucket, chave)
+
+    for outro_formato in FORMATOS_SUPORTADOS:
+        if outro_formato != formato:
+            s3_client.delete_object(Bucket=bucket, Key=chave_no_formato(key, outro_formato))
+    return chave
+
+
+# Início de cada estação como ordinal mês*100+dia (hemisfério sul)
+INICIO_ESTACOES = np.array([321, 621, 922, 1221])
+ESTACOES = ['VERAO', 'OUTONO', 'INVERNO', 'PRIMAVERA']
+# Código da categoria para cada intervalo entre os inícios de estação;
+# o último intervalo (a partir de 21/12) volta a ser verão
+CODIGOS_ESTACAO = np.array([0, 1, 2, 3, 0], dtype=np.int8)
+
+# Limites das faixas de temperatura em °C (fechados à esquerda)
+LIMITES_TEMP = [-np.inf, 10, 17, 24, 30, np.inf]
+CLASSES_TEMP = ['MUITO_FRIO', 'FRIO', 'AGRADAVEL', 'QUENTE', 'MUITO_QUENTE']
+
+
+def remover_do_s3(bucket, keys):
+    """Remove uma lista de chaves do S3 em lotes de até 1000"""
+    keys = list(keys)
+    for inicio in range(0, len(keys), 1000):
+        s3_client.delete_objects(
+            Bucket=bucket,
+            Delete={'Objects': [{'Key': key} for key in keys[inicio:inicio + 1000]], 'Quiet': True}
+        )
+
+
+def listar_objetos_s3(bucket, prefixo):
+    """Lista todas as chaves do prefixo (com paginação) e seus ETags"""
+    objetos = {}
+    paginador = s3_client.get_paginator('list_objects_v2')
+    for pagina in paginador.paginate(Bucket=bucket, Prefix=prefixo):
+        for obj in pagina.get('Contents', []):
+            objetos[obj['Key']] = obj['ETag']
+    return objetos
+
+
+def ler_manifesto(bucket, key):
+    """Lê o manifesto de entradas processadas (vazio na primeira execução)"""
+    try:
+        obj = s3_client.get_object(Bucket=bucket, Key=key)
+        return json.loads(obj['Body'].read())
+    except s3_client.exceptions.NoSuchKey:
+        return {'entradas': {}}
+
+
+def salvar_manifesto(bucket, key, manifesto):
+    """Grava o manifesto de entradas processadas no S3"""
+    manifesto['atualizado_em'] = datetime.now(timezone.utc).isoformat()
+    s3_client.put_object(
+        Bucket=bucket,
+        Key=key,
+        Body=json.dumps(manifesto, indent=2, ensure_ascii=False).encode('utf-8'),
+        ContentType='application/json'
+    )
+
+
+def chave_particao(prefixo, ano, mes, nome_arquivo, formato):
+    """Monta a chave de uma partição no estilo Hive (ano=/mes=)"""
+    return f"{prefixo}/ano={ano}/mes={mes:02d}/{nome_arquivo}.{formato}"
+
+
+def dividir_por_particao(df, coluna_data):
+    """Agrupa o DataFrame por ano e mês da coluna de data"""
+    datas = codec_datas.para_timestamp(df[coluna_data])
+    for (ano, mes), df_particao in df.groupby([datas.dt.year, datas.dt.month], sort=True):
+        yield int(ano), int(mes), df_particao
+
+
+@metricas.medir
 def criar_coluna_estacao(df, coluna_data):
-    """Cria coluna com estação do ano baseada na data"""
-    def _definir_estacao_logica(data):
-        if pd.isna(data):
-            return pd.NA
-        mes = data.month
-        dia = data.day
-        if (mes == 12 and dia >= 21) or (mes in [1, 2]) or (mes == 3 and dia < 21):
-            return "VERAO"
-        elif (mes == 3 and dia >= 21) or (mes in [4, 5]) or (mes == 6 and dia < 21):
-            return "OUTONO"
-        elif (mes == 6 and dia >= 21) or (mes in [7, 8]) or (mes == 9 and dia < 22):
-            return "INVERNO"
-        elif (mes == 9 and dia >= 22) or (mes in [10, 11]) or (mes == 12 and dia < 21):
-            return "PRIMAVERA"
-        else:
-            return pd.NA
+    """Cria coluna categórica com a estação do ano baseada na data"""
+    coluna_dt = codec_datas.para_timestamp(df[coluna_data])
+    
+    ordinal = (coluna_dt.dt.month * 100 + coluna_dt.dt.day).to_numpy(dtype='float64', na_value=np.nan)
+    intervalo = np.searchsorted(INICIO_ESTACOES, ordinal, side='right')
+    codigos = np.where(np.isnan(ordinal), -1, CODIGOS_ESTACAO[intervalo])
     
-    coluna_dt = pd.to_datetime(df[coluna_data], format='%d/%m/%Y', errors='coerce')
-    df['ESTACAO_ANO'] = coluna_dt.apply(_definir_estacao_logica)
+    df['ESTACAO_ANO'] = pd.Categorical.from_codes(codigos, categories=ESTACOES)
     return df
 
 
+@metricas.medir
 def criar_coluna_classificacao_temp(df, coluna_temp):
     """Classifica temperatura em categorias"""
-    def _classificar_temp_logica(temp):
-        if pd.isna(temp) or not isinstance(temp, (int, float)):
-            return pd.NA
-        if temp < 10:
-            return "MUITO_FRIO"
-        elif 10 <= temp < 17:
-            return "FRIO"
-        elif 17 <= temp < 24:
-            return "AGRADAVEL"
-        elif 24 <= temp < 30:
-            return "QUENTE"
-        elif temp >= 30:
-            return "MUITO_QUENTE"
-        else:
-            return pd.NA
-    
-    df['CLASSIFICACAO_TEMP'] = df[coluna_temp].apply(_classificar_temp_logica)
+    temperatura = pd.to_numeric(df[coluna_temp], errors='coerce')
+    df['CLASSIFICACAO_TEMP'] = pd.cut(
+        temperatura,
+        bins=LIMITES_TEMP,
+        labels=CLASSES_TEMP,
+        right=False
+    )
     return df
 
 
+@metricas.medir
 def preparar_df_clima(df_clima):
     """Prepara DataFrame de clima para o merge"""
-    # Garantir que temperatura é numérica
-    coluna_limpa = df_clima['TEMP_AR_C'].astype(str).str.replace(',', '.', regex=False)
-    df_clima['TEMP_AR_C'] = pd.to_numeric(coluna_limpa, errors='coerce')
-    
-    # Criar coluna de data/hora completa
-    df_clima['DATA_HORA_CLIMA'] = df_clima['DATA'] + ' ' + df_clima['HORA_UTC']
-    df_clima['DATA_HORA_CLIMA'] = pd.to_datetime(
-        df_clima['DATA_HORA_CLIMA'], 
-        format='%d/%m/%Y %H:%M', 
-        errors='coerce'
+    # TEMP_AR_C já chega numérica (float32) e DATA como timestamp pelo
+    # esquema da zona TRUSTED; a hora (24 valores distintos) é somada à data
+    df_clima['DATA_HORA_CLIMA'] = (
+        codec_datas.para_timestamp(df_clima['DATA'])
+        + codec_datas.hora_em_timedelta(df_clima['HORA_UTC'])
     )
     
     # Criar chave de hora para o merge
@@ -110,21 +298,338 @@ def preparar_df_clima(df_clima):
     return df_clima.drop(columns=['DATA', 'HORA_UTC'])
 
 
+@metricas.medir
 def preparar_df_med(df_med, coluna_base):
     """Prepara DataFrame médico para o merge"""
-    # Converter coluna base para datetime
-    df_med[coluna_base] = pd.to_datetime(
-        df_med[coluna_base], 
-        format='%d/%m/%Y %H:%M:%S', 
-        errors='coerce'
-    )
+    # A coluna base já chega como timestamp pelo esquema da zona TRUSTED
+    df_med[coluna_base] = codec_datas.para_timestamp(df_med[coluna_base])
     
     # Criar chave de hora (arredondada para a hora) para o merge
-    df_med['CHAVE_HORA'] = df_med[coluna_base].dt.floor('H')
+    df_med['CHAVE_HORA'] = df_med[coluna_base].dt.floor('h')
     
     return df_med
 
 
+def para_int64(serie):
+    """Codifica timestamps como inteiros (ns desde a época); NaT vira o menor int64"""
+    return serie.astype('datetime64[ns]').to_numpy().view('int64')
+
+
+def juntar_por_proximidade(df_med, df_clima, coluna_med, coluna_clima, direcao, tolerancia_min):
+    """
+    Junção as-of entre consultas e leituras de clima sobre timestamps int64
+    As leituras são ordenadas uma única vez e cada consulta localiza a sua
+    por busca binária: a anterior ('backward') ou a mais próxima ('nearest')
+    dentro da tolerância. A ordem das consultas é mantida e as que ficam
+    sem leitura recebem nulos, como no merge exato com how='left'
+    """
+    # A chave horária do clima só serve à junção exata
+    direita = df_clima.dropna(subset=[coluna_clima]).drop(columns=['CHAVE_HORA'])
+    chaves_clima = para_int64(direita[coluna_clima])
+    ordem = np.argsort(chaves_clima, kind='stable')
+    direita = direita.iloc[ordem].reset_index(drop=True)
+    chaves_clima = chaves_clima[ordem]
+    
+    if len(chaves_clima) == 0:
+        # Sem leituras: todas as consultas ficam sem clima, como no merge exato
+        clima_alinhado = direita.reindex(np.full(len(df_med), -1))
+        clima_alinhado.index = df_med.index
+        return pd.concat([df_med, clima_alinhado], axis=1)
+    
+    chaves_med = para_int64(df_med[coluna_med])
+    med_valida = df_med[coluna_med].notna().to_numpy()
+    tolerancia_ns = int(tolerancia_min * 60 * 1_000_000_000)
+    
+    # Leitura anterior (ou no mesmo instante) de cada consulta
+    posicao = np.searchsorted(chaves_clima, chaves_med, side='right') - 1
+    distancia = chaves_med - chaves_clima[np.clip(posicao, 0, None)]
+    distancia[posicao < 0] = np.iinfo('int64').max
+    
+    if direcao == 'nearest':
+        # Compara com a leitura seguinte; em caso de empate fica a anterior
+        seguinte = posicao + 1
+        tem_seguinte = seguinte < len(chaves_clima)
+        distancia_seguinte = np.full(len(chaves_med), np.iinfo('int64').max)
+        distancia_seguinte[tem_seguinte] = chaves_clima[seguinte[tem_seguinte]] - chaves_med[tem_seguinte]
+        usar_seguinte = distancia_seguinte < distancia
+        posicao = np.where(usar_seguinte, seguinte, posicao)
+        distancia = np.where(usar_seguinte, distancia_seguinte, distancia)
+    
+    casou = med_valida & (posicao >= 0) & (distancia <= tolerancia_ns)
+    clima_alinhado = direita.reindex(np.where(casou, posicao, -1))
+    clima_alinhado.index = df_med.index
+    
+    return pd.concat([df_med, clima_alinhado], axis=1)
+
+
+@metricas.medir
+def integrar_med_clima(df_med, df_clima, estrategia, tolerancia_min):
+    """Integra consultas e clima pela estratégia de junção configurada"""
+    if estrategia == 'exata':
+        return pd.merge(df_med, df_clima, on='CHAVE_HORA', how='left')
+    return juntar_por_proximidade(
+        df_med,
+        df_clima,
+        'SCHEDULEDDAY',
+        'DATA_HORA_CLIMA',
+        ESTRATEGIAS_JUNCAO[estrategia],
+        tolerancia_min
+    )
+
+
+def chave_data(serie):
+    """Chave aaaammdd de timestamps"""
+    return (serie.dt.year * 10_000 + serie.dt.month * 100 + serie.dt.day).astype('int32')
+
+
+def chave_hora(serie):
+    """Chave aaaammddhh de timestamps; NaT vira nulo"""
+    return (
+        serie.dt.year * 1_000_000 + serie.dt.month * 10_000 + serie.dt.day * 100 + serie.dt.hour
+    ).astype('Int64')
+
+
+def valores_naturais(serie):
+    """Valores de uma chave natural comparáveis entre DataFrames (categorias viram texto)"""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.astype('object')
+    return serie
+
+
+def atribuir_chaves(naturais, dim_atual, coluna_natural, coluna_chave):
+    """
+    Chaves substitutas estáveis para os valores naturais (distintos) de uma
+    dimensão: os já presentes na dimensão atual mantêm a chave e os novos
+    recebem as seguintes à maior existente, na ordem em que aparecem
+    """
+    chaves = np.zeros(len(naturais), dtype='int64')
+    existentes = np.zeros(len(naturais), dtype=bool)
+    proxima = 1
+    if dim_atual is not None and len(dim_atual):
+        posicoes = pd.Index(valores_naturais(dim_atual[coluna_natural])).get_indexer(valores_naturais(naturais))
+        existentes = posicoes >= 0
+        chaves[existentes] = dim_atual[coluna_chave].to_numpy()[posicoes[existentes]]
+        proxima = int(dim_atual[coluna_chave].max()) + 1
+    chaves[~existentes] = np.arange(proxima, proxima + (~existentes).sum())
+    return chaves
+
+
+def buscar_chaves(valores, dim, coluna_natural, coluna_chave):
+    """Chave da dimensão para cada valor natural; valores fora da dimensão ficam nulos"""
+    posicoes = pd.Index(valores_naturais(dim[coluna_natural])).get_indexer(valores_naturais(valores))
+    encontradas = posicoes >= 0
+    chaves = pd.Series(pd.NA, index=valores.index, dtype='Int64')
+    chaves[encontradas] = dim[coluna_chave].to_numpy()[posicoes[encontradas]]
+    return chaves
+
+
+def chave_dimensao(tabela):
+    """Chave do arquivo único de uma dimensão no bucket refined"""
+    return f"{PREFIXO_ESTRELA}/{tabela}/{tabela}.parquet"
+
+
+def ler_dimensao_atual(bucket, tabela):
+    """Dimensão gravada na execução anterior (None na primeira execução)"""
+    key = chave_dimensao(tabela)
+    if key not in listar_objetos_s3(bucket, key):
+        return None
+    return ler_parquet_do_s3(bucket, key)
+
+
+@metricas.medir
+def montar_dim_paciente(df, dim_atual, incremental):
+    """
+    Um registro por paciente, com os atributos da consulta mais recente
+    No modo incremental os pacientes ausentes das partições integradas
+    continuam na dimensão
+    """
+    pacientes = df[df['PATIENTID'].notna()]
+    dim = pd.DataFrame({
+        'patient_id': pacientes['PATIENTID'],
+        'genero': pacientes['GENDER'],
+        'tem_bolsa': pacientes['SCHOLARSHIP'],
+        'tem_hipertensao': pacientes['HIPERTENSION'],
+        'tem_diabetes': pacientes['DIABETES'],
+        'tem_deficiencia': pacientes['HANDCAP'],
+        'faixa_etaria': pd.cut(pacientes['AGE'], bins=LIMITES_FAIXA_ETARIA, labels=FAIXAS_ETARIAS, right=False),
+        'ultima_consulta': pacientes['APPOINTMENTDAY'],
+    })
+    if incremental and dim_atual is not None:
+        dim = pd.concat([dim_atual.drop(columns=['patient_key']), dim], ignore_index=True)
+    
+    # A consulta mais recente vence; em empates, a lida por último
+    dim = dim.sort_values('ultima_consulta', kind='stable').drop_duplicates('patient_id', keep='last')
+    dim.insert(0, 'patient_key', atribuir_chaves(dim['patient_id'], dim_atual, 'patient_id', 'patient_key'))
+    dim = dim.sort_values('patient_key', ignore_index=True)
+    return esquemas.aplicar_esquema(dim, esquemas.DIM_PACIENTE, 'dim_paciente')
+
+
+@metricas.medir
+def montar_dim_data(df, dim_atual, incremental):
+    """Um registro por dia de agendamento ou de consulta"""
+    datas = [df['SCHEDULEDDAY'].dt.normalize(), df['APPOINTMENTDAY'].dt.normalize()]
+    if incremental and dim_atual is not None:
+        datas.append(dim_atual['data_completa'])
+    datas = pd.Series(pd.concat(datas).dropna().unique()).sort_values(ignore_index=True)
+    
+    dim = criar_coluna_estacao(pd.DataFrame({'data_completa': datas}), 'data_completa')
+    dia_semana = datas.dt.dayofweek + 1
+    dim = dim.assign(
+        data_key=chave_data(datas),
+        ano=datas.dt.year,
+        mes=datas.dt.month,
+        dia=datas.dt.day,
+        dia_semana=dia_semana,
+        trimestre=datas.dt.quarter,
+        estacao_ano=dim['ESTACAO_ANO'],
+        tipo_dia=np.where(dia_semana >= 6, 'FIM_DE_SEMANA', 'DIA_UTIL'),
+    )
+    return esquemas.aplicar_esquema(dim, esquemas.DIM_DATA, 'dim_data')
+
+
+@metricas.medir
+def montar_dim_bairro(df, dim_atual, incremental):
+    """Um registro por bairro"""
+    nomes = pd.Index(df['NEIGHBOURHOOD'].dropna().astype('object').unique())
+    if incremental and dim_atual is not None:
+        nomes = pd.Index(dim_atual['nome_bairro'].astype('object')).append(nomes).unique()
+    dim = pd.DataFrame({
+        'bairro_key': atribuir_chaves(pd.Series(nomes), dim_atual, 'nome_bairro', 'bairro_key'),
+        'nome_bairro': nomes,
+    })
+    dim = dim.sort_values('bairro_key', ignore_index=True)
+    return esquemas.aplicar_esquema(dim, esquemas.DIM_BAIRRO, 'dim_bairro')
+
+
+@metricas.medir
+def montar_dim_clima(df_clima):
+    """Uma leitura horária do INMET por registro (todas, não só as casadas com consultas)"""
+    clima = df_clima.dropna(subset=['DATA_HORA_CLIMA']).sort_values('DATA_HORA_CLIMA', kind='stable')
+    dim = pd.DataFrame({
+        'clima_key': chave_hora(clima['DATA_HORA_CLIMA']),
+        'data_hora_clima': clima['DATA_HORA_CLIMA'],
+        'temperatura_media': clima['TEMP_AR_C'],
+        'temperatura_maxima': clima['TEMP_MAX_C'],
+        'temperatura_minima': clima['TEMP_MIN_C'],
+        'umidade_relativa': clima['UMIDADE_RELATIVA'],
+        'precipitacao_mm': clima['PRECIPITACAO_MM'],
+        'classificacao_temp': clima['CLASSIFICACAO_TEMP'],
+        'estacao_ano': clima['ESTACAO_ANO'],
+    })
+    dim = dim.drop_duplicates('clima_key', keep='last').reset_index(drop=True)
+    return esquemas.aplicar_esquema(dim, esquemas.DIM_CLIMA, 'dim_clima')
+
+
+@metricas.medir
+def montar_fato_consultas(df, dim_paciente, dim_bairro):
+    """Uma linha por consulta, com as chaves das dimensões e as medidas"""
+    no_show = df['NO-SHOW'].to_numpy()
+    fato = pd.DataFrame({
+        'appointment_id': df['APPOINTMENTID'],
+        'patient_key': buscar_chaves(df['PATIENTID'], dim_paciente, 'patient_id', 'patient_key'),
+        'data_agendamento_key': chave_data(df['SCHEDULEDDAY']),
+        'data_consulta_key': chave_data(df['APPOINTMENTDAY']),
+        'bairro_key': buscar_chaves(df['NEIGHBOURHOOD'], dim_bairro, 'nome_bairro', 'bairro_key'),
+        'clima_key': chave_hora(df['DATA_HORA_CLIMA']),
+        'idade': df['AGE'],
+        'compareceu': 1 - no_show,
+        'sms_recebido': df['SMS_RECEIVED'],
+        'qtd_consultas': 1,
+        'qtd_no_shows': no_show,
+    }, index=df.index)
+    return esquemas.aplicar_esquema(fato, esquemas.FATO_CONSULTAS, 'fato_consultas')
+
+
+@metricas.medir
+def gravar_modelagem_estrela(df_final, df_clima, bucket, banco, incremental):
+    """
+    Monta as dimensões e o fato a partir dos dados integrados, grava tudo
+    em Parquet no bucket refined e publica as tabelas no catálogo
+    No modo incremental as dimensões são mescladas com as atuais e só as
+    partições do fato presentes nos dados integrados são regravadas; no
+    completo as partições que deixaram de existir são removidas
+    Retorna a quantidade de registros de cada tabela gravada
+    """
+    # Dimensões atuais: as chaves substitutas continuam as mesmas entre execuções
+    leituras = {
+        tabela: (lambda tabela=tabela: ler_dimensao_atual(bucket, tabela))
+        for tabela in ('dim_paciente', 'dim_bairro', 'dim_data')
+    }
+    atuais = transferencias_s3.executar_em_paralelo(leituras)
+    
+    tabelas = {
+        'dim_paciente': montar_dim_paciente(df_final, atuais['dim_paciente'], incremental),
+        'dim_data': montar_dim_data(df_final, atuais['dim_data'], incremental),
+        'dim_bairro': montar_dim_bairro(df_final, atuais['dim_bairro'], incremental),
+        'dim_clima': montar_dim_clima(df_clima),
+    }
+    fato = montar_fato_consultas(df_final, tabelas['dim_paciente'], tabelas['dim_bairro'])
+    tabelas['fato_consultas'] = fato
+    
+    gravacoes = {
+        chave_dimensao(tabela): (lambda tabela=tabela: salvar_parquet_no_s3(tabelas[tabela], bucket, chave_dimensao(tabela)))
+        for tabela in tabelas if tabela != 'fato_consultas'
+    }
+    prefixo_fato = f"{PREFIXO_ESTRELA}/fato_consultas"
+    ano = fato['data_consulta_key'] // 10_000
+    mes = fato['data_consulta_key'] // 100 % 100
+    for (ano_particao, mes_particao), df_particao in fato.groupby([ano, mes], sort=True):
+        key = chave_particao(prefixo_fato, int(ano_particao), int(mes_particao), 'fato_consultas', 'parquet')
+        gravacoes[key] = lambda key=key, df_particao=df_particao: salvar_parquet_no_s3(df_particao, bucket, key)
+    transferencias_s3.executar_em_paralelo(gravacoes)
+    
+    particoes = [key for key in listar_objetos_s3(bucket, f"{prefixo_fato}/ano=") if key.endswith('.parquet')]
+    if not incremental:
+        obsoletas = [key for key in particoes if key not in gravacoes]
+        remover_do_s3(bucket, obsoletas)
+        particoes = [key for key in particoes if key in gravacoes]
+    
+    # A projeção de partições do fato cobre os anos gravados
+    anos = catalogo_glue.intervalo_anos(particoes)
+    for tabela, esquema in TABELAS_ESTRELA.items():
+        definicao = catalogo_glue.definicao_tabela(
+            tabela,
+            esquema,
+            f"s3://{bucket}/{PREFIXO_ESTRELA}/{tabela}/",
+            DESCRICOES_ESTRELA[tabela],
+            anos if tabela == 'fato_consultas' else None
+        )
+        situacao = catalogo_glue.publicar_tabela(glue_client, banco, definicao)
+        print(f"   📚 {banco}.{tabela}: {len(tabelas[tabela])} registros ({situacao})")
+    
+    return {tabela: len(df) for tabela, df in tabelas.items()}
+
+
+@metricas.medir
+def publicar_tabela_refined(bucket, banco, formato, incremental):
+    """
+    Publica clinica_com_clima no catálogo a partir de esquemas.REFINED
+    No modo incremental a projeção de partições cobre os anos gravados;
+    no completo a tabela lê o arquivo único
+    """
+    anos = None
+    if incremental:
+        particoes = [
+            key for key in listar_objetos_s3(bucket, f"{PREFIXO_REFINED_PARTICIONADO}/ano=")
+            if key.endswith(f".{formato}")
+        ]
+        anos = catalogo_glue.intervalo_anos(particoes)
+    definicao = catalogo_glue.definicao_tabela(
+        TABELA_REFINED,
+        esquemas.REFINED,
+        f"s3://{bucket}/{PREFIXO_REFINED_PARTICIONADO}/",
+        DESCRICAO_REFINED,
+        anos,
+        formato
+    )
+    situacao = catalogo_glue.publicar_tabela(glue_client, banco, definicao)
+    print(f"   📚 {banco}.{TABELA_REFINED} ({situacao})")
+    return f"{banco}.{TABELA_REFINED}"
+
+
+@metricas.instrumentar_handler(
+    'refined', s3_client, lambda: os.environ.get('BUCKET_REFINED', BUCKET_REFINED)
+)
 def lambda_handler(event, context):
     """
     Handler principal da Lambda Function
@@ -138,16 +643,99 @@ def lambda_handler(event, context):
     # Usar variáveis de ambiente ou valores padrão
     bucket_trusted = os.environ.get('BUCKET_TRUSTED', BUCKET_TRUSTED)
     bucket_refined = os.environ.get('BUCKET_REFINED', BUCKET_REFINED)
+    formato = os.environ.get('FORMATO_ARQUIVO', FORMATO_ARQUIVO).lower()
+    modo = os.environ.get('MODO_PROCESSAMENTO', MODO_PROCESSAMENTO).lower()
+    incremental = modo == 'incremental'
+    estrategia = os.environ.get('ESTRATEGIA_JUNCAO', ESTRATEGIA_JUNCAO).lower()
+    tolerancia_min = float(os.environ.get('TOLERANCIA_JUNCAO_MIN', TOLERANCIA_JUNCAO_MIN))
+    banco_refined = os.environ.get('BANCO_REFINED', BANCO_REFINED)
+    banco_estrela = os.environ.get('BANCO_ESTRELA', BANCO_ESTRELA)
     
     print(f"\n📦 Buckets configurados:")
     print(f"   TRUSTED: {bucket_trusted}")
     print(f"   REFINED: {bucket_refined}")
+    print(f"   Formato: {formato}")
+    print(f"   Modo de processamento: {modo}")
+    print(f"   Junção: {estrategia} (tolerância {tolerancia_min:g} min)")
+    print(f"   Catálogo: {banco_refined}.{TABELA_REFINED}")
+    print(f"   Modelagem estrela: {banco_estrela}")
+    
+    if formato not in FORMATOS_SUPORTADOS:
+        print(f"\n❌ ERRO: formato não suportado: {formato}")
+        return {
+            'statusCode': 400,
+            'body': f'Formato não suportado: {formato}'
+        }
+    
+    if modo not in MODOS_SUPORTADOS:
+        print(f"\n❌ ERRO: modo de processamento não suportado: {modo}")
+        return {
+            'statusCode': 400,
+            'body': f'Modo de processamento não suportado: {modo}'
+        }
+    
+    if estrategia not in ESTRATEGIAS_JUNCAO:
+        print(f"\n❌ ERRO: estratégia de junção não suportada: {estrategia}")
+        return {
+            'statusCode': 400,
+            'body': f'Estratégia de junção não suportada: {estrategia}'
+        }
     
     # 1. Leitura dos dados do bucket TRUSTED
     try:
         print(f"\n📖 Lendo dados do bucket TRUSTED...")
-        df_med = ler_csv_do_s3(bucket_trusted, CHAVE_MED_TRUSTED)
-        df_clima = ler_csv_do_s3(bucket_trusted, CHAVE_CLIMA_TRUSTED)
+        if incremental:
+            # Partições cujo ETag mudou; se o clima mudou, todas são reintegradas
+            print(f"   🗂️  Manifesto: s3://{bucket_refined}/{CHAVE_MANIFESTO}")
+            manifesto = ler_manifesto(bucket_refined, CHAVE_MANIFESTO)
+            processadas = manifesto['entradas']
+            key_clima = chave_no_formato(CHAVE_CLIMA_TRUSTED, formato)
+            etag_clima = listar_objetos_s3(bucket_trusted, key_clima).get(key_clima)
+            particoes = {
+                key: etag
+                for key, etag in listar_objetos_s3(bucket_trusted, f"{PREFIXO_MED_PARTICIONADO}/ano=").items()
+                if key.endswith(f".{formato}")
+            }
+            if processadas.get(key_clima) != etag_clima:
+                pendentes = particoes
+            else:
+                pendentes = {key: etag for key, etag in particoes.items() if processadas.get(key) != etag}
+            print(f"   {len(pendentes)} de {len(particoes)} partição(ões) a integrar")
+            
+            if not pendentes:
+                print("\n✅ Nenhuma partição alterada desde a última execução")
+                return {
+                    'statusCode': 200,
+                    'body': {
+                        'mensagem': 'Nenhuma partição alterada',
+                        'registros_totais': 0,
+                        'formato': formato,
+                        'modo_processamento': modo,
+                        'arquivos_gerados': []
+                    }
+                }
+            
+            leituras = {
+                key: (lambda key=key: ler_df_do_s3(bucket_trusted, key, formato, ESQUEMA_MED_LIDO))
+                for key in sorted(pendentes)
+            }
+        else:
+            leituras = {
+                CHAVE_MED_TRUSTED: lambda: ler_df_do_s3(bucket_trusted, CHAVE_MED_TRUSTED, formato, ESQUEMA_MED_LIDO)
+            }
+        
+        # Dados médicos e clima são baixados ao mesmo tempo
+        leituras[CHAVE_CLIMA_TRUSTED] = lambda: ler_df_do_s3(
+            bucket_trusted, CHAVE_CLIMA_TRUSTED, formato, ESQUEMA_CLIMA_LIDO
+        )
+        lidos = transferencias_s3.executar_em_paralelo(leituras)
+        df_clima = lidos.pop(CHAVE_CLIMA_TRUSTED)
+        if incremental:
+            df_med = pd.concat(lidos.values(), ignore_index=True)
+            # O concat de categorias diferentes volta para object
+            df_med = esquemas.aplicar_esquema(df_med, ESQUEMA_MED_LIDO, 'partições pendentes')
+        else:
+            df_med = lidos[CHAVE_MED_TRUSTED]
         
     except Exception as e:
         print(f"\n❌ ERRO ao ler dados: {e}")
@@ -191,13 +779,10 @@ def lambda_handler(event, context):
     # 4. Integração (merge) dos dados
     print(f"\n🔗 Integrando dados médicos + clima...")
     try:
-        df_final = pd.merge(
-            df_med_processado, 
-            df_clima_processado, 
-            on='CHAVE_HORA', 
-            how='left'
-        )
-        print(f"   ✅ {len(df_final)} registros integrados")
+        inicio_juncao = time.perf_counter()
+        df_final = integrar_med_clima(df_med_processado, df_clima_processado, estrategia, tolerancia_min)
+        tempo_juncao = time.perf_counter() - inicio_juncao
+        print(f"   ✅ {len(df_final)} registros integrados em {tempo_juncao:.3f}s ({estrategia})")
         
         # Verificar % de match
         registros_com_clima = df_final['TEMP_AR_C'].notna().sum()
@@ -214,26 +799,13 @@ def lambda_handler(event, context):
     # 5. Remoção de colunas desnecessárias
     print(f"\n🧹 Removendo colunas desnecessárias...")
     try:
-        colunas_para_dropar = [
-            'ALCOHOLISM',
-            'PRESSAO_ESTACAO_MB',
-            'PRESSAO_MAX_MB',
-            'PRESSAO_MIN_MB',
-            'RADIACAO_KJ_M2',
-            'TEMP_ORVALHO_C',
-            'TEMP_ORVALHO_MAX_C',
-            'TEMP_ORVALHO_MIN_C',
-            'UMIDADE_MAX',
-            'UMIDADE_MIN',
-            'VENTO_DIRECAO_GRAUS',
-            'VENTO_RAJADA_MAX_MS',
-            'VENTO_VELOCIDADE_MS'
-        ]
-        
-        # Remover apenas colunas que existem
-        colunas_existentes = [col for col in colunas_para_dropar if col in df_final.columns]
-        df_final.drop(colunas_existentes, axis=1, inplace=True)
-        print(f"   ✅ {len(colunas_existentes)} colunas removidas")
+        # As colunas descartadas já não são lidas; aqui só sobra a validação
+        # do resultado contra o esquema da zona REFINED
+        colunas_antes = len(df_final.columns)
+        with metricas.etapa('aplicar_esquema', len(df_final)) as medida:
+            df_final = esquemas.aplicar_esquema(df_final, esquemas.REFINED, 'dados integrados')
+            medida.linhas_saida = len(df_final)
+        print(f"   ✅ {colunas_antes - len(df_final.columns)} colunas removidas")
         
     except Exception as e:
         print(f"\n❌ ERRO ao remover colunas: {e}")
@@ -245,7 +817,25 @@ def lambda_handler(event, context):
     # 6. Salvar no bucket REFINED
     try:
         print(f"\n💾 Salvando no bucket REFINED...")
-        salvar_csv_no_s3(df_final, bucket_refined, CHAVE_REFINED)
+        if incremental:
+            gravacoes = {}
+            for ano, mes, df_particao in dividir_por_particao(df_final, 'APPOINTMENTDAY'):
+                key = chave_particao(PREFIXO_REFINED_PARTICIONADO, ano, mes, NOME_ARQUIVO_REFINED_PARTICAO, formato)
+                gravacoes[key] = lambda key=key, df_particao=df_particao: salvar_df_no_s3(
+                    df_particao, bucket_refined, key, formato
+                )
+            arquivos_gerados = list(transferencias_s3.executar_em_paralelo(gravacoes).values())
+            
+            # A tabela particionada não pode ver o arquivo único ao lado das partições
+            remover_do_s3(bucket_refined, [chave_no_formato(CHAVE_REFINED, f) for f in FORMATOS_SUPORTADOS])
+        else:
+            arquivos_gerados = [salvar_df_no_s3(df_final, bucket_refined, CHAVE_REFINED, formato)]
+            
+            # Partições de execuções incrementais anteriores não podem ficar ao lado do arquivo único
+            remover_do_s3(bucket_refined, listar_objetos_s3(bucket_refined, f"{PREFIXO_REFINED_PARTICIONADO}/ano="))
+        
+        # A definição só muda depois que os arquivos foram gravados
+        tabela_refined = publicar_tabela_refined(bucket_refined, banco_refined, formato, incremental)
         
     except Exception as e:
         print(f"\n❌ ERRO ao salvar: {e}")
@@ -254,7 +844,39 @@ def lambda_handler(event, context):
             'body': f'Erro ao salvar: {str(e)}'
         }
     
-    # 7. Retorno de sucesso
+    # 7. Modelagem estrela (dimensões e fato materializados)
+    try:
+        print(f"\n⭐ Gravando modelagem estrela...")
+        registros_estrela = gravar_modelagem_estrela(
+            df_final, df_clima_processado, bucket_refined, banco_estrela, incremental
+        )
+        
+    except Exception as e:
+        print(f"\n❌ ERRO na modelagem estrela: {e}")
+        return {
+            'statusCode': 500,
+            'body': f'Erro na modelagem estrela: {str(e)}'
+        }
+    
+    # 8. Atualização do manifesto (modo incremental)
+    if incremental:
+        try:
+            # O manifesto só é atualizado depois que todas as partições foram
+            # gravadas e publicadas no catálogo e a modelagem estrela foi
+            # gravada: se algo falhar antes, a próxima execução refaz tudo
+            processadas.update(pendentes)
+            processadas[key_clima] = etag_clima
+            salvar_manifesto(bucket_refined, CHAVE_MANIFESTO, manifesto)
+            print(f"\n🗂️  Manifesto atualizado: {len(processadas)} entradas integradas")
+            
+        except Exception as e:
+            print(f"\n❌ ERRO ao atualizar o manifesto: {e}")
+            return {
+                'statusCode': 500,
+                'body': f'Erro ao atualizar o manifesto: {str(e)}'
+            }
+    
+    # 9. Retorno de sucesso
     print("\n" + "=" * 60)
     print("✅ INTEGRAÇÃO CONCLUÍDA COM SUCESSO!")
     print("=" * 60)
@@ -266,7 +888,13 @@ def lambda_handler(event, context):
             'registros_totais': len(df_final),
             'registros_com_clima': int(registros_com_clima),
             'percentual_match': f"{percentual_match:.2f}%",
+            'estrategia_juncao': estrategia,
+            'tempo_juncao_s': round(tempo_juncao, 3),
             'colunas_finais': len(df_final.columns),
-            'arquivo_gerado': f"s3://{bucket_refined}/{CHAVE_REFINED}"
+            'formato': formato,
+            'modo_processamento': modo,
+            'arquivos_gerados': [f"s3://{bucket_refined}/{key}" for key in arquivos_gerados],
+            'tabela_refined': tabela_refined,
+            'modelagem_estrela': registros_estrela
         }
     }
\ No newline at end of file
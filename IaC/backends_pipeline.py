@@ -0,0 +1,248 @@
+"""
+========================================================================
+Backends do orquestrador do pipeline Beira Mar
+========================================================================
+As etapas de 01run_pipeline.py falam com a AWS só por um backend, com a
+mesma interface nas duas implementações:
+
+- BackendAWS: Lambda, S3, catálogo do Glue e Athena via boto3
+- BackendLocal: simulação em memória, sem credenciais nem rede, para
+  testar o orquestrador (dependências, etapas puladas, falhas, relatório)
+
+No BackendLocal as zonas começam sempre com o mesmo conteúdo e os ETags
+gravados por cada Lambda derivam dos ETags que ela leu: rodar de novo
+sem alterações produz as mesmas entradas (e as etapas são puladas), e
+uma alteração simulada na zona RAW se propaga pelas etapas seguintes.
+As durações são as de uma execução real multiplicadas por escala_tempo.
+========================================================================
+"""
+
+import hashlib
+import json
+import threading
+import time
+
+import boto3
+from botocore.config import Config
+
+
+class FalhaBackend(Exception):
+    """Lambda ou consulta que terminou com erro"""
+
+
+# ------------------------------------------------------
+# AWS
+# ------------------------------------------------------
+class BackendAWS:
+    """Backend real: cada método é uma chamada às APIs da AWS"""
+
+    nome = 'aws'
+
+    def __init__(self):
+        # A invocação síncrona espera a Lambda terminar (timeout de até 900s);
+        # sem novas tentativas, para não executar o ETL duas vezes
+        self.lambda_client = boto3.client(
+            'lambda', config=Config(read_timeout=900, connect_timeout=10, retries={'max_attempts': 0})
+        )
+        configuracao = Config(retries={'max_attempts': 5, 'mode': 'adaptive'})
+        self.s3_client = boto3.client('s3', config=configuracao)
+        self.glue_client = boto3.client('glue', config=configuracao)
+        self.athena_client = boto3.client('athena', config=configuracao)
+
+    def dormir(self, segundos):
+        time.sleep(segundos)
+
+    def invocar_lambda(self, funcao):
+        """Invoca a Lambda e devolve o body da resposta; falha se o statusCode não for 200"""
+        resposta = self.lambda_client.invoke(FunctionName=funcao, Payload=b'{}')
+        retorno = json.loads(resposta['Payload'].read() or b'{}')
+        if resposta.get('FunctionError') or retorno.get('statusCode') != 200:
+            raise FalhaBackend(f"{funcao}: {retorno.get('body') or retorno}")
+        body = retorno.get('body', {})
+        return json.loads(body) if isinstance(body, str) else body
+
+    def configuracao_funcao(self, funcao):
+        """Hash do código e variáveis de ambiente da Lambda"""
+        configuracao = self.lambda_client.get_function_configuration(FunctionName=funcao)
+        return {
+            'codigo': configuracao['CodeSha256'],
+            'variaveis': configuracao.get('Environment', {}).get('Variables', {}),
+        }
+
+    def listar_etags(self, bucket, prefixo=''):
+        """Chaves do prefixo e seus ETags"""
+        etags = {}
+        paginador = self.s3_client.get_paginator('list_objects_v2')
+        for pagina in paginador.paginate(Bucket=bucket, Prefix=prefixo):
+            for objeto in pagina.get('Contents', []):
+                etags[objeto['Key']] = objeto['ETag']
+        return etags
+
+    def iniciar_consulta(self, sql, banco, workgroup):
+        """Inicia a consulta no workgroup (que define o local dos resultados) e devolve o id"""
+        resposta = self.athena_client.start_query_execution(
+            QueryString=sql,
+            QueryExecutionContext={'Database': banco},
+            WorkGroup=workgroup
+        )
+        return resposta['QueryExecutionId']
+
+    def estado_consulta(self, execucao):
+        """(estado, motivo), ex.: ('SUCCEEDED', None) ou ('FAILED', 'TABLE_NOT_FOUND...')"""
+        status = self.athena_client.get_query_execution(QueryExecutionId=execucao)['QueryExecution']['Status']
+        return status['State'], status.get('StateChangeReason')
+
+    def resultado_consulta(self, execucao):
+        """Linhas do resultado (sem o cabeçalho) como listas de textos"""
+        linhas = self.athena_client.get_query_results(QueryExecutionId=execucao)['ResultSet']['Rows']
+        return [[campo.get('VarCharValue') for campo in linha['Data']] for linha in linhas[1:]]
+
+    def tipo_tabela(self, banco, tabela):
+        """TableType da tabela no catálogo, ou None se ela não existe"""
+        try:
+            return self.glue_client.get_table(DatabaseName=banco, Name=tabela)['Table'].get('TableType')
+        except self.glue_client.exceptions.EntityNotFoundException:
+            return None
+
+
+# ------------------------------------------------------
+# Local (simulação)
+# ------------------------------------------------------
+def _etag(*partes):
+    return '"' + hashlib.md5(json.dumps(partes, sort_keys=True).encode('utf-8')).hexdigest() + '"'
+
+
+class BackendLocal:
+    """
+    Simulação do pipeline em memória
+    `falhas`: nomes de Lambdas ou de tabelas (nas consultas) que falham
+    `alteracoes`: chaves do bucket RAW cujo conteúdo muda nesta execução
+    """
+
+    nome = 'local'
+
+    # Duração simulada de cada trabalho em uma execução real, em segundos
+    DURACOES = {
+        'LambdaTratamentoBeiraMar': 70.0,
+        'LambdaRefinedBeiraMar': 110.0,
+        'consulta': 4.0,
+    }
+    LINHAS = {
+        'fato_consultas': 110_527,
+        'dim_paciente': 62_299,
+        'dim_data': 214,
+        'dim_bairro': 81,
+        'dim_clima': 8_784,
+        'clinica_com_clima': 110_527,
+    }
+
+    def __init__(self, buckets, bancos, escala_tempo=0.01, falhas=(), alteracoes=()):
+        self.buckets = buckets
+        self.bancos = bancos
+        self.escala_tempo = escala_tempo
+        self.falhas = set(falhas)
+        self._trava = threading.Lock()
+        self._contador = 0
+        self._consultas = {}
+        self.catalogo = {}
+
+        raw = {
+            'medical_appointments.csv': _etag('medical_appointments.csv'),
+            'clima.csv': _etag('clima.csv'),
+        }
+        self.zonas = {
+            buckets['raw']: raw,
+            buckets['trusted']: {},
+            buckets['refined']: {},
+        }
+        self.lambdas = {
+            'LambdaTratamentoBeiraMar': ('raw', 'trusted', ['clinica/ano=2016/mes=05/medical_appointment_no_show.parquet',
+                                                            'clima/clima.parquet']),
+            'LambdaRefinedBeiraMar': ('trusted', 'refined', [
+                'clinica_com_clima/ano=2016/mes=05/cancelamentos_com_clima.parquet',
+                *[f"star_schema/{tabela}/{tabela}.parquet"
+                  for tabela in ('dim_paciente', 'dim_data', 'dim_bairro', 'dim_clima')],
+                'star_schema/fato_consultas/ano=2016/mes=05/fato_consultas.parquet',
+            ]),
+        }
+        # O conteúdo inicial das zonas seguintes e do catálogo é o de uma
+        # execução anterior, feita antes das alterações
+        for funcao in self.lambdas:
+            self._gravar_saidas(funcao)
+        self._publicar_tabelas()
+        for chave in alteracoes:
+            raw[chave] = _etag(chave, 'alterado')
+
+    def _agora(self):
+        return time.monotonic()
+
+    def _fim_simulado(self, duracao):
+        return self._agora() + duracao * self.escala_tempo
+
+    def dormir(self, segundos):
+        time.sleep(segundos * self.escala_tempo)
+
+    def _gravar_saidas(self, funcao):
+        origem, destino, chaves = self.lambdas[funcao]
+        with self._trava:
+            lidos = self.zonas[self.buckets[origem]]
+            self.zonas[self.buckets[destino]].update(
+                {chave: _etag(funcao, chave, sorted(lidos.items())) for chave in chaves}
+            )
+
+    def _publicar_tabelas(self):
+        with self._trava:
+            self.catalogo[(self.bancos['refined'], 'clinica_com_clima')] = 'EXTERNAL_TABLE'
+            for tabela in ('dim_paciente', 'dim_data', 'dim_bairro', 'dim_clima', 'fato_consultas'):
+                self.catalogo[(self.bancos['estrela'], tabela)] = 'EXTERNAL_TABLE'
+
+    def invocar_lambda(self, funcao):
+        self.dormir(self.DURACOES[funcao])
+        if funcao in self.falhas:
+            raise FalhaBackend(f"{funcao}: falha simulada")
+        if funcao == 'LambdaRefinedBeiraMar':
+            self._publicar_tabelas()
+        _, destino, chaves = self.lambdas[funcao]
+        self._gravar_saidas(funcao)
+        return {
+            'registros_medicos' if destino == 'trusted' else 'registros_totais': self.LINHAS['clinica_com_clima'],
+            'arquivos_gerados': [f"s3://{self.buckets[destino]}/{chave}" for chave in chaves],
+        }
+
+    def configuracao_funcao(self, funcao):
+        origem, destino, _ = self.lambdas[funcao]
+        return {
+            'codigo': _etag('codigo', funcao),
+            'variaveis': {f"BUCKET_{zona.upper()}": self.buckets[zona] for zona in (origem, destino)},
+        }
+
+    def listar_etags(self, bucket, prefixo=''):
+        with self._trava:
+            return {chave: etag for chave, etag in self.zonas[bucket].items() if chave.startswith(prefixo)}
+
+    def iniciar_consulta(self, sql, banco, workgroup):
+        with self._trava:
+            self._contador += 1
+            execucao = f"local-{self._contador:04d}"
+            self._consultas[execucao] = (sql, banco, self._fim_simulado(self.DURACOES['consulta']))
+            return execucao
+
+    def estado_consulta(self, execucao):
+        with self._trava:
+            sql, banco, fim = self._consultas[execucao]
+            if self._agora() < fim:
+                return 'RUNNING', None
+            tabela = sql.rsplit('.', 1)[-1].strip()
+            if tabela in self.falhas:
+                return 'FAILED', f"falha simulada em {tabela}"
+            if (banco, tabela) not in self.catalogo:
+                return 'FAILED', f"TABLE_NOT_FOUND: {banco}.{tabela}"
+            return 'SUCCEEDED', None
+
+    def resultado_consulta(self, execucao):
+        sql, _, _ = self._consultas[execucao]
+        return [[str(self.LINHAS[sql.rsplit('.', 1)[-1].strip()])]]
+
+    def tipo_tabela(self, banco, tabela):
+        with self._trava:
+            return self.catalogo.get((banco, tabela))
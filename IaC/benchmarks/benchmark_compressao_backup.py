@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+========================================================================
+Benchmark: codecs de compressão do backup do banco de dados
+========================================================================
+Comprime uma amostra de dump com cada codec de scripts/backup_codecs.py
+(gzip, pigz, zstd) nos níveis pedidos e mostra vazão de compressão, taxa
+de compressão e vazão de descompressão. A amostra é lida em blocos do
+mesmo tamanho usado pelo backup_database.py, como o stdout do dump.
+
+Sem --amostra, gera um dump SQL sintético (INSERTs de consultas) com o
+tamanho de --tamanho-mb. Codecs cujo pacote não está instalado (zstd)
+são pulados.
+
+Uso:
+    python benchmarks/benchmark_compressao_backup.py [--amostra dump.sql] [--tamanho-mb 256] [--threads 4]
+========================================================================
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+DIRETORIO_SCRIPTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts')
+sys.path.insert(0, DIRETORIO_SCRIPTS)
+
+from backup_codecs import CODECS, DEFAULT_LEVELS, check_codec, default_threads, get_compressor, get_decompressor  # noqa: E402
+
+TAMANHO_BLOCO = 1024 * 1024
+
+BAIRROS = ['JARDIM DA PENHA', 'MATA DA PRAIA', 'PONTAL DE CAMBURI', 'REPUBLICA', 'GOIABEIRAS']
+
+
+def gerar_dump_sintetico(caminho, tamanho_mb, semente=0):
+    """Grava um dump SQL no estilo do mysqldump com ~tamanho_mb MB"""
+    rng = random.Random(semente)
+    limite = tamanho_mb * 1024 * 1024
+    escrito = 0
+    consulta = 5_600_000
+    with open(caminho, 'w') as f:
+        f.write("CREATE TABLE `consultas` (`id` int NOT NULL, `paciente` bigint, `bairro` varchar(64), "
+                "`idade` int, `data` datetime, `faltou` tinyint, PRIMARY KEY (`id`));\n")
+        while escrito < limite:
+            valores = []
+            for _ in range(500):
+                consulta += 1
+                valores.append(
+                    f"({consulta},{rng.randint(10**9, 9 * 10**14)},'{rng.choice(BAIRROS)}',"
+                    f"{rng.randint(0, 99)},'2016-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} "
+                    f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00',{rng.randint(0, 1)})"
+                )
+            linha = f"INSERT INTO `consultas` VALUES {','.join(valores)};\n"
+            f.write(linha)
+            escrito += len(linha)
+
+
+def medir(amostra, codec, nivel, threads):
+    """Comprime e descomprime a amostra em memória; devolve (bytes_in, bytes_out, s_comp, s_desc)"""
+    compressor = get_compressor(codec, nivel, threads)
+    partes = []
+    bytes_in = 0
+    inicio = time.perf_counter()
+    with open(amostra, 'rb') as f:
+        while bloco := f.read(TAMANHO_BLOCO):
+            bytes_in += len(bloco)
+            partes.append(compressor.compress(bloco))
+    partes.append(compressor.flush())
+    segundos_compressao = time.perf_counter() - inicio
+    comprimido = b''.join(partes)
+
+    decompressor = get_decompressor(codec)
+    bytes_descomprimidos = 0
+    inicio = time.perf_counter()
+    for i in range(0, len(comprimido), TAMANHO_BLOCO):
+        bytes_descomprimidos += len(decompressor.decompress(comprimido[i:i + TAMANHO_BLOCO]))
+    bytes_descomprimidos += len(decompressor.flush())
+    segundos_descompressao = time.perf_counter() - inicio
+    if bytes_descomprimidos != bytes_in:
+        raise RuntimeError(f"{codec}: descompressão devolveu {bytes_descomprimidos} de {bytes_in} bytes")
+
+    return bytes_in, len(comprimido), segundos_compressao, segundos_descompressao
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--amostra', help='Dump SQL usado na medição (padrão: sintético)')
+    parser.add_argument('--tamanho-mb', type=int, default=256, help='Tamanho do dump sintético')
+    parser.add_argument('--codecs', nargs='+', choices=CODECS, default=list(CODECS))
+    parser.add_argument('--niveis', nargs='+', type=int, help='Níveis medidos (padrão: o de cada codec)')
+    parser.add_argument('--threads', type=int, default=default_threads())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        amostra = args.amostra
+        if not amostra:
+            amostra = os.path.join(diretorio, 'dump.sql')
+            print(f"Gerando dump sintético de {args.tamanho_mb} MB...")
+            gerar_dump_sintetico(amostra, args.tamanho_mb)
+
+        print(f"\n{'Codec':<8}{'Nível':>6}{'Comprimido':>14}{'Taxa':>8}{'Compressão':>14}{'Descompressão':>16}")
+        for codec in args.codecs:
+            try:
+                check_codec(codec)
+            except RuntimeError as e:
+                print(f"{codec:<8}pulado: {e}")
+                continue
+            for nivel in args.niveis or [DEFAULT_LEVELS[codec]]:
+                bytes_in, bytes_out, s_comp, s_desc = medir(amostra, codec, nivel, args.threads)
+                mb = bytes_in / 1024 / 1024
+                print(
+                    f"{codec:<8}{nivel:>6}{bytes_out / 1024 / 1024:>11.1f} MB{bytes_in / bytes_out:>7.2f}x"
+                    f"{mb / s_comp:>9.1f} MB/s{mb / s_desc:>11.1f} MB/s"
+                )
+        print(f"\nEntrada: {os.path.getsize(amostra) / 1024 / 1024:.1f} MB; {args.threads} threads nos codecs paralelos")
+
+
+if __name__ == '__main__':
+    main()
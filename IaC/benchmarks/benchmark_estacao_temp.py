@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+========================================================================
+Micro-benchmark: estação do ano e classificação de temperatura
+========================================================================
+Compara as versões vetorizadas de criar_coluna_estacao e
+criar_coluna_classificacao_temp (03refined_lambda.py) com a implementação
+anterior baseada em Series.apply, conferindo que os rótulos são iguais.
+
+Uso:
+    python benchmarks/benchmark_estacao_temp.py [--anos 5] [--repeticoes 3]
+========================================================================
+"""
+
+import argparse
+import importlib.util
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+DIRETORIO_IAC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def carregar_lambda_refined():
+    """Importa 03refined_lambda.py (o nome começa com dígito)"""
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    # As Lambdas importam o módulo esquemas, empacotado ao lado delas
+    if DIRETORIO_IAC not in sys.path:
+        sys.path.insert(0, DIRETORIO_IAC)
+    caminho = os.path.join(DIRETORIO_IAC, '03refined_lambda.py')
+    spec = importlib.util.spec_from_file_location('refined_lambda', caminho)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+def estacao_apply(df, coluna_data):
+    """Implementação anterior: uma chamada Python por linha"""
+    def _definir_estacao_logica(data):
+        if pd.isna(data):
+            return pd.NA
+        mes = data.month
+        dia = data.day
+        if (mes == 12 and dia >= 21) or (mes in [1, 2]) or (mes == 3 and dia < 21):
+            return "VERAO"
+        elif (mes == 3 and dia >= 21) or (mes in [4, 5]) or (mes == 6 and dia < 21):
+            return "OUTONO"
+        elif (mes == 6 and dia >= 21) or (mes in [7, 8]) or (mes == 9 and dia < 22):
+            return "INVERNO"
+        elif (mes == 9 and dia >= 22) or (mes in [10, 11]) or (mes == 12 and dia < 21):
+            return "PRIMAVERA"
+        else:
+            return pd.NA
+
+    coluna_dt = pd.to_datetime(df[coluna_data], format='%d/%m/%Y', errors='coerce')
+    df['ESTACAO_ANO'] = coluna_dt.apply(_definir_estacao_logica)
+    return df
+
+
+def classificacao_temp_apply(df, coluna_temp):
+    """Implementação anterior: uma chamada Python por linha"""
+    def _classificar_temp_logica(temp):
+        if pd.isna(temp) or not isinstance(temp, (int, float)):
+            return pd.NA
+        if temp < 10:
+            return "MUITO_FRIO"
+        elif 10 <= temp < 17:
+            return "FRIO"
+        elif 17 <= temp < 24:
+            return "AGRADAVEL"
+        elif 24 <= temp < 30:
+            return "QUENTE"
+        elif temp >= 30:
+            return "MUITO_QUENTE"
+        else:
+            return pd.NA
+
+    df['CLASSIFICACAO_TEMP'] = df[coluna_temp].apply(_classificar_temp_logica)
+    return df
+
+
+def gerar_clima(anos, semente=42):
+    """Gera leituras horárias no formato da zona TRUSTED"""
+    rng = np.random.default_rng(semente)
+    horas = pd.date_range('2016-01-01', periods=anos * 365 * 24, freq='h')
+    temperatura = rng.normal(24, 6, len(horas)).round(1)
+    temperatura[rng.random(len(horas)) < 0.02] = np.nan
+    datas = pd.Series(horas.strftime('%d/%m/%Y'))
+    datas[rng.random(len(horas)) < 0.01] = None
+    return pd.DataFrame({'DATA': datas, 'TEMP_AR_C': temperatura})
+
+
+def medir(funcao, df, coluna, repeticoes):
+    """Retorna o menor tempo (s) entre as repetições e o último resultado"""
+    melhor = float('inf')
+    for _ in range(repeticoes):
+        copia = df.copy()
+        inicio = time.perf_counter()
+        resultado = funcao(copia, coluna)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, resultado
+
+
+def mesmos_rotulos(antigo, novo):
+    """Compara as colunas tratando pd.NA/NaN como equivalentes"""
+    return antigo.astype(object).fillna('NA').equals(novo.astype(object).fillna('NA'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--anos', type=int, default=5, help='Anos de leituras horárias')
+    parser.add_argument('--repeticoes', type=int, default=3, help='Repetições por medição')
+    args = parser.parse_args()
+
+    refined = carregar_lambda_refined()
+    df = gerar_clima(args.anos)
+    print(f"Leituras horárias: {len(df)}")
+
+    casos = [
+        ('ESTACAO_ANO', 'DATA', estacao_apply, refined.criar_coluna_estacao),
+        ('CLASSIFICACAO_TEMP', 'TEMP_AR_C', classificacao_temp_apply, refined.criar_coluna_classificacao_temp),
+    ]
+
+    print(f"\n{'Coluna':<20}{'apply (s)':>12}{'vetorizado (s)':>16}{'ganho':>10}  rótulos")
+    for coluna_saida, coluna, antiga, nova in casos:
+        tempo_antigo, df_antigo = medir(antiga, df, coluna, args.repeticoes)
+        tempo_novo, df_novo = medir(nova, df, coluna, args.repeticoes)
+        iguais = mesmos_rotulos(df_antigo[coluna_saida], df_novo[coluna_saida])
+        print(
+            f"{coluna_saida:<20}{tempo_antigo:>12.4f}{tempo_novo:>16.4f}"
+            f"{tempo_antigo / tempo_novo:>9.1f}x  {'iguais' if iguais else 'DIFERENTES'}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+"""
+========================================================================
+Benchmark: etapas das Lambdas de tratamento e refined
+========================================================================
+Gera consultas médicas e um arquivo de clima no layout do INMET
+sintéticos, em uma ou mais escalas (--escalas 100k,1M,10M,50M), sobe os
+arquivos em um S3 simulado (moto) e executa, na ordem das Lambdas, cada
+etapa de 02tratamento_lambda.py (leitura, padronizar_*, conversões,
+normalização de texto, esquema, gravação) e de 03refined_lambda.py
+(leitura, criar_coluna_*, preparar_df_*, junção, esquema, gravação e
+montagem das dimensões e do fato da modelagem estrela).
+
+Antes das medidas, confere que a gravação em lotes do tratamento
+(processar_med_em_lotes, Parquet) aceita um lote com mais categorias
+que o primeiro (ex.: bairros novos) e grava o mesmo resultado do
+tratamento do arquivo inteiro.
+
+Para cada etapa mostra o menor tempo entre as repetições e o pico de
+memória alocada durante ela. O pico vem de uma execução extra com o
+tracemalloc (que deixaria os tempos mais lentos): conta os objetos
+Python e os arrays do numpy/pandas, mas não os buffers internos do
+pyarrow (leitura e gravação de Parquet).
+
+Com --baseline, compara com um resultado salvo anteriormente (por
+--salvar-baseline) para a mesma escala e marca como regressão a etapa
+que ficou mais de --tolerancia mais lenta ou maior em memória; nesse
+caso o processo termina com código 1.
+
+As consultas ocupam ~2000 por dia a partir de 01/04/2016 (como no
+dataset original) e o clima tem leituras horárias cobrindo todo o
+período. Os arquivos são gerados em blocos de --bloco linhas, então a
+geração não precisa do dataset inteiro em memória; as etapas sim, como
+nas Lambdas (50M linhas pedem dezenas de GB de RAM).
+
+Uso:
+    python benchmarks/benchmark_etapas_etl.py [--escalas 100k,1M] [--repeticoes 3]
+        [--baseline baseline.json] [--salvar-baseline baseline.json] [--tolerancia 0.2]
+    python benchmarks/benchmark_etapas_etl.py --escalas 1M --apenas-gerar /tmp/dados
+========================================================================
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+DIRETORIO_IAC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BUCKETS = ('raw-beira-mar', 'trusted-beira-mar', 'refined-beira-mar')
+
+BAIRROS = [
+    'JARDIM DA PENHA', 'MATA DA PRAIA', 'PONTAL DE CAMBURI', 'REPÚBLICA',
+    'GOIABEIRAS', 'SÃO PEDRO', 'ANDORINHAS', 'CONQUISTA', 'SANTA MARTHA',
+    'JESUS DE NAZARETH', 'MARUÍPE', 'ILHA DO PRÍNCIPE', 'SÃO CRISTÓVÃO',
+]
+
+# Cabeçalho original do INMET (as Lambdas identificam as colunas pela posição)
+CABECALHO_INMET = [
+    'Data', 'Hora UTC', 'PRECIPITAÇÃO TOTAL, HORÁRIO (mm)',
+    'PRESSAO ATMOSFERICA AO NIVEL DA ESTACAO, HORARIA (mB)',
+    'PRESSÃO ATMOSFERICA MAX.NA HORA ANT. (AUT) (mB)',
+    'PRESSÃO ATMOSFERICA MIN. NA HORA ANT. (AUT) (mB)', 'RADIACAO GLOBAL (Kj/m²)',
+    'TEMPERATURA DO AR - BULBO SECO, HORARIA (°C)', 'TEMPERATURA DO PONTO DE ORVALHO (°C)',
+    'TEMPERATURA MÁXIMA NA HORA ANT. (AUT) (°C)', 'TEMPERATURA MÍNIMA NA HORA ANT. (AUT) (°C)',
+    'TEMPERATURA ORVALHO MAX. NA HORA ANT. (AUT) (°C)',
+    'TEMPERATURA ORVALHO MIN. NA HORA ANT. (AUT) (°C)', 'UMIDADE REL. MAX. NA HORA ANT. (AUT) (%)',
+    'UMIDADE REL. MIN. NA HORA ANT. (AUT) (%)', 'UMIDADE RELATIVA DO AR, HORARIA (%)',
+    'VENTO, DIREÇÃO HORARIA (gr) (° (gr))', 'VENTO, RAJADA MAXIMA (m/s)',
+    'VENTO, VELOCIDADE HORARIA (m/s)', '',
+]
+
+# Média e desvio de cada medição numérica do INMET (colunas 3 a 19)
+MEDICOES_INMET = [
+    (0.2, 1.0), (1010, 4), (1011, 4), (1009, 4), (900, 600), (24, 4), (19, 3),
+    (25, 4), (23, 4), (20, 3), (18, 3), (85, 8), (70, 10), (78, 10), (180, 90),
+    (6, 3), (3, 1.5),
+]
+
+CONSULTAS_POR_DIA = 2000
+INICIO_PERIODO = pd.Timestamp('2016-04-01')
+
+
+def ler_escala(texto):
+    """Converte '100k', '1M' ou '2500000' em número de linhas"""
+    texto = texto.strip().lower().replace('_', '')
+    multiplicador = {'k': 1_000, 'm': 1_000_000}.get(texto[-1:], 1)
+    if multiplicador > 1:
+        texto = texto[:-1]
+    return int(float(texto) * multiplicador)
+
+
+def carregar_lambda(nome_arquivo, nome_modulo):
+    """Importa uma Lambda pelo arquivo (o nome começa com dígito)"""
+    # As Lambdas importam os módulos esquemas, inicializacao e transferencias_s3
+    if DIRETORIO_IAC not in sys.path:
+        sys.path.insert(0, DIRETORIO_IAC)
+    spec = importlib.util.spec_from_file_location(nome_modulo, os.path.join(DIRETORIO_IAC, nome_arquivo))
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+def periodo_em_dias(registros):
+    """Dias cobertos pelas consultas na densidade do dataset original"""
+    return max(1, -(-registros // CONSULTAS_POR_DIA))
+
+
+def gerar_consultas(caminho, registros, bloco, semente=0):
+    """Grava medical_appointments.csv com `registros` linhas, em blocos"""
+    rng = np.random.default_rng(semente)
+    segundos_periodo = periodo_em_dias(registros) * 86400
+    with open(caminho, 'w', newline='') as destino:
+        for inicio in range(0, registros, bloco):
+            n = min(bloco, registros - inicio)
+            agendamento = INICIO_PERIODO + pd.to_timedelta(rng.integers(0, segundos_periodo, n), unit='s')
+            consulta = agendamento.normalize() + pd.to_timedelta(rng.integers(0, 30, n), unit='D')
+            idade = rng.integers(0, 100, n)
+            # Poucas idades inválidas, removidas pelo tratamento
+            idade[rng.random(n) < 0.0001] = -1
+            pd.DataFrame({
+                'PatientId': rng.integers(1e9, 9e14, n).astype(float),
+                'AppointmentID': np.arange(5_600_000 + inicio, 5_600_000 + inicio + n),
+                'Gender': rng.choice(['F', 'M'], n, p=[0.65, 0.35]),
+                'ScheduledDay': agendamento.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                'AppointmentDay': consulta.strftime('%Y-%m-%dT00:00:00Z'),
+                'Age': idade,
+                'Neighbourhood': rng.choice(BAIRROS, n),
+                'Scholarship': rng.integers(0, 2, n),
+                'Hipertension': rng.integers(0, 2, n),
+                'Diabetes': rng.integers(0, 2, n),
+                'Alcoholism': rng.integers(0, 2, n),
+                'Handcap': rng.integers(0, 2, n),
+                'SMS_received': rng.integers(0, 2, n),
+                'No-show': rng.choice(['Yes', 'No'], n, p=[0.2, 0.8]),
+            }).to_csv(destino, index=False, header=inicio == 0)
+
+
+def gerar_clima_inmet(caminho, registros, bloco, semente=1):
+    """
+    Grava o arquivo do INMET com leituras horárias cobrindo o período das
+    consultas: separador ';', vírgula decimal, -9999 nas leituras ausentes
+    e a coluna vazia no fim de cada linha
+    """
+    rng = np.random.default_rng(semente)
+    # Agendamentos até 30 dias antes do início não existem; o clima cobre o período inteiro
+    horas = pd.date_range(INICIO_PERIODO, periods=periodo_em_dias(registros) * 24, freq='h')
+    with open(caminho, 'w', newline='') as destino:
+        destino.write(';'.join(CABECALHO_INMET) + '\n')
+        for inicio in range(0, len(horas), bloco):
+            trecho = horas[inicio:inicio + bloco]
+            n = len(trecho)
+            df = pd.DataFrame({'Data': trecho.strftime('%Y-%m-%d'), 'Hora UTC': trecho.strftime('%H:%M')})
+            for i, (media, desvio) in enumerate(MEDICOES_INMET):
+                valores = np.round(rng.normal(media, desvio, n), 1)
+                valores[rng.random(n) < 0.02] = np.nan
+                df[f'V{i}'] = valores
+            df['Vazia'] = ''
+            df.to_csv(destino, sep=';', decimal=',', na_rep='-9999', index=False, header=False)
+    return len(horas)
+
+
+def gerar_dados_raw(diretorio, registros, bloco):
+    """Gera os dois arquivos da zona RAW em `diretorio`; devolve as linhas de clima"""
+    os.makedirs(diretorio, exist_ok=True)
+    gerar_consultas(os.path.join(diretorio, 'medical_appointments.csv'), registros, bloco)
+    return gerar_clima_inmet(os.path.join(diretorio, 'meteorologia2016.csv'), registros, bloco)
+
+
+class Medidor:
+    """Executa as etapas registrando a duração e, opcionalmente, o pico de memória"""
+
+    def __init__(self, medir_memoria):
+        self.medir_memoria = medir_memoria
+        self.resultados = {}
+
+    def etapa(self, nome, funcao, *args):
+        # As Lambdas imprimem o progresso de cada etapa
+        with contextlib.redirect_stdout(io.StringIO()):
+            if self.medir_memoria:
+                tracemalloc.reset_peak()
+                base = tracemalloc.get_traced_memory()[0]
+            inicio = time.perf_counter()
+            resultado = funcao(*args)
+            duracao = time.perf_counter() - inicio
+            if self.medir_memoria:
+                pico = tracemalloc.get_traced_memory()[1] - base
+        self.resultados[nome] = pico / 1024 / 1024 if self.medir_memoria else duracao
+        return resultado
+
+
+def executar_cadeia(tratamento, refined, medidor, formato, estrategia):
+    """Executa as etapas das duas Lambdas na ordem do lambda_handler de cada uma"""
+    import esquemas
+
+    raw, trusted, refined_bucket = BUCKETS
+    etapa = medidor.etapa
+
+    # 02tratamento_lambda.py: RAW -> TRUSTED
+    df_med = etapa('tratamento.ler_csv_do_s3', tratamento.ler_csv_do_s3,
+                   raw, tratamento.CHAVE_MED, esquemas.MEDICO_RAW)
+    df_clima = etapa('tratamento.ler_clima_do_s3', tratamento.ler_clima_do_s3, raw, tratamento.CHAVE_CLIMA)
+    df_med = etapa('tratamento.padronizar_data_hora[ScheduledDay]',
+                   tratamento.padronizar_data_hora, df_med, 'ScheduledDay')
+    df_med = etapa('tratamento.padronizar_data_hora[AppointmentDay]',
+                   tratamento.padronizar_data_hora, df_med, 'AppointmentDay')
+    df_med = etapa('tratamento.padronizar_colunas', tratamento.padronizar_colunas, df_med)
+    df_med = etapa('tratamento.converter_para_binario', tratamento.converter_para_binario, df_med, 'NO-SHOW')
+    df_med = etapa('tratamento.normalizar_texto', tratamento.normalizar_texto, df_med)
+    df_med = etapa('tratamento.filtrar_idade', lambda df: df[df['AGE'] >= 0], df_med)
+    df_med = etapa('tratamento.aplicar_esquema[medico]', esquemas.aplicar_esquema,
+                   df_med, esquemas.MEDICO_TRUSTED, 'dados médicos')
+    df_clima = etapa('tratamento.padronizar_data2', tratamento.padronizar_data2, df_clima, 'DATA')
+    df_clima = etapa('tratamento.aplicar_esquema[clima]', esquemas.aplicar_esquema,
+                     df_clima, esquemas.CLIMA_TRUSTED, tratamento.CHAVE_CLIMA)
+    etapa('tratamento.salvar_df_no_s3[medico]', tratamento.salvar_df_no_s3,
+          df_med, trusted, tratamento.CHAVE_MED_TRUSTED, formato)
+    etapa('tratamento.salvar_df_no_s3[clima]', tratamento.salvar_df_no_s3,
+          df_clima, trusted, tratamento.CHAVE_CLIMA_TRUSTED, formato)
+    del df_med, df_clima
+
+    # 03refined_lambda.py: TRUSTED -> REFINED
+    df_med = etapa('refined.ler_df_do_s3[medico]', refined.ler_df_do_s3,
+                   trusted, refined.CHAVE_MED_TRUSTED, formato, refined.ESQUEMA_MED_LIDO)
+    df_clima = etapa('refined.ler_df_do_s3[clima]', refined.ler_df_do_s3,
+                     trusted, refined.CHAVE_CLIMA_TRUSTED, formato, refined.ESQUEMA_CLIMA_LIDO)
+    df_clima = etapa('refined.criar_coluna_estacao', refined.criar_coluna_estacao, df_clima, 'DATA')
+    df_clima = etapa('refined.criar_coluna_classificacao_temp',
+                     refined.criar_coluna_classificacao_temp, df_clima, 'TEMP_AR_C')
+    df_clima = etapa('refined.preparar_df_clima', refined.preparar_df_clima, df_clima)
+    df_med = etapa('refined.preparar_df_med', refined.preparar_df_med, df_med, 'SCHEDULEDDAY')
+    df_final = etapa(f'refined.integrar_med_clima[{estrategia}]', refined.integrar_med_clima,
+                     df_med, df_clima, estrategia, refined.TOLERANCIA_JUNCAO_MIN)
+    df_final = etapa('refined.aplicar_esquema[refined]', esquemas.aplicar_esquema,
+                     df_final, esquemas.REFINED, 'dados integrados')
+    etapa('refined.salvar_df_no_s3', refined.salvar_df_no_s3,
+          df_final, refined_bucket, refined.CHAVE_REFINED, formato)
+    # Modelagem estrela (a gravação e o catálogo ficam fora da medida)
+    dim_paciente = etapa('refined.montar_dim_paciente', refined.montar_dim_paciente, df_final, None, False)
+    etapa('refined.montar_dim_data', refined.montar_dim_data, df_final, None, False)
+    dim_bairro = etapa('refined.montar_dim_bairro', refined.montar_dim_bairro, df_final, None, False)
+    etapa('refined.montar_dim_clima', refined.montar_dim_clima, df_clima)
+    etapa('refined.montar_fato_consultas', refined.montar_fato_consultas, df_final, dim_paciente, dim_bairro)
+
+
+def conferir_lotes_com_novas_categorias(tratamento, tamanho_lote=2000):
+    """
+    Grava em lotes um CSV médico cujo primeiro lote tem 5 bairros e o
+    segundo 300 (o primeiro fixa o schema do Parquet) e compara o arquivo
+    gravado com o tratamento do arquivo inteiro; falha se forem diferentes
+    """
+    import boto3
+    import esquemas
+
+    raw, trusted, _ = BUCKETS
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho = os.path.join(diretorio, 'medical_appointments.csv')
+        gerar_consultas(caminho, 2 * tamanho_lote, tamanho_lote)
+        df = pd.read_csv(caminho)
+    bairros = [f"BAIRRO {numero}" for numero in range(300)]
+    df['Neighbourhood'] = (bairros[:5] * tamanho_lote)[:tamanho_lote] + (bairros * tamanho_lote)[:tamanho_lote]
+
+    s3 = boto3.client('s3')
+    chave_raw = '_conferencia/medical_appointments.csv'
+    chave_trusted = '_conferencia/medical_appointment_no_show.parquet'
+    s3.put_object(Bucket=raw, Key=chave_raw, Body=df.to_csv(index=False).encode('utf-8'))
+    with contextlib.redirect_stdout(io.StringIO()):
+        tratamento.processar_med_em_lotes(raw, chave_raw, trusted, chave_trusted, 'parquet', tamanho_lote, 1)
+        esperado, _ = tratamento.tratar_df_med(df.astype(esquemas.MEDICO_RAW))
+    gravado = pd.read_parquet(io.BytesIO(s3.get_object(Bucket=trusted, Key=chave_trusted)['Body'].read()))
+    s3.delete_objects(Bucket=raw, Delete={'Objects': [{'Key': chave_raw}]})
+    s3.delete_objects(Bucket=trusted, Delete={'Objects': [{'Key': chave_trusted}]})
+
+    pd.testing.assert_frame_equal(
+        gravado.astype({'NEIGHBOURHOOD': 'object', 'GENDER': 'object'}),
+        esperado.reset_index(drop=True).astype({'NEIGHBOURHOOD': 'object', 'GENDER': 'object'}),
+        check_dtype=False
+    )
+    print(f"   ✅ Gravação em lotes com categorias novas no 2º lote: {len(gravado):,} registros idênticos")
+
+
+def medir_escala(registros, args):
+    """Gera os dados de uma escala e mede as etapas no S3 simulado"""
+    import boto3
+    from moto import mock_aws
+
+    with tempfile.TemporaryDirectory() as diretorio, mock_aws():
+        inicio = time.perf_counter()
+        linhas_clima = gerar_dados_raw(diretorio, registros, args.bloco)
+        print(f"   {registros:,} consultas e {linhas_clima:,} leituras de clima "
+              f"geradas em {time.perf_counter() - inicio:.1f}s")
+
+        s3 = boto3.client('s3')
+        for bucket in BUCKETS:
+            s3.create_bucket(Bucket=bucket)
+        for arquivo in os.listdir(diretorio):
+            s3.upload_file(os.path.join(diretorio, arquivo), BUCKETS[0], arquivo)
+
+        # O cliente S3 das Lambdas é criado na importação: precisa do moto ativo
+        tratamento = carregar_lambda('02tratamento_lambda.py', 'tratamento_lambda')
+        refined = carregar_lambda('03refined_lambda.py', 'refined_lambda')
+        conferir_lotes_com_novas_categorias(tratamento)
+
+        tempos = {}
+        for _ in range(args.repeticoes):
+            medidor = Medidor(medir_memoria=False)
+            executar_cadeia(tratamento, refined, medidor, args.formato, args.estrategia)
+            for nome, duracao in medidor.resultados.items():
+                tempos[nome] = min(tempos.get(nome, float('inf')), duracao)
+
+        picos = {}
+        if not args.sem_memoria:
+            medidor = Medidor(medir_memoria=True)
+            tracemalloc.start()
+            try:
+                executar_cadeia(tratamento, refined, medidor, args.formato, args.estrategia)
+            finally:
+                tracemalloc.stop()
+            picos = medidor.resultados
+
+    return {
+        nome: {'segundos': round(duracao, 4), **({'pico_mb': round(picos[nome], 1)} if nome in picos else {})}
+        for nome, duracao in tempos.items()
+    }
+
+
+def comparar(atual, anterior, tolerancia, folga_s, folga_mb):
+    """
+    Lista as regressões de uma etapa em relação ao baseline
+    Diferenças abaixo das folgas absolutas são ruído e não contam
+    """
+    regressoes = []
+    if anterior is None:
+        return regressoes
+    for campo, folga, unidade in (('segundos', folga_s, 's'), ('pico_mb', folga_mb, ' MB')):
+        if campo not in atual or campo not in anterior:
+            continue
+        limite = anterior[campo] * (1 + tolerancia)
+        if atual[campo] > limite and atual[campo] - anterior[campo] > folga:
+            regressoes.append(f"{campo}: {anterior[campo]}{unidade} -> {atual[campo]}{unidade}")
+    return regressoes
+
+
+def imprimir(resultado, anterior, args):
+    """Imprime a tabela de uma escala e devolve a quantidade de regressões"""
+    print(f"\n   {'Etapa':<52}{'Tempo (s)':>11}{'Pico (MB)':>11}{'Baseline (s)':>14}{'Variação':>10}")
+    total_regressoes = 0
+    for nome, medida in resultado.items():
+        base = (anterior or {}).get(nome)
+        pico = f"{medida['pico_mb']:>11.1f}" if 'pico_mb' in medida else f"{'-':>11}"
+        if base:
+            variacao = f"{(medida['segundos'] / base['segundos'] - 1) * 100:>+9.0f}%" if base['segundos'] else f"{'-':>10}"
+            coluna_base = f"{base['segundos']:>14.4f}"
+        else:
+            variacao, coluna_base = f"{'-':>10}", f"{'-':>14}"
+        print(f"   {nome:<52}{medida['segundos']:>11.4f}{pico}{coluna_base}{variacao}")
+        for regressao in comparar(medida, base, args.tolerancia, args.folga_s, args.folga_mb):
+            total_regressoes += 1
+            print(f"      ⚠️  REGRESSÃO {regressao}")
+    total = sum(medida['segundos'] for medida in resultado.values())
+    print(f"   {'Total':<52}{total:>11.4f}")
+    return total_regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--escalas', default='100k', help='Linhas de consultas por escala, separadas por vírgula')
+    parser.add_argument('--repeticoes', type=int, default=3, help='Execuções cronometradas por escala')
+    parser.add_argument('--formato', choices=('parquet', 'csv'), default='parquet', help='Formato das zonas')
+    parser.add_argument('--estrategia', choices=('exata', 'anterior', 'proxima'), default='anterior',
+                        help='Estratégia de junção consultas x clima')
+    parser.add_argument('--bloco', type=int, default=1_000_000, help='Linhas geradas por vez')
+    parser.add_argument('--sem-memoria', action='store_true', help='Não mede o pico de memória')
+    parser.add_argument('--baseline', help='Resultado anterior (JSON) para comparar')
+    parser.add_argument('--salvar-baseline', help='Grava o resultado (JSON) para comparações futuras')
+    parser.add_argument('--tolerancia', type=float, default=0.2, help='Piora relativa aceita (0.2 = 20%%)')
+    parser.add_argument('--folga-s', type=float, default=0.05, help='Piora absoluta ignorada, em segundos')
+    parser.add_argument('--folga-mb', type=float, default=5.0, help='Piora absoluta ignorada, em MB')
+    parser.add_argument('--apenas-gerar', metavar='DIRETORIO', help='Só grava os arquivos RAW sintéticos')
+    args = parser.parse_args()
+
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'benchmark')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'benchmark')
+    # As etapas medidas precisam das bibliotecas carregadas, não do preaquecimento
+    os.environ.setdefault('IMPORTACAO_TARDIA', 'false')
+
+    escalas = [ler_escala(escala) for escala in args.escalas.split(',')]
+
+    if args.apenas_gerar:
+        for registros in escalas:
+            destino = os.path.join(args.apenas_gerar, str(registros))
+            linhas_clima = gerar_dados_raw(destino, registros, args.bloco)
+            print(f"{destino}: {registros:,} consultas, {linhas_clima:,} leituras de clima")
+        return 0
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    resultados = {}
+    regressoes = 0
+    for registros in escalas:
+        print(f"\n📏 Escala: {registros:,} consultas ({args.formato}, junção {args.estrategia})")
+        resultados[str(registros)] = medir_escala(registros, args)
+        regressoes += imprimir(resultados[str(registros)], baseline.get(str(registros)), args)
+
+    print(f"\nMenor tempo de {args.repeticoes} execução(ões) por etapa")
+    if args.baseline:
+        print(f"{regressoes} regressão(ões) acima de {args.tolerancia:.0%} em relação a {args.baseline}")
+
+    if args.salvar_baseline:
+        # Mantém as escalas do arquivo que não foram medidas nesta execução
+        salvo = {}
+        if os.path.exists(args.salvar_baseline):
+            with open(args.salvar_baseline) as f:
+                salvo = json.load(f)
+        salvo.update(resultados)
+        with open(args.salvar_baseline, 'w') as f:
+            json.dump(salvo, f, indent=2, ensure_ascii=False)
+        print(f"Baseline gravado em {args.salvar_baseline}")
+
+    return 1 if regressoes else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
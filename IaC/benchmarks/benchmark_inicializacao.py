@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+========================================================================
+Benchmark: cold start das Lambdas de tratamento e refined
+========================================================================
+Mede, em um interpretador novo a cada repetição, o tempo de importação
+de cada Lambda, a primeira invocação (cold start) e uma segunda invocação
+(aquecida), com e sem a importação tardia de pandas/pyarrow
+(IMPORTACAO_TARDIA, ver inicializacao.py).
+
+O S3 é simulado com o moto dentro de cada processo filho; o moto e o
+boto3 são carregados antes da medição, então os tempos refletem só as
+bibliotecas e o código das Lambdas. Como o moto responde em memória, cada
+requisição do cliente da Lambda recebe uma espera fixa (--latencia-s3) que
+simula a latência de rede do S3 real: é ela que a importação em segundo
+plano consegue sobrepor. A zona TRUSTED usada pela refined é gerada por uma
+execução prévia da Lambda de tratamento.
+
+Uso:
+    python benchmarks/benchmark_inicializacao.py [--registros 100000] [--repeticoes 5] [--latencia-s3 0.03]
+========================================================================
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+INICIO_PROCESSO = time.perf_counter()
+
+DIRETORIO_IAC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LAMBDAS = {
+    'tratamento': '02tratamento_lambda',
+    'refined': '03refined_lambda',
+}
+
+BAIRROS = [
+    'JARDIM DA PENHA', 'MATA DA PRAIA', 'PONTAL DE CAMBURI', 'REPÚBLICA',
+    'GOIABEIRAS', 'SÃO PEDRO', 'ANDORINHAS', 'CONQUISTA'
+]
+
+
+def gerar_dados_raw(diretorio, registros, semente=0):
+    """Grava arquivos sintéticos no layout <diretorio>/<bucket>/<key>"""
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(semente)
+    agendamento = pd.Timestamp('2016-04-01') + pd.to_timedelta(rng.integers(0, 60 * 86400, registros), unit='s')
+    consulta = agendamento.normalize() + pd.to_timedelta(rng.integers(0, 30, registros), unit='D')
+    df_med = pd.DataFrame({
+        'PatientId': rng.integers(1e9, 9e14, registros).astype(float),
+        'AppointmentID': np.arange(5_600_000, 5_600_000 + registros),
+        'Gender': rng.choice(['F', 'M'], registros),
+        'ScheduledDay': agendamento.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'AppointmentDay': consulta.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'Age': rng.integers(0, 100, registros),
+        'Neighbourhood': rng.choice(BAIRROS, registros),
+        'Scholarship': rng.integers(0, 2, registros),
+        'Hipertension': rng.integers(0, 2, registros),
+        'Diabetes': rng.integers(0, 2, registros),
+        'Alcoholism': rng.integers(0, 2, registros),
+        'Handcap': rng.integers(0, 2, registros),
+        'SMS_received': rng.integers(0, 2, registros),
+        'No-show': rng.choice(['Yes', 'No'], registros),
+    })
+
+    horas = pd.date_range('2016-01-01', '2016-12-31 23:00', freq='h')
+    n = len(horas)
+    df_clima = pd.DataFrame({'Data': horas.strftime('%Y-%m-%d'), 'Hora UTC': horas.strftime('%H:%M')})
+    for i in range(17):
+        df_clima[f'V{i}'] = np.round(rng.normal(20, 5, n), 1)
+    df_clima['Vazia'] = ''
+
+    destino = os.path.join(diretorio, 'raw-beira-mar')
+    os.makedirs(destino, exist_ok=True)
+    df_med.to_csv(os.path.join(destino, 'medical_appointments.csv'), index=False)
+    df_clima.to_csv(os.path.join(destino, 'meteorologia2016.csv'), sep=';', decimal=',', index=False)
+
+
+def executar_filho(lambda_nome, dados, latencia_s3, exportar=None):
+    """
+    Processo filho: sobe o S3 simulado, importa a Lambda e invoca duas vezes
+    Imprime uma linha JSON com os tempos (em segundos)
+    """
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'benchmark')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'benchmark')
+    sys.path.insert(0, DIRETORIO_IAC)
+
+    import boto3
+    from moto import mock_aws
+
+    with mock_aws():
+        s3 = boto3.client('s3')
+        for bucket in ('raw-beira-mar', 'trusted-beira-mar', 'refined-beira-mar'):
+            s3.create_bucket(Bucket=bucket)
+        for raiz, _, arquivos in os.walk(dados):
+            for arquivo in arquivos:
+                caminho = os.path.join(raiz, arquivo)
+                bucket, key = os.path.relpath(caminho, dados).split(os.sep, 1)
+                with open(caminho, 'rb') as f:
+                    s3.put_object(Bucket=bucket, Key=key.replace(os.sep, '/'), Body=f.read())
+
+        tempos = {'preparacao': time.perf_counter() - INICIO_PROCESSO}
+        inicio = time.perf_counter()
+        modulo = __import__(LAMBDAS[lambda_nome])
+        tempos['importacao'] = time.perf_counter() - inicio
+        modulo.s3_client.meta.events.register(
+            'before-call.s3', lambda **kwargs: time.sleep(latencia_s3)
+        )
+
+        saida = io.StringIO()
+        for invocacao in ('primeira_invocacao', 'invocacao_aquecida'):
+            inicio = time.perf_counter()
+            with contextlib.redirect_stdout(saida):
+                resposta = modulo.lambda_handler({}, None)
+            tempos[invocacao] = time.perf_counter() - inicio
+            if resposta['statusCode'] != 200:
+                raise RuntimeError(f"{lambda_nome} falhou: {resposta['body']}")
+
+        if exportar:
+            for objeto in s3.list_objects_v2(Bucket='trusted-beira-mar').get('Contents', []):
+                caminho = os.path.join(exportar, 'trusted-beira-mar', *objeto['Key'].split('/'))
+                os.makedirs(os.path.dirname(caminho), exist_ok=True)
+                with open(caminho, 'wb') as f:
+                    f.write(s3.get_object(Bucket='trusted-beira-mar', Key=objeto['Key'])['Body'].read())
+
+    print(json.dumps(tempos))
+
+
+def medir(lambda_nome, dados, importacao_tardia, latencia_s3, exportar=None):
+    """Executa um processo filho e devolve os tempos medidos"""
+    ambiente = dict(os.environ, IMPORTACAO_TARDIA='true' if importacao_tardia else 'false')
+    comando = [
+        sys.executable, os.path.abspath(__file__),
+        '--filho', lambda_nome, '--dados', dados, '--latencia-s3', str(latencia_s3)
+    ]
+    if exportar:
+        comando += ['--exportar', exportar]
+    resultado = subprocess.run(comando, env=ambiente, capture_output=True, text=True, check=True)
+    return json.loads(resultado.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--registros', type=int, default=100_000)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--latencia-s3', type=float, default=0.03, help='Segundos por requisição S3')
+    parser.add_argument('--filho', choices=sorted(LAMBDAS), help=argparse.SUPPRESS)
+    parser.add_argument('--dados', help=argparse.SUPPRESS)
+    parser.add_argument('--exportar', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.filho:
+        executar_filho(args.filho, args.dados, args.latencia_s3, args.exportar)
+        return
+
+    with tempfile.TemporaryDirectory() as raw, tempfile.TemporaryDirectory() as trusted:
+        print(f"Gerando {args.registros:,} consultas sintéticas...")
+        gerar_dados_raw(raw, args.registros)
+        # A refined lê a saída da Lambda de tratamento
+        medir('tratamento', raw, False, args.latencia_s3, exportar=trusted)
+        entradas = {'tratamento': raw, 'refined': trusted}
+
+        print(f"\n{'Lambda':<12}{'Modo':<10}{'Importação':>12}{'1ª invocação':>14}{'Cold start':>12}{'Aquecida':>10}")
+        for lambda_nome, dados in entradas.items():
+            for importacao_tardia in (False, True):
+                medicoes = [
+                    medir(lambda_nome, dados, importacao_tardia, args.latencia_s3)
+                    for _ in range(args.repeticoes)
+                ]
+                mediana = {
+                    campo: statistics.median(m[campo] for m in medicoes)
+                    for campo in ('importacao', 'primeira_invocacao', 'invocacao_aquecida')
+                }
+                cold_start = statistics.median(m['importacao'] + m['primeira_invocacao'] for m in medicoes)
+                modo = 'tardia' if importacao_tardia else 'imediata'
+                print(
+                    f"{lambda_nome:<12}{modo:<10}{mediana['importacao']:>11.3f}s"
+                    f"{mediana['primeira_invocacao']:>13.3f}s{cold_start:>11.3f}s"
+                    f"{mediana['invocacao_aquecida']:>9.3f}s"
+                )
+        print(f"\nMedianas de {args.repeticoes} processos novos por linha")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+========================================================================
+Micro-benchmark: normalização de texto dos dados médicos
+========================================================================
+Compara normalizar_texto (02tratamento_lambda.py), que remove acentos e
+converte para maiúsculas uma vez por valor distinto, com a cadeia
+anterior remover_acentos + padronizar_maiusculo aplicada linha a linha,
+conferindo que o resultado é idêntico.
+
+Uso:
+    python benchmarks/benchmark_normalizacao_texto.py [--linhas 2000000]
+========================================================================
+"""
+
+import argparse
+import importlib.util
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+DIRETORIO_IAC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BAIRROS = [
+    'JARDIM DA PENHA', 'MATA DA PRAIA', 'PONTAL DE CAMBURI', 'REPÚBLICA',
+    'GOIABEIRAS', 'SÃO PEDRO', 'ANDORINHAS', 'CONQUISTA', 'SANTA MARTHA',
+    'JESUS DE NAZARETH', 'MARUÍPE', 'ILHA DO PRÍNCIPE', 'SÃO CRISTÓVÃO',
+]
+
+
+def carregar_lambda_tratamento():
+    """Importa 02tratamento_lambda.py (o nome começa com dígito)"""
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    # As Lambdas importam o módulo esquemas, empacotado ao lado delas
+    if DIRETORIO_IAC not in sys.path:
+        sys.path.insert(0, DIRETORIO_IAC)
+    caminho = os.path.join(DIRETORIO_IAC, '02tratamento_lambda.py')
+    spec = importlib.util.spec_from_file_location('tratamento_lambda', caminho)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+def remover_acentos_anterior(df):
+    """Implementação anterior: operações .str sobre todas as linhas"""
+    for coluna in df.columns:
+        if df[coluna].dtype == 'object':
+            df[coluna] = (
+                df[coluna]
+                .astype(str)
+                .str.normalize('NFKD')
+                .str.encode('ascii', errors='ignore')
+                .str.decode('utf-8')
+            )
+    return df
+
+
+def padronizar_maiusculo_anterior(df):
+    """Implementação anterior: operações .str sobre todas as linhas"""
+    for coluna in df.columns:
+        if df[coluna].dtype == 'object':
+            df[coluna] = df[coluna].astype(str).str.upper()
+    return df
+
+
+def gerar_consultas(linhas, semente=42):
+    """Gera as colunas de texto do dataset médico com cardinalidade real"""
+    rng = np.random.default_rng(semente)
+    bairros = np.array(BAIRROS, dtype=object)[rng.integers(0, len(BAIRROS), linhas)]
+    bairros[rng.random(linhas) < 0.001] = np.nan
+    return pd.DataFrame({
+        'GENDER': np.array(['F', 'M'], dtype=object)[rng.integers(0, 2, linhas)],
+        'NEIGHBOURHOOD': bairros,
+        'AGE': rng.integers(0, 100, linhas),
+    })
+
+
+def medir(funcao, df, repeticoes):
+    """Retorna o menor tempo (s) entre as repetições e o último resultado"""
+    melhor = float('inf')
+    for _ in range(repeticoes):
+        copia = df.copy()
+        inicio = time.perf_counter()
+        resultado = funcao(copia)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--linhas', type=int, default=2_000_000, help='Linhas do DataFrame sintético')
+    parser.add_argument('--repeticoes', type=int, default=3, help='Repetições por medição')
+    args = parser.parse_args()
+
+    tratamento = carregar_lambda_tratamento()
+    df = gerar_consultas(args.linhas)
+    print(f"Linhas: {len(df)}")
+
+    tempo_anterior, df_anterior = medir(
+        lambda d: padronizar_maiusculo_anterior(remover_acentos_anterior(d)), df, args.repeticoes
+    )
+    tempo_fundido, df_fundido = medir(tratamento.normalizar_texto, df, args.repeticoes)
+
+    print(f"\n{'Implementação':<42}{'tempo (s)':>12}")
+    print(f"{'remover_acentos + padronizar_maiusculo':<42}{tempo_anterior:>12.4f}")
+    print(f"{'normalizar_texto':<42}{tempo_fundido:>12.4f}")
+    print(f"\nGanho: {tempo_anterior / tempo_fundido:.1f}x")
+    print(f"Resultado idêntico: {'sim' if df_anterior.equals(df_fundido) else 'NÃO'}")
+
+
+if __name__ == '__main__':
+    main()
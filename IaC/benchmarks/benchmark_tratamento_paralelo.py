@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+========================================================================
+Benchmark: cadeia de limpeza dos dados médicos em vários processos
+========================================================================
+Gera consultas médicas sintéticas (como benchmark_etapas_etl.py), lê o
+CSV com os tipos da zona RAW e executa a cadeia de limpeza de
+02tratamento_lambda.py (padronizar_*, converter_para_binario,
+normalizar_texto, filtro de idade, esquema) com 1, 2, 3... processos
+(tratar_df_med_em_processos, ver execucao_paralela.py).
+
+Para cada quantidade de processos mostra o menor tempo entre as
+repetições, o ganho sobre a execução em um processo e a eficiência
+(ganho / processos; perto de 100% é escala quase linear), e confere que
+o resultado é idêntico ao da execução em um processo.
+
+O paralelismo é limitado pelas vCPUs da máquina (mostradas no início) e
+por LINHAS_MINIMAS_POR_PROCESSO: com poucas linhas o módulo usa menos
+processos que os pedidos (coluna "efetivos"). Para reproduzir a Lambda,
+rode em uma máquina (ou container com --cpus) com as mesmas vCPUs da
+memória configurada.
+
+Uso:
+    python benchmarks/benchmark_tratamento_paralelo.py [--registros 2M] [--processos 1,2,4,6]
+        [--repeticoes 3]
+========================================================================
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmark_etapas_etl import carregar_lambda, gerar_consultas, ler_escala
+
+
+def medir(funcao, df, repeticoes):
+    """Menor tempo de `repeticoes` execuções (cada uma sobre uma cópia) e o último resultado"""
+    melhor = None
+    resultado = None
+    for _ in range(repeticoes):
+        entrada = df.copy()
+        inicio = time.perf_counter()
+        resultado = funcao(entrada)
+        duracao = time.perf_counter() - inicio
+        melhor = duracao if melhor is None else min(melhor, duracao)
+    return melhor, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--registros', default='1M', help='Linhas de consultas (ex.: 500k, 2M)')
+    parser.add_argument('--processos', help='Quantidades de processos separadas por vírgula '
+                                            '(padrão: 1, 2, 4... até as vCPUs)')
+    parser.add_argument('--repeticoes', type=int, default=3, help='Execuções cronometradas por quantidade')
+    args = parser.parse_args()
+
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    os.environ.setdefault('IMPORTACAO_TARDIA', 'false')
+
+    tratamento = carregar_lambda('02tratamento_lambda.py', 'tratamento_lambda')
+    esquemas = tratamento.esquemas
+    execucao_paralela = tratamento.execucao_paralela
+
+    vcpus = execucao_paralela.vcpus_disponiveis()
+    if args.processos:
+        quantidades = [int(n) for n in args.processos.split(',')]
+    else:
+        quantidades = sorted({1, vcpus} | {2 ** n for n in range(1, vcpus.bit_length()) if 2 ** n <= vcpus})
+
+    registros = ler_escala(args.registros)
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho = os.path.join(diretorio, 'medical_appointments.csv')
+        gerar_consultas(caminho, registros, 1_000_000)
+        df = pd.read_csv(caminho, usecols=lambda coluna: coluna in esquemas.MEDICO_RAW, dtype=esquemas.MEDICO_RAW)
+
+    print(f"{registros:,} consultas, {vcpus} vCPU(s) disponíveis, "
+          f"mínimo de {execucao_paralela.LINHAS_MINIMAS_POR_PROCESSO:,} linhas por processo\n")
+    print(f"{'Processos':>9}  {'efetivos':>8}  {'tempo (s)':>10}  {'ganho':>7}  {'eficiência':>10}  resultado")
+
+    referencia, (df_referencia, removidos_referencia) = medir(tratamento.tratar_df_med, df, args.repeticoes)
+    for quantidade in quantidades:
+        efetivos = execucao_paralela.definir_processos(len(df), quantidade)
+        duracao, (df_tratado, removidos) = medir(
+            lambda entrada: tratamento.tratar_df_med_em_processos(entrada, quantidade), df, args.repeticoes
+        )
+        try:
+            # A ordem das linhas é a mesma; só o índice é renumerado ao juntar as faixas
+            pd.testing.assert_frame_equal(df_tratado.reset_index(drop=True), df_referencia.reset_index(drop=True))
+            igual = removidos == removidos_referencia
+        except AssertionError:
+            igual = False
+        ganho = referencia / duracao
+        print(f"{quantidade:>9}  {efetivos:>8}  {duracao:>10.3f}  {ganho:>6.2f}x  {ganho / efetivos:>10.0%}  "
+              f"{'idêntico' if igual else 'DIFERENTE'}")
+
+    print(f"\nMenor tempo de {args.repeticoes} execução(ões); ganho sobre tratar_df_med "
+          f"em um processo ({referencia:.3f}s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
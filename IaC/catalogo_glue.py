@@ -0,0 +1,162 @@
+"""
+========================================================================
+Catálogo do Glue das Lambdas Beira Mar
+========================================================================
+Publica no catálogo do Glue (usado pelo Athena) a definição de tabelas
+gravadas pelas próprias Lambdas (Parquet ou CSV), a partir dos esquemas
+de esquemas.py: as colunas chegam com os tipos que foram gravados, sem
+crawler inferindo tipos a cada execução.
+
+Tabelas particionadas por ano=/mes= usam partition projection: o Athena
+calcula as partições a partir do intervalo de anos informado e do
+modelo do caminho, então nenhuma partição precisa ser registrada.
+
+Uma view com o mesmo nome (a modelagem estrela era feita de views) ou
+uma tabela com outras chaves de partição (ex.: criada pelo crawler, ou
+quando o modo de processamento muda) é substituída pela tabela.
+========================================================================
+"""
+
+from datetime import datetime, timezone
+
+import boto3
+from botocore.config import Config
+
+# Tipos do pandas (esquemas.py) -> tipos do catálogo
+TIPOS_GLUE = {
+    'int8': 'tinyint',
+    'int16': 'smallint',
+    'int32': 'int',
+    'int64': 'bigint',
+    # Sem tipos sem sinal no catálogo: uint8 (0 a 255) cabe em smallint
+    'uint8': 'smallint',
+    'Int8': 'tinyint',
+    'Int16': 'smallint',
+    'Int32': 'int',
+    'Int64': 'bigint',
+    'float32': 'float',
+    'float64': 'double',
+    'bool': 'boolean',
+    'category': 'string',
+    'object': 'string',
+    'datetime64[ns]': 'timestamp',
+}
+
+FORMATO_PARQUET = {
+    'InputFormat': 'org.apache.hadoop.hive.ql.io.parquet.MapredParquetInputFormat',
+    'OutputFormat': 'org.apache.hadoop.hive.ql.io.parquet.MapredParquetOutputFormat',
+    'SerdeInfo': {
+        'SerializationLibrary': 'org.apache.hadoop.hive.ql.io.parquet.serde.ParquetHiveSerDe',
+        'Parameters': {'serialization.format': '1'}
+    }
+}
+
+# CSV do pandas (to_csv): separado por vírgula, com cabeçalho; datas saem
+# como 'aaaa-mm-dd hh:mm:ss', ou só 'aaaa-mm-dd' quando a coluna inteira
+# cai à meia-noite (APPOINTMENTDAY), e as duas formas são lidas como timestamp
+FORMATO_CSV = {
+    'InputFormat': 'org.apache.hadoop.mapred.TextInputFormat',
+    'OutputFormat': 'org.apache.hadoop.hive.ql.io.HiveIgnoreKeyTextOutputFormat',
+    'SerdeInfo': {
+        'SerializationLibrary': 'org.apache.hadoop.hive.serde2.lazy.LazySimpleSerDe',
+        'Parameters': {
+            'field.delim': ',',
+            'serialization.format': ',',
+            'timestamp.formats': 'yyyy-MM-dd HH:mm:ss,yyyy-MM-dd',
+        }
+    }
+}
+
+PARTICOES_ANO_MES = [{'Name': 'ano', 'Type': 'int'}, {'Name': 'mes', 'Type': 'int'}]
+
+
+def criar_cliente_glue():
+    """Cliente do Glue com novas tentativas adaptativas (o catálogo limita as chamadas)"""
+    return boto3.client('glue', config=Config(retries={'max_attempts': 5, 'mode': 'adaptive'}))
+
+
+def colunas_glue(esquema):
+    """Colunas do catálogo a partir de um esquema de esquemas.py"""
+    return [{'Name': coluna.lower(), 'Type': TIPOS_GLUE[tipo]} for coluna, tipo in esquema.items()]
+
+
+def projecao_ano_mes(local, anos):
+    """
+    Parâmetros de partition projection para partições ano=/mes=
+    `anos` é o intervalo (primeiro, último) coberto pelos dados
+    """
+    return {
+        'projection.enabled': 'true',
+        'projection.ano.type': 'integer',
+        'projection.ano.range': f"{anos[0]},{anos[1]}",
+        'projection.mes.type': 'integer',
+        'projection.mes.range': '1,12',
+        'projection.mes.digits': '2',
+        'storage.location.template': f"{local}ano=${{ano}}/mes=${{mes}}/",
+    }
+
+
+def intervalo_anos(chaves):
+    """
+    (primeiro, último) ano das chaves de partição .../ano=aaaa/mes=mm/...
+    Sem partições, o ano corrente (a projeção exige um intervalo)
+    """
+    anos = sorted(int(chave.split('ano=')[1].split('/')[0]) for chave in chaves)
+    return (anos[0], anos[-1]) if anos else (datetime.now(timezone.utc).year,) * 2
+
+
+def definicao_tabela(nome, esquema, local, descricao='', anos_particoes=None, formato='parquet'):
+    """
+    TableInput de uma tabela externa em `local` (s3://.../), em Parquet ou CSV
+    Com anos_particoes, a tabela é particionada por ano=/mes= com projeção
+    """
+    if formato == 'parquet':
+        parametros = {'classification': 'parquet', 'EXTERNAL': 'TRUE', 'parquet.compression': 'SNAPPY'}
+        armazenamento = FORMATO_PARQUET
+    else:
+        parametros = {'classification': 'csv', 'EXTERNAL': 'TRUE', 'skip.header.line.count': '1'}
+        armazenamento = FORMATO_CSV
+    definicao = {
+        'Name': nome,
+        'Description': descricao,
+        'TableType': 'EXTERNAL_TABLE',
+        'StorageDescriptor': {
+            'Columns': colunas_glue(esquema),
+            'Location': local,
+            **armazenamento
+        },
+        'PartitionKeys': [],
+        'Parameters': parametros
+    }
+    if anos_particoes is not None:
+        definicao['PartitionKeys'] = PARTICOES_ANO_MES
+        parametros.update(projecao_ano_mes(local, anos_particoes))
+    return definicao
+
+
+def publicar_tabela(cliente, banco, definicao):
+    """
+    Cria ou atualiza a tabela no banco do catálogo
+    Retorna 'criada', 'atualizada', 'substituiu view' ou 'recriada' (as
+    chaves de partição mudaram; o Glue não as altera em update_table)
+    """
+    nome = definicao['Name']
+    try:
+        atual = cliente.get_table(DatabaseName=banco, Name=nome)['Table']
+    except cliente.exceptions.EntityNotFoundException:
+        cliente.create_table(DatabaseName=banco, TableInput=definicao)
+        return 'criada'
+
+    if atual.get('TableType') == 'VIRTUAL_VIEW':
+        cliente.delete_table(DatabaseName=banco, Name=nome)
+        cliente.create_table(DatabaseName=banco, TableInput=definicao)
+        return 'substituiu view'
+
+    chaves = [(coluna['Name'], coluna['Type']) for coluna in atual.get('PartitionKeys', [])]
+    if chaves != [(coluna['Name'], coluna['Type']) for coluna in definicao['PartitionKeys']]:
+        cliente.delete_table(DatabaseName=banco, Name=nome)
+        cliente.create_table(DatabaseName=banco, TableInput=definicao)
+        return 'recriada'
+
+    cliente.update_table(DatabaseName=banco, TableInput=definicao)
+    return 'atualizada'
@@ -0,0 +1,72 @@
+"""
+========================================================================
+Conversão de datas das Lambdas Beira Mar
+========================================================================
+Cada formato de origem é convertido uma única vez, com formato
+explícito (sem inferência linha a linha) e uma vez por valor distinto:
+as datas de consulta, as datas e as horas do INMET se repetem muito, e
+cada valor repetido reaproveita a conversão do primeiro.
+
+Entre as etapas as datas trafegam como timestamps tipados
+(datetime64[ns]; timestamp no Parquet e no Athena), sem voltar a texto:
+as zonas TRUSTED e REFINED não guardam mais o formato brasileiro
+dd/mm/aaaa. Arquivos gravados antes, com datas em texto, continuam
+legíveis por para_timestamp.
+========================================================================
+"""
+
+import inicializacao
+
+pd = inicializacao.importar('pandas')
+
+# Formatos de origem da zona RAW
+FORMATO_ISO_UTC = '%Y-%m-%dT%H:%M:%SZ'  # medical_appointments (2016-04-29T18:38:08Z)
+FORMATO_DATA_INMET = '%Y-%m-%d'
+FORMATO_HORA_INMET = '%H:%M'
+
+# Datas em texto aceitas ao ler as zonas TRUSTED/REFINED: o CSV gravado
+# pelo pandas (sem a hora quando todas são meia-noite) e o formato
+# brasileiro dos arquivos gravados antes dos timestamps tipados
+FORMATOS_TEXTO = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y')
+
+
+def converter(serie, formato, errors='raise'):
+    """
+    Converte texto em timestamps com um formato explícito, uma vez por
+    valor distinto; nulos viram NaT
+    """
+    codigos, unicos = pd.factorize(serie)
+    convertidos = pd.DatetimeIndex(pd.to_datetime(pd.Index(unicos, dtype=object), format=formato, errors=errors))
+    return pd.Series(convertidos.take(codigos, allow_fill=True, fill_value=pd.NaT), index=serie.index, name=serie.name)
+
+
+def para_timestamp(serie, formatos=FORMATOS_TEXTO):
+    """
+    Timestamps de uma coluna já tipada (devolvida como está) ou em texto
+    em um dos formatos conhecidos, tentados em ordem para cada valor distinto
+    Falha se algum valor não nulo não corresponder a nenhum formato
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie
+    codigos, unicos = pd.factorize(serie)
+    unicos = pd.Index(unicos, dtype=object)
+    convertidos = pd.DatetimeIndex([pd.NaT] * len(unicos), dtype='datetime64[ns]')
+    for formato in formatos:
+        pendentes = convertidos.isna()
+        if not pendentes.any():
+            break
+        convertidos = convertidos.where(
+            ~pendentes, pd.to_datetime(unicos.where(pendentes), format=formato, errors='coerce')
+        )
+    if convertidos.isna().any():
+        invalidos = unicos[convertidos.isna()][:5].tolist()
+        raise ValueError(f"Datas fora dos formatos {list(formatos)} em {serie.name}: {invalidos}")
+    return pd.Series(convertidos.take(codigos, allow_fill=True, fill_value=pd.NaT), index=serie.index, name=serie.name)
+
+
+def hora_em_timedelta(serie, formato=FORMATO_HORA_INMET):
+    """Converte horas do dia em texto (18:00) em deslocamentos; inválidas viram NaT"""
+    codigos, unicos = pd.factorize(serie)
+    horas = pd.to_datetime(pd.Index(unicos, dtype=object), format=formato, errors='coerce')
+    deslocamentos = pd.TimedeltaIndex(horas - horas.normalize())
+    return pd.Series(deslocamentos.take(codigos, allow_fill=True, fill_value=pd.NaT), index=serie.index, name=serie.name)
@@ -0,0 +1,248 @@
+"""
+========================================================================
+Esquemas dos datasets do pipeline Beira Mar
+========================================================================
+Definição única das colunas e tipos de cada zona, compartilhada pelas
+Lambdas de tratamento (RAW -> TRUSTED) e de integração (TRUSTED -> REFINED).
+Os leitores usam estes esquemas para carregar apenas as colunas
+necessárias, já com tipos compactos, e para falhar cedo quando o arquivo
+de origem muda de formato. Datas são timestamps tipados a partir da zona
+TRUSTED (ver codec_datas.py).
+========================================================================
+"""
+
+import codec_datas
+
+# ------------------------------------------------------
+# RAW: medical_appointments.csv (cabeçalho original)
+# ------------------------------------------------------
+# PatientId fica em float64: o dataset original tem IDs com parte decimal
+MEDICO_RAW = {
+    'PatientId': 'float64',
+    'AppointmentID': 'int32',
+    'Gender': 'category',
+    'ScheduledDay': 'object',
+    'AppointmentDay': 'object',
+    'Age': 'int16',
+    'Neighbourhood': 'category',
+    'Scholarship': 'uint8',
+    'Hipertension': 'uint8',
+    'Diabetes': 'uint8',
+    'Alcoholism': 'uint8',
+    'Handcap': 'uint8',
+    'SMS_received': 'uint8',
+    'No-show': 'object',
+}
+
+# ------------------------------------------------------
+# RAW: arquivo do INMET (separado por ';', colunas por posição)
+# ------------------------------------------------------
+# Os nomes originais do INMET têm acentos e unidades; as colunas são
+# identificadas pela posição e renomeadas na leitura
+COLUNAS_CLIMA_RAW = [
+    "DATA", "HORA_UTC", "PRECIPITACAO_MM", "PRESSAO_ESTACAO_MB",
+    "PRESSAO_MAX_MB", "PRESSAO_MIN_MB", "RADIACAO_KJ_M2", "TEMP_AR_C",
+    "TEMP_ORVALHO_C", "TEMP_MAX_C", "TEMP_MIN_C", "TEMP_ORVALHO_MAX_C",
+    "TEMP_ORVALHO_MIN_C", "UMIDADE_MAX", "UMIDADE_MIN", "UMIDADE_RELATIVA",
+    "VENTO_DIRECAO_GRAUS", "VENTO_RAJADA_MAX_MS", "VENTO_VELOCIDADE_MS",
+    "DESCARTAR"
+]
+COLUNAS_CLIMA_DESCARTADAS = ["DESCARTAR"]
+# Marcadores de leitura ausente usados pelo INMET (além do campo vazio)
+NA_CLIMA = ['-9999', '-9999,0']
+
+# ------------------------------------------------------
+# TRUSTED: clinica/medical_appointment_no_show
+# ------------------------------------------------------
+MEDICO_TRUSTED = {
+    'PATIENTID': 'float64',
+    'APPOINTMENTID': 'int32',
+    'GENDER': 'category',
+    'SCHEDULEDDAY': 'datetime64[ns]',
+    'APPOINTMENTDAY': 'datetime64[ns]',
+    'AGE': 'int16',
+    'NEIGHBOURHOOD': 'category',
+    'SCHOLARSHIP': 'uint8',
+    'HIPERTENSION': 'uint8',
+    'DIABETES': 'uint8',
+    'ALCOHOLISM': 'uint8',
+    'HANDCAP': 'uint8',
+    'SMS_RECEIVED': 'uint8',
+    'NO-SHOW': 'uint8',
+}
+
+# ------------------------------------------------------
+# TRUSTED: clima/clima
+# ------------------------------------------------------
+CLIMA_TRUSTED = {
+    'DATA': 'datetime64[ns]',
+    'HORA_UTC': 'object',
+    'PRECIPITACAO_MM': 'float32',
+    'PRESSAO_ESTACAO_MB': 'float32',
+    'PRESSAO_MAX_MB': 'float32',
+    'PRESSAO_MIN_MB': 'float32',
+    'RADIACAO_KJ_M2': 'float32',
+    'TEMP_AR_C': 'float32',
+    'TEMP_ORVALHO_C': 'float32',
+    'TEMP_MAX_C': 'float32',
+    'TEMP_MIN_C': 'float32',
+    'TEMP_ORVALHO_MAX_C': 'float32',
+    'TEMP_ORVALHO_MIN_C': 'float32',
+    'UMIDADE_MAX': 'float32',
+    'UMIDADE_MIN': 'float32',
+    'UMIDADE_RELATIVA': 'float32',
+    'VENTO_DIRECAO_GRAUS': 'float32',
+    'VENTO_RAJADA_MAX_MS': 'float32',
+    'VENTO_VELOCIDADE_MS': 'float32',
+}
+
+# Tipos da leitura do arquivo bruto: iguais aos da zona TRUSTED, já que o
+# leitor converte a vírgula decimal e os marcadores de ausência na leitura;
+# só a data chega como texto e é convertida pelo tratamento
+CLIMA_RAW = {**CLIMA_TRUSTED, 'DATA': 'object'}
+
+# ------------------------------------------------------
+# REFINED: clinica_com_clima/cancelamentos_com_clima
+# ------------------------------------------------------
+# Colunas da zona TRUSTED que não chegam à REFINED (nem são lidas por ela)
+COLUNAS_DESCARTADAS_REFINED = [
+    'ALCOHOLISM',
+    'PRESSAO_ESTACAO_MB',
+    'PRESSAO_MAX_MB',
+    'PRESSAO_MIN_MB',
+    'RADIACAO_KJ_M2',
+    'TEMP_ORVALHO_C',
+    'TEMP_ORVALHO_MAX_C',
+    'TEMP_ORVALHO_MIN_C',
+    'UMIDADE_MAX',
+    'UMIDADE_MIN',
+    'VENTO_DIRECAO_GRAUS',
+    'VENTO_RAJADA_MAX_MS',
+    'VENTO_VELOCIDADE_MS'
+]
+
+REFINED = {
+    **{
+        coluna: tipo
+        for coluna, tipo in MEDICO_TRUSTED.items()
+        if coluna not in COLUNAS_DESCARTADAS_REFINED
+    },
+    'CHAVE_HORA': 'datetime64[ns]',
+    'PRECIPITACAO_MM': 'float32',
+    'TEMP_AR_C': 'float32',
+    'TEMP_MAX_C': 'float32',
+    'TEMP_MIN_C': 'float32',
+    'UMIDADE_RELATIVA': 'float32',
+    'ESTACAO_ANO': 'category',
+    'CLASSIFICACAO_TEMP': 'category',
+    'DATA_HORA_CLIMA': 'datetime64[ns]',
+}
+
+# ------------------------------------------------------
+# Modelagem estrela (star_schema_beira_mar), montada pela Lambda REFINED
+# ------------------------------------------------------
+# Nomes em minúsculas, como no catálogo do Glue; as colunas viram a
+# definição das tabelas no catálogo (ver catalogo_glue.py). Chaves de
+# paciente e bairro são substitutas (sequenciais e estáveis entre as
+# execuções); as de data (aaaammdd) e clima (aaaammddhh) derivam do valor
+DIM_PACIENTE = {
+    'patient_key': 'int64',
+    'patient_id': 'float64',
+    'genero': 'category',
+    'tem_bolsa': 'int8',
+    'tem_hipertensao': 'int8',
+    'tem_diabetes': 'int8',
+    'tem_deficiencia': 'int8',
+    'faixa_etaria': 'category',
+    # Data da consulta de onde vieram os atributos (o mais recente vale)
+    'ultima_consulta': 'datetime64[ns]',
+}
+
+DIM_DATA = {
+    'data_key': 'int32',
+    'data_completa': 'datetime64[ns]',
+    'ano': 'int16',
+    'mes': 'int8',
+    'dia': 'int8',
+    'dia_semana': 'int8',  # 1 = segunda ... 7 = domingo, como o DAY_OF_WEEK do Athena
+    'trimestre': 'int8',
+    'estacao_ano': 'category',
+    'tipo_dia': 'category',
+}
+
+DIM_BAIRRO = {
+    'bairro_key': 'int32',
+    'nome_bairro': 'category',
+}
+
+DIM_CLIMA = {
+    'clima_key': 'int64',
+    'data_hora_clima': 'datetime64[ns]',
+    'temperatura_media': 'float32',
+    'temperatura_maxima': 'float32',
+    'temperatura_minima': 'float32',
+    'umidade_relativa': 'float32',
+    'precipitacao_mm': 'float32',
+    'classificacao_temp': 'category',
+    'estacao_ano': 'category',
+}
+
+# Particionada por ano=/mes= da data da consulta; as chaves que podem
+# faltar (consulta sem leitura de clima, paciente sem ID) são anuláveis
+FATO_CONSULTAS = {
+    'appointment_id': 'int32',
+    'patient_key': 'Int64',
+    'data_agendamento_key': 'int32',
+    'data_consulta_key': 'int32',
+    'bairro_key': 'Int32',
+    'clima_key': 'Int64',
+    'idade': 'int16',
+    'compareceu': 'int8',
+    'sms_recebido': 'int8',
+    'qtd_consultas': 'int8',
+    'qtd_no_shows': 'int8',
+}
+
+
+class EsquemaDivergente(ValueError):
+    """Arquivo de origem com colunas diferentes das esperadas"""
+
+
+def colunas_lidas(esquema, descartadas=()):
+    """Colunas do esquema que a etapa precisa ler"""
+    return [coluna for coluna in esquema if coluna not in descartadas]
+
+
+def eh_data(tipo):
+    """Indica se o tipo do esquema é um timestamp"""
+    return tipo.startswith('datetime64')
+
+
+def tipos_csv(esquema):
+    """
+    Tipos para o read_csv: timestamps são lidos como texto e convertidos
+    por aplicar_esquema (o read_csv não aceita datetime64 em dtype)
+    """
+    return {coluna: 'object' if eh_data(tipo) else tipo for coluna, tipo in esquema.items()}
+
+
+def validar_colunas(colunas, esperadas, origem):
+    """Falha cedo se faltar alguma coluna esperada"""
+    faltando = [coluna for coluna in esperadas if coluna not in set(colunas)]
+    if faltando:
+        raise EsquemaDivergente(f"Esquema divergente em {origem}: colunas ausentes {faltando}")
+
+
+def aplicar_esquema(df, esquema, origem):
+    """
+    Reordena as colunas e converte os tipos conforme o esquema
+    Colunas fora do esquema são descartadas; colunas ausentes geram erro
+    Datas em texto (CSV, arquivos anteriores) são convertidas pelo codec
+    """
+    validar_colunas(df.columns, esquema, origem)
+    df = df[list(esquema)]
+    tipos = {coluna: tipo for coluna, tipo in esquema.items() if df[coluna].dtype != tipo}
+    datas = {coluna: codec_datas.para_timestamp(df[coluna]) for coluna, tipo in tipos.items() if eh_data(tipo)}
+    if datas:
+        df = df.assign(**datas)
+    return df.astype(tipos) if tipos else df
@@ -0,0 +1,168 @@
+"""
+========================================================================
+Execução paralela por faixas de linhas das Lambdas Beira Mar
+========================================================================
+Etapas em que cada linha é tratada independentemente das demais podem
+ser divididas em faixas contíguas de linhas, cada uma executada em um
+processo separado, contornando o GIL quando a Lambda tem mais de uma
+vCPU (a Lambda libera vCPUs proporcionalmente à memória: 2 a partir de
+1.769 MB, até 6 com 10.240 MB).
+
+O ambiente da Lambda não tem /dev/shm, então multiprocessing.Pool,
+Queue e shared_memory não funcionam lá. Cada faixa roda em um
+multiprocessing.Process criado por fork e devolve o resultado por um
+Pipe:
+- a entrada não é serializada: o processo filho herda a memória do pai
+  (copiada só sob demanda pelo fork) e lê diretamente a sua faixa
+- a saída volta como um buffer Arrow IPC (colunas contíguas, sem pickle
+  linha a linha); só os valores auxiliares pequenos usam pickle
+Os resultados são devolvidos na ordem das faixas.
+
+O número de processos acompanha as vCPUs disponíveis e cada processo
+recebe pelo menos LINHAS_MINIMAS_POR_PROCESSO linhas; com uma vCPU ou
+poucas linhas a função roda no próprio processo, sem fork.
+========================================================================
+"""
+
+import multiprocessing
+import os
+
+import inicializacao
+
+pd = inicializacao.importar('pandas')
+pa = inicializacao.importar('pyarrow')
+
+# Abaixo disso o fork e a cópia do resultado custam mais que o ganho
+LINHAS_MINIMAS_POR_PROCESSO = 50_000
+
+
+def vcpus_disponiveis():
+    """vCPUs que o processo pode usar (as da Lambda, ou as liberadas pelo cgroup)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def definir_processos(linhas, processos=0, linhas_minimas=LINHAS_MINIMAS_POR_PROCESSO):
+    """
+    Quantidade de processos para `linhas` linhas: `processos` (0 = uma por
+    vCPU disponível), limitada para que cada um receba linhas_minimas
+    """
+    if processos <= 0:
+        processos = vcpus_disponiveis()
+    return max(1, min(processos, linhas // max(1, linhas_minimas)))
+
+
+def faixas(linhas, partes):
+    """Limites (início, fim) de `partes` faixas contíguas de tamanhos próximos"""
+    limites = [linhas * parte // partes for parte in range(partes + 1)]
+    return list(zip(limites[:-1], limites[1:]))
+
+
+def serializar(df):
+    """DataFrame em um buffer Arrow IPC (formato de streaming)"""
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    destino = pa.BufferOutputStream()
+    with pa.ipc.new_stream(destino, tabela.schema) as escritor:
+        escritor.write_table(tabela)
+    return destino.getvalue()
+
+
+def desserializar(buffer):
+    """Buffer Arrow IPC de volta em DataFrame (categorias voltam como category)"""
+    return pa.ipc.open_stream(buffer).read_all().to_pandas()
+
+
+def _executar_faixa(conexao, funcao, df, inicio, fim):
+    """
+    Corpo do processo filho: aplica a função à sua faixa e envia o
+    resultado (DataFrame, ou tupla cujo primeiro item é o DataFrame)
+    """
+    try:
+        resultado = funcao(df.iloc[inicio:fim].copy())
+        if isinstance(resultado, tuple):
+            tabela, extras = resultado[0], resultado[1:]
+        else:
+            tabela, extras = resultado, None
+        buffer = serializar(tabela)
+        conexao.send(('ok', extras))
+        conexao.send_bytes(buffer)
+    except Exception as e:
+        conexao.send(('erro', f"{type(e).__name__}: {e}"))
+    finally:
+        conexao.close()
+
+
+def executar_em_faixas(df, funcao, processos=0, linhas_minimas=LINHAS_MINIMAS_POR_PROCESSO):
+    """
+    Aplica `funcao` a faixas contíguas de linhas do DataFrame em processos
+    paralelos e devolve a lista dos resultados na ordem das faixas
+    A função deve tratar cada linha independentemente das demais e
+    devolver um DataFrame ou uma tupla (DataFrame, valores pequenos)
+    Com um único processo devolve [funcao(df)], executada aqui mesmo
+    """
+    quantidade = definir_processos(len(df), processos, linhas_minimas)
+    if quantidade <= 1:
+        return [funcao(df)]
+
+    contexto = multiprocessing.get_context('fork')
+    filhos = []
+    concluido = False
+    try:
+        for inicio, fim in faixas(len(df), quantidade):
+            leitura, escrita = contexto.Pipe(duplex=False)
+            processo = contexto.Process(
+                target=_executar_faixa,
+                args=(escrita, funcao, df, inicio, fim),
+                daemon=True
+            )
+            processo.start()
+            # Só o filho escreve: sem esta cópia aberta, a leitura recebe
+            # EOF se o filho morrer (ex.: falta de memória)
+            escrita.close()
+            filhos.append((processo, leitura))
+
+        resultados = []
+        for numero, (processo, leitura) in enumerate(filhos, start=1):
+            try:
+                situacao, extras = leitura.recv()
+                if situacao == 'erro':
+                    raise Exception(f"Faixa {numero}/{quantidade}: {extras}")
+                tabela = desserializar(leitura.recv_bytes())
+            except EOFError:
+                processo.join()
+                raise Exception(
+                    f"Faixa {numero}/{quantidade}: processo terminou sem resultado "
+                    f"(código de saída {processo.exitcode})"
+                )
+            resultados.append((tabela, *extras) if extras is not None else tabela)
+        concluido = True
+        return resultados
+    finally:
+        for processo, leitura in filhos:
+            leitura.close()
+            if not concluido:
+                processo.terminate()
+            processo.join()
+
+
+def concatenar(partes):
+    """
+    Junta os DataFrames das faixas em ordem; colunas categóricas continuam
+    categóricas, com as categorias na ordem em que aparecem nas faixas
+    (pd.concat de categorias diferentes voltaria para object)
+    """
+    if len(partes) == 1:
+        return partes[0]
+    primeira = partes[0]
+    for coluna in primeira.columns:
+        if isinstance(primeira[coluna].dtype, pd.CategoricalDtype):
+            categorias = (
+                primeira[coluna].cat.categories
+                .append([parte[coluna].cat.categories for parte in partes[1:]])
+                .unique()
+            )
+            partes = [parte.assign(**{coluna: parte[coluna].cat.set_categories(categorias)}) for parte in partes]
+            primeira = partes[0]
+    return pd.concat(partes, ignore_index=True)
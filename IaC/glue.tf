@@ -13,21 +13,7 @@ resource "aws_glue_catalog_database" "star_schema_db" {
   description = "Database com modelagem estrela"
 }
 
-# ---------------------------------------------------------
-# --- GLUE CRAWLER ---
-# ---------------------------------------------------------
-
-resource "aws_glue_crawler" "refined_crawler" {
-  name          = "refined-clinica-clima-crawler"
-  role          = data.aws_iam_role.lab_role.arn
-  database_name = aws_glue_catalog_database.refined_db.name
-  
-  s3_target {
-    path = "s3://${aws_s3_bucket.refined.id}/clinica_com_clima/"
-  }
-  
-  schema_change_policy {
-    delete_behavior = "LOG"
-    update_behavior = "UPDATE_IN_DATABASE"
-  }
-}
+# As tabelas não têm crawler: a Lambda REFINED publica no catálogo a
+# definição de clinica_com_clima (refined_db) e da modelagem estrela
+# (star_schema_db) a partir dos próprios esquemas, com partition projection
+# nas tabelas particionadas por ano=/mes=
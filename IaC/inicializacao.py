@@ -0,0 +1,80 @@
+"""
+========================================================================
+Inicialização rápida das Lambdas Beira Mar
+========================================================================
+As bibliotecas da camada AWSSDKPandas (pandas, pyarrow) levam a maior
+parte do cold start. Com a importação tardia, o módulo da Lambda carrega
+sem elas: a importação começa em segundo plano e a Lambda já abre as
+transferências S3 enquanto isso. Cada biblioteca só é exigida no primeiro
+uso, que espera o carregamento em andamento terminar.
+
+Com IMPORTACAO_TARDIA=false tudo é importado na carga do módulo, como
+antes.
+========================================================================
+"""
+
+import importlib
+import os
+import threading
+
+IMPORTACAO_TARDIA = os.environ.get('IMPORTACAO_TARDIA', 'true').lower() == 'true'
+
+# Thread que importa as bibliotecas pesadas em segundo plano
+_aquecimento = None
+
+
+class ModuloTardio:
+    """
+    Substituto de um módulo que só é importado no primeiro acesso
+    Ex.: pd = ModuloTardio('pandas'); pd.DataFrame(...) importa o pandas
+    """
+
+    def __init__(self, nome):
+        self._nome = nome
+        self._modulo = None
+
+    def _carregar(self):
+        if self._modulo is None:
+            # Nunca importa em paralelo com o aquecimento (evita disputa
+            # pelos locks de importação entre pacotes que se importam)
+            aguardar_aquecimento()
+            self._modulo = importlib.import_module(self._nome)
+        return self._modulo
+
+    def __getattr__(self, atributo):
+        return getattr(self._carregar(), atributo)
+
+    def __repr__(self):
+        estado = 'carregado' if self._modulo is not None else 'pendente'
+        return f"<ModuloTardio {self._nome} ({estado})>"
+
+
+def importar(nome):
+    """Importa o módulo agora ou, no modo de importação tardia, no primeiro uso"""
+    if not IMPORTACAO_TARDIA:
+        return importlib.import_module(nome)
+    return ModuloTardio(nome)
+
+
+def preaquecer(*nomes):
+    """
+    Começa a importar os módulos em uma thread de segundo plano
+    Só tem efeito no modo de importação tardia e na primeira chamada
+    (em invocações aquecidas os módulos já estão carregados)
+    """
+    global _aquecimento
+    if not IMPORTACAO_TARDIA or _aquecimento is not None:
+        return
+
+    def _importar_todos():
+        for nome in nomes:
+            importlib.import_module(nome)
+
+    _aquecimento = threading.Thread(target=_importar_todos, name='preaquecimento', daemon=True)
+    _aquecimento.start()
+
+
+def aguardar_aquecimento():
+    """Bloqueia até o fim do preaquecimento, se houver um em andamento"""
+    if _aquecimento is not None and _aquecimento is not threading.current_thread():
+        _aquecimento.join()
@@ -13,8 +13,43 @@ data "aws_iam_role" "lab_role" {
 
 data "archive_file" "lambda_tratamento_zip" {
   type        = "zip"
-  source_file = "02tratamento_lambda.py"
   output_path = "02tratamento_lambda.zip"
+
+  source {
+    content  = file("02tratamento_lambda.py")
+    filename = "02tratamento_lambda.py"
+  }
+
+  # Módulos compartilhados entre as duas Lambdas
+  source {
+    content  = file("esquemas.py")
+    filename = "esquemas.py"
+  }
+
+  source {
+    content  = file("codec_datas.py")
+    filename = "codec_datas.py"
+  }
+
+  source {
+    content  = file("transferencias_s3.py")
+    filename = "transferencias_s3.py"
+  }
+
+  source {
+    content  = file("inicializacao.py")
+    filename = "inicializacao.py"
+  }
+
+  source {
+    content  = file("metricas.py")
+    filename = "metricas.py"
+  }
+
+  source {
+    content  = file("execucao_paralela.py")
+    filename = "execucao_paralela.py"
+  }
 }
 
 resource "aws_lambda_function" "tratamento_lambda" {
@@ -25,13 +60,21 @@ resource "aws_lambda_function" "tratamento_lambda" {
   source_code_hash = data.archive_file.lambda_tratamento_zip.output_base64sha256
   runtime          = "python3.12"
   timeout          = 300
-  memory_size      = 512
+  # As vCPUs acompanham a memória (2 a partir de 1769 MB, até 6 com 10240 MB)
+  memory_size      = var.memoria_tratamento_mb
   layers           = ["arn:aws:lambda:us-east-1:336392948345:layer:AWSSDKPandas-Python312:19"]
   
   environment {
     variables = {
-      BUCKET_RAW     = aws_s3_bucket.raw.id
-      BUCKET_TRUSTED = aws_s3_bucket.trusted.id
+      BUCKET_RAW           = aws_s3_bucket.raw.id
+      BUCKET_TRUSTED       = aws_s3_bucket.trusted.id
+      FORMATO_ARQUIVO      = var.formato_arquivo
+      MODO_PROCESSAMENTO   = var.modo_processamento
+      TAMANHO_LOTE         = var.tamanho_lote
+      PROCESSOS_TRATAMENTO = var.processos_tratamento
+      IMPORTACAO_TARDIA    = var.importacao_tardia
+      FORMATO_METRICAS     = var.formato_metricas
+      PERFIL_CPROFILE      = var.perfil_cprofile
     }
   }
 }
@@ -42,8 +85,43 @@ resource "aws_lambda_function" "tratamento_lambda" {
 
 data "archive_file" "lambda_refined_zip" {
   type        = "zip"
-  source_file = "03refined_lambda.py"
   output_path = "03refined_lambda.zip"
+
+  source {
+    content  = file("03refined_lambda.py")
+    filename = "03refined_lambda.py"
+  }
+
+  # Módulos compartilhados entre as duas Lambdas
+  source {
+    content  = file("esquemas.py")
+    filename = "esquemas.py"
+  }
+
+  source {
+    content  = file("codec_datas.py")
+    filename = "codec_datas.py"
+  }
+
+  source {
+    content  = file("transferencias_s3.py")
+    filename = "transferencias_s3.py"
+  }
+
+  source {
+    content  = file("inicializacao.py")
+    filename = "inicializacao.py"
+  }
+
+  source {
+    content  = file("metricas.py")
+    filename = "metricas.py"
+  }
+
+  source {
+    content  = file("catalogo_glue.py")
+    filename = "catalogo_glue.py"
+  }
 }
 
 resource "aws_lambda_function" "refined_lambda" {
@@ -59,8 +137,17 @@ resource "aws_lambda_function" "refined_lambda" {
   
   environment {
     variables = {
-      BUCKET_TRUSTED = aws_s3_bucket.trusted.id
-      BUCKET_REFINED = aws_s3_bucket.refined.id
+      BUCKET_TRUSTED        = aws_s3_bucket.trusted.id
+      BUCKET_REFINED        = aws_s3_bucket.refined.id
+      FORMATO_ARQUIVO       = var.formato_arquivo
+      MODO_PROCESSAMENTO    = var.modo_processamento == "incremental" ? "incremental" : "completo"
+      ESTRATEGIA_JUNCAO     = var.estrategia_juncao
+      TOLERANCIA_JUNCAO_MIN = var.tolerancia_juncao_min
+      BANCO_REFINED         = aws_glue_catalog_database.refined_db.name
+      BANCO_ESTRELA         = aws_glue_catalog_database.star_schema_db.name
+      IMPORTACAO_TARDIA     = var.importacao_tardia
+      FORMATO_METRICAS      = var.formato_metricas
+      PERFIL_CPROFILE       = var.perfil_cprofile
     }
   }
 }
@@ -0,0 +1,229 @@
+"""
+========================================================================
+Métricas por etapa das Lambdas Beira Mar
+========================================================================
+Cada etapa do pipeline (funções decoradas com @medir ou blocos
+`with etapa(...)`) registra duração, linhas de entrada e saída, variação
+da memória residente (RSS) e número de chamadas; chamadas repetidas (um
+lote por vez, uma partição por vez) são somadas na mesma etapa.
+
+O handler decorado com @instrumentar_handler emite ao final de cada
+invocação um único registro no log (FORMATO_METRICAS):
+- json: uma linha JSON com todas as etapas
+- emf: CloudWatch Embedded Metric Format (namespace BeiraMar/ETL,
+  dimensão Lambda); o CloudWatch transforma os campos em métricas
+- nenhum: não emite
+O resumo também vai no corpo da resposta, em 'metricas'.
+
+Com PERFIL_CPROFILE=true a invocação roda sob o cProfile (só a thread
+principal: leituras e gravações concorrentes aparecem como espera) e o
+resultado, no formato do pstats, é gravado no bucket de saída em
+_perfis/<lambda>/.
+
+Fora de uma invocação instrumentada (benchmarks, testes locais) o
+decorador só chama a função.
+========================================================================
+"""
+
+import cProfile
+import functools
+import json
+import marshal
+import os
+import resource
+import threading
+import time
+from datetime import datetime, timezone
+
+FORMATOS_METRICAS = ('json', 'emf', 'nenhum')
+NAMESPACE_METRICAS = 'BeiraMar/ETL'
+PREFIXO_PERFIS = '_perfis'
+
+# Execução em andamento (None fora de uma invocação instrumentada)
+_execucao = None
+
+
+def memoria_rss_mb():
+    """Memória residente atual do processo em MB (None fora do Linux)"""
+    try:
+        with open('/proc/self/statm') as f:
+            paginas = int(f.read().split()[1])
+        return paginas * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError):
+        return None
+
+
+def pico_rss_mb():
+    """Pico de memória residente do processo em MB (ru_maxrss vem em KB no Linux)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def contar_linhas(obj):
+    """Linhas de um DataFrame (ou do primeiro item de uma tupla); None se não for tabela"""
+    if isinstance(obj, tuple) and obj:
+        obj = obj[0]
+    forma = getattr(obj, 'shape', None)
+    return forma[0] if forma else None
+
+
+class ExecucaoMedida:
+    """Acumula as etapas de uma invocação"""
+
+    def __init__(self, lambda_nome):
+        self.lambda_nome = lambda_nome
+        self.etapas = {}
+        self.inicio = time.perf_counter()
+        # As leituras e gravações concorrentes registram etapas em threads
+        self._trava = threading.Lock()
+
+    def registrar(self, nome, segundos, linhas_entrada=None, linhas_saida=None, memoria_mb=None):
+        """Registra (ou acumula) uma etapa"""
+        with self._trava:
+            etapa = self.etapas.setdefault(nome, {'chamadas': 0, 'segundos': 0.0})
+            etapa['chamadas'] += 1
+            etapa['segundos'] = round(etapa['segundos'] + segundos, 4)
+            for campo, valor in (('linhas_entrada', linhas_entrada), ('linhas_saida', linhas_saida)):
+                if valor is not None:
+                    etapa[campo] = etapa.get(campo, 0) + int(valor)
+            if memoria_mb is not None:
+                etapa['memoria_delta_mb'] = round(etapa.get('memoria_delta_mb', 0.0) + memoria_mb, 1)
+
+    def resumo(self):
+        """Métricas da invocação até agora (vai no corpo da resposta)"""
+        return {
+            'duracao_total_s': round(time.perf_counter() - self.inicio, 3),
+            'pico_rss_mb': round(pico_rss_mb(), 1),
+            'etapas': {nome: dict(etapa) for nome, etapa in self.etapas.items()},
+        }
+
+    def registro(self, formato, extras):
+        """Registro único da invocação no formato pedido"""
+        registro = {'Lambda': self.lambda_nome, **extras, **self.resumo()}
+        if formato != 'emf':
+            return registro
+
+        # EMF: as métricas precisam ser campos de primeiro nível
+        metricas = [
+            {'Name': 'duracao_total_s', 'Unit': 'Seconds'},
+            {'Name': 'pico_rss_mb', 'Unit': 'Megabytes'},
+        ]
+        unidades = {'segundos': 'Seconds', 'linhas_entrada': 'Count',
+                    'linhas_saida': 'Count', 'memoria_delta_mb': 'Megabytes'}
+        for nome, etapa in self.etapas.items():
+            for campo, unidade in unidades.items():
+                if campo in etapa:
+                    registro[f"{nome}.{campo}"] = etapa[campo]
+                    metricas.append({'Name': f"{nome}.{campo}", 'Unit': unidade})
+        registro['_aws'] = {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': NAMESPACE_METRICAS,
+                'Dimensions': [['Lambda']],
+                'Metrics': metricas
+            }]
+        }
+        return registro
+
+
+class _Etapa:
+    """Mede um bloco; linhas_entrada/linhas_saida podem ser preenchidas dentro dele"""
+
+    def __init__(self, nome, linhas_entrada=None):
+        self.nome = nome
+        self.linhas_entrada = linhas_entrada
+        self.linhas_saida = None
+
+    def __enter__(self):
+        self.memoria_inicial = memoria_rss_mb()
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        duracao = time.perf_counter() - self.inicio
+        execucao = _execucao
+        if execucao is not None:
+            memoria_final = memoria_rss_mb()
+            memoria = None
+            if memoria_final is not None and self.memoria_inicial is not None:
+                memoria = memoria_final - self.memoria_inicial
+            execucao.registrar(self.nome, duracao, self.linhas_entrada, self.linhas_saida, memoria)
+        return False
+
+
+def etapa(nome, linhas_entrada=None):
+    """Context manager que registra o bloco como uma etapa da invocação"""
+    return _Etapa(nome, linhas_entrada)
+
+
+def medir(funcao):
+    """
+    Decorador de etapa: registra a função com o próprio nome, com as linhas
+    do primeiro argumento como entrada e as do resultado como saída
+    """
+    @functools.wraps(funcao)
+    def _medida(*args, **kwargs):
+        if _execucao is None:
+            return funcao(*args, **kwargs)
+        with etapa(funcao.__name__, contar_linhas(args[0]) if args else None) as medida:
+            resultado = funcao(*args, **kwargs)
+            medida.linhas_saida = contar_linhas(resultado)
+        return resultado
+    return _medida
+
+
+def salvar_perfil(perfil, cliente_s3, bucket, lambda_nome, request_id):
+    """Grava o perfil do cProfile (formato do pstats) no S3 e devolve a URI"""
+    perfil.create_stats()
+    data = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H-%M-%S')
+    key = f"{PREFIXO_PERFIS}/{lambda_nome}/{data}_{request_id}.prof"
+    cliente_s3.put_object(Bucket=bucket, Key=key, Body=marshal.dumps(perfil.stats))
+    return f"s3://{bucket}/{key}"
+
+
+def instrumentar_handler(lambda_nome, cliente_s3, bucket_perfis):
+    """
+    Decorador do lambda_handler: mede a invocação, emite o registro de
+    métricas e acrescenta o resumo ao corpo da resposta
+    `bucket_perfis` é uma função que devolve o bucket dos perfis do cProfile
+    """
+    def _decorador(handler):
+        @functools.wraps(handler)
+        def _handler(event, context):
+            global _execucao
+            formato = os.environ.get('FORMATO_METRICAS', 'json').lower()
+            perfilar = os.environ.get('PERFIL_CPROFILE', 'false').lower() == 'true'
+            request_id = getattr(context, 'aws_request_id', None) or 'local'
+
+            _execucao = execucao = ExecucaoMedida(lambda_nome)
+            perfil = cProfile.Profile() if perfilar else None
+            resposta = None
+            try:
+                if perfil is not None:
+                    perfil.enable()
+                try:
+                    resposta = handler(event, context)
+                finally:
+                    if perfil is not None:
+                        perfil.disable()
+            finally:
+                _execucao = None
+                extras = {
+                    'request_id': request_id,
+                    'statusCode': resposta.get('statusCode') if isinstance(resposta, dict) else None,
+                }
+                if perfil is not None:
+                    try:
+                        extras['perfil'] = salvar_perfil(perfil, cliente_s3, bucket_perfis(), lambda_nome, request_id)
+                    except Exception as e:
+                        print(f"   ⚠️  Não foi possível gravar o perfil do cProfile: {e}")
+                if formato in FORMATOS_METRICAS and formato != 'nenhum':
+                    print(json.dumps(execucao.registro(formato, extras), ensure_ascii=False, default=str))
+
+            if isinstance(resposta, dict) and isinstance(resposta.get('body'), dict):
+                resposta['body']['metricas'] = {
+                    **execucao.resumo(),
+                    **({'perfil': extras['perfil']} if 'perfil' in extras else {})
+                }
+            return resposta
+        return _handler
+    return _decorador
@@ -0,0 +1,227 @@
+"""
+========================================================================
+Orquestração do pipeline Beira Mar
+========================================================================
+Executa etapas ligadas por dependências (um DAG): cada etapa começa assim
+que todas as suas dependências terminam, e etapas independentes rodam ao
+mesmo tempo (até `paralelismo` por vez). Se uma etapa falha, as que
+dependem dela são bloqueadas e as demais continuam.
+
+Cada etapa pode declarar uma impressão digital das suas entradas (ex.:
+ETags dos objetos que ela lê e o código da Lambda). Se a impressão é a
+mesma da última execução bem-sucedida, gravada no arquivo de estado, a
+etapa é pulada e mantém os detalhes daquela execução.
+
+Esperas por trabalhos assíncronos (ex.: consultas do Athena) usam
+aguardar(): backoff exponencial com jitter, em vez de intervalos fixos.
+
+Ao final imprime o relatório com situação, início e duração de cada etapa.
+========================================================================
+"""
+
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+
+EXECUTADA = 'executada'
+PULADA = 'pulada'
+FALHOU = 'falhou'
+BLOQUEADA = 'bloqueada'
+
+
+class TempoEsgotado(Exception):
+    """Trabalho assíncrono que não terminou dentro do limite de espera"""
+
+
+class Etapa:
+    """
+    Etapa do pipeline
+    `executar(backend)` faz o trabalho e devolve um dicionário de detalhes
+    (vai para o relatório e para o estado); `entradas(backend)`, se
+    informada, devolve a impressão digital das entradas da etapa
+    """
+
+    def __init__(self, nome, executar, depende_de=(), entradas=None, descricao=''):
+        self.nome = nome
+        self.executar = executar
+        self.depende_de = tuple(depende_de)
+        self.entradas = entradas
+        self.descricao = descricao or nome
+
+
+class ResultadoEtapa:
+    """Situação, tempos e detalhes de uma etapa na execução atual"""
+
+    def __init__(self, nome, situacao, inicio=None, duracao=0.0, detalhes=None, erro=None):
+        self.nome = nome
+        self.situacao = situacao
+        self.inicio = inicio
+        self.duracao = duracao
+        self.detalhes = detalhes or {}
+        self.erro = erro
+
+
+def impressao_digital(*partes):
+    """SHA-256 de valores serializáveis em JSON (dicionários em ordem de chave)"""
+    conteudo = json.dumps(partes, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+
+def aguardar(verificar, descricao, dormir=time.sleep, inicial_s=1.0, maximo_s=20.0, fator=2.0,
+             limite_s=600.0, aleatorio=random.random, relogio=time.monotonic):
+    """
+    Chama verificar() até ela devolver algo diferente de None e devolve esse valor
+    Entre as tentativas dorme com backoff exponencial (inicial_s, inicial_s *
+    fator, ... até maximo_s) e "equal jitter": metade do intervalo é fixa e a
+    outra metade aleatória, para que esperas simultâneas não consultem a API
+    no mesmo instante. Passado limite_s, levanta TempoEsgotado
+    """
+    inicio = relogio()
+    intervalo = inicial_s
+    while True:
+        resultado = verificar()
+        if resultado is not None:
+            return resultado
+        if relogio() - inicio >= limite_s:
+            raise TempoEsgotado(f"{descricao}: sem conclusão após {limite_s:.0f}s")
+        dormir(intervalo / 2 + aleatorio() * intervalo / 2)
+        intervalo = min(maximo_s, intervalo * fator)
+
+
+class EstadoPipeline:
+    """
+    Impressões digitais e detalhes da última execução bem-sucedida de cada
+    etapa, em um arquivo JSON regravado a cada etapa concluída
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._trava = threading.Lock()
+        self.etapas = {}
+        if caminho and os.path.exists(caminho):
+            with open(caminho) as f:
+                self.etapas = json.load(f).get('etapas', {})
+
+    def anterior(self, nome):
+        with self._trava:
+            return self.etapas.get(nome)
+
+    def registrar(self, nome, entradas, detalhes):
+        with self._trava:
+            self.etapas[nome] = {
+                'entradas': entradas,
+                'concluida_em': datetime.now(timezone.utc).isoformat(),
+                'detalhes': detalhes,
+            }
+            if self.caminho:
+                temporario = f"{self.caminho}.tmp"
+                with open(temporario, 'w') as f:
+                    json.dump({'etapas': self.etapas}, f, indent=2, ensure_ascii=False, default=str)
+                os.replace(temporario, self.caminho)
+
+
+def validar_dag(etapas):
+    """Falha se houver nomes repetidos, dependências desconhecidas ou ciclos"""
+    por_nome = {}
+    for etapa in etapas:
+        if etapa.nome in por_nome:
+            raise ValueError(f"Etapa repetida: {etapa.nome}")
+        por_nome[etapa.nome] = etapa
+    for etapa in etapas:
+        desconhecidas = [d for d in etapa.depende_de if d not in por_nome]
+        if desconhecidas:
+            raise ValueError(f"{etapa.nome} depende de etapas inexistentes: {desconhecidas}")
+
+    # Ordenação topológica (Kahn): sobra alguma etapa se houver ciclo
+    faltando = {etapa.nome: set(etapa.depende_de) for etapa in etapas}
+    prontas = [nome for nome, deps in faltando.items() if not deps]
+    while prontas:
+        concluida = prontas.pop()
+        del faltando[concluida]
+        for nome, deps in faltando.items():
+            if concluida in deps:
+                deps.discard(concluida)
+                if not deps:
+                    prontas.append(nome)
+    if faltando:
+        raise ValueError(f"Dependências circulares entre: {sorted(faltando)}")
+
+
+def _executar_etapa(etapa, backend, estado, forcar, relogio, inicio_pipeline):
+    """Roda uma etapa (ou a pula se as entradas não mudaram) e devolve o resultado"""
+    inicio = relogio()
+    try:
+        entradas = etapa.entradas(backend) if etapa.entradas else None
+        anterior = estado.anterior(etapa.nome)
+        if entradas is not None and not forcar and anterior and anterior['entradas'] == entradas:
+            print(f"⏭️  {etapa.descricao}: entradas sem alterações desde {anterior['concluida_em']}")
+            return ResultadoEtapa(etapa.nome, PULADA, inicio - inicio_pipeline,
+                                  relogio() - inicio, anterior.get('detalhes'))
+
+        print(f"▶️  {etapa.descricao}...")
+        detalhes = etapa.executar(backend) or {}
+        if entradas is not None:
+            estado.registrar(etapa.nome, entradas, detalhes)
+        print(f"✅ {etapa.descricao} ({relogio() - inicio:.1f}s)")
+        return ResultadoEtapa(etapa.nome, EXECUTADA, inicio - inicio_pipeline, relogio() - inicio, detalhes)
+    except Exception as e:
+        print(f"❌ {etapa.descricao}: {e}")
+        return ResultadoEtapa(etapa.nome, FALHOU, inicio - inicio_pipeline, relogio() - inicio, erro=str(e))
+
+
+def executar_dag(etapas, backend, estado, forcar=False, paralelismo=4, relogio=time.perf_counter):
+    """
+    Executa as etapas respeitando as dependências, com até `paralelismo`
+    etapas ao mesmo tempo; devolve os resultados na ordem da lista
+    """
+    validar_dag(etapas)
+    pendentes = {etapa.nome: etapa for etapa in etapas}
+    resultados = {}
+    inicio_pipeline = relogio()
+
+    with ThreadPoolExecutor(max_workers=paralelismo, thread_name_prefix='etapa') as executor:
+        em_execucao = {}
+        while pendentes or em_execucao:
+            liberou = True
+            while liberou:
+                liberou = False
+                for nome, etapa in list(pendentes.items()):
+                    situacoes = [resultados[d].situacao for d in etapa.depende_de if d in resultados]
+                    if any(situacao in (FALHOU, BLOQUEADA) for situacao in situacoes):
+                        print(f"⛔ {etapa.descricao}: bloqueada por falha em uma dependência")
+                        resultados[nome] = ResultadoEtapa(nome, BLOQUEADA)
+                        del pendentes[nome]
+                        liberou = True
+                    elif len(situacoes) == len(etapa.depende_de):
+                        futuro = executor.submit(
+                            _executar_etapa, etapa, backend, estado, forcar, relogio, inicio_pipeline
+                        )
+                        em_execucao[futuro] = nome
+                        del pendentes[nome]
+
+            if not em_execucao:
+                break
+            concluidos, _ = wait(em_execucao, return_when=FIRST_COMPLETED)
+            for futuro in concluidos:
+                resultados[em_execucao.pop(futuro)] = futuro.result()
+
+    return [resultados[etapa.nome] for etapa in etapas], relogio() - inicio_pipeline
+
+
+def imprimir_relatorio(resultados, duracao_total, resumir=lambda detalhes: ''):
+    """Tabela com situação, início e duração de cada etapa e o ganho do paralelismo"""
+    print(f"\n{'Etapa':<30}{'Situação':<12}{'Início':>9}{'Duração':>10}  Detalhes")
+    for resultado in resultados:
+        inicio = f"{resultado.inicio:>8.1f}s" if resultado.inicio is not None else f"{'-':>9}"
+        detalhes = resultado.erro if resultado.erro else resumir(resultado.detalhes)
+        print(f"{resultado.nome:<30}{resultado.situacao:<12}{inicio}{resultado.duracao:>9.1f}s  {detalhes}")
+
+    soma = sum(resultado.duracao for resultado in resultados)
+    print(f"\nTempo total: {duracao_total:.1f}s (soma das etapas: {soma:.1f}s)")
+    if soma > duracao_total > 0:
+        print(f"Etapas simultâneas: {soma / duracao_total:.1f}x mais rápido que em sequência")
@@ -0,0 +1,94 @@
+"""
+========================================================================
+Partes definidas pelo conteúdo para backups incrementais
+========================================================================
+Usado por backup_database.py (BACKUP_MODE=incremental) e pelo
+restore_database.py. O dump é dividido em partes cujas fronteiras
+dependem só do conteúdo: uma alteração no meio do dump muda a parte onde
+ocorreu e as fronteiras seguintes voltam a coincidir com as do backup
+anterior, então só as partes novas precisam ser enviadas.
+
+As fronteiras candidatas são fins de linha e separadores de linhas de
+INSERT estendido ("),("): os dumps SQL são orientados a linhas e cortar
+nelas evita um hash rolante byte a byte em Python. Cada unidade entre
+candidatas é resumida com CRC-32 (em C) e o corte acontece com
+probabilidade proporcional ao tamanho da unidade, então o tamanho médio
+das partes não depende do tamanho das linhas.
+========================================================================
+"""
+
+import re
+import zlib
+
+CHUNK_PREFIX = 'backups/chunks/'
+# Índice de cada backup incremental: backups/backup_<banco>_<data>.index.json
+INDEX_SUFFIX = '.index.json'
+
+# Fim de linha ou separador entre linhas de um INSERT estendido
+BOUNDARY = re.compile(rb'\n|\),\(')
+
+
+def chunk_key(sha256: str, extension: str, prefix: str = CHUNK_PREFIX) -> str:
+    """Chave S3 de uma parte: endereçada pelo SHA-256 do conteúdo sem compressão"""
+    return f"{prefix}{sha256[:2]}/{sha256}{extension}"
+
+
+class ContentDefinedChunker:
+    """
+    Divide um fluxo de bytes em partes de ~avg_size bytes definidas pelo conteúdo
+    Nenhuma parte fica menor que min_size (exceto a última) ou maior que max_size
+    """
+
+    def __init__(self, avg_size: int, min_size: int = None, max_size: int = None):
+        self.min_size = min_size if min_size is not None else avg_size // 4
+        self.max_size = max_size if max_size is not None else avg_size * 4
+        # Bytes esperados entre o tamanho mínimo e o corte
+        self.target = max(1, avg_size - self.min_size)
+        self.buffer = bytearray()
+        # Início da unidade ainda sem fronteira, relativo ao buffer
+        self.unit_start = 0
+
+    def _cut_here(self, unit: memoryview) -> bool:
+        """Corta depois da unidade com probabilidade len(unit) / target"""
+        return zlib.crc32(unit) * self.target < len(unit) << 32
+
+    def feed(self, data: bytes) -> list:
+        """Acrescenta dados e devolve as partes completas"""
+        self.buffer += data
+        chunks = []
+        start = 0
+        cuts = []
+
+        with memoryview(self.buffer) as view:
+            unit_start = self.unit_start
+            for match in BOUNDARY.finditer(self.buffer, self.unit_start):
+                end = match.end()
+                if end - start >= self.max_size:
+                    # Unidades enormes: corte forçado no tamanho máximo
+                    while end - start >= self.max_size:
+                        start += self.max_size
+                        cuts.append(start)
+                elif end - start >= self.min_size and self._cut_here(view[unit_start:end]):
+                    cuts.append(end)
+                    start = end
+                unit_start = end
+
+        while len(self.buffer) - start >= self.max_size:
+            start += self.max_size
+            cuts.append(start)
+            unit_start = max(unit_start, start)
+
+        previous = 0
+        for cut in cuts:
+            chunks.append(bytes(self.buffer[previous:cut]))
+            previous = cut
+        del self.buffer[:previous]
+        self.unit_start = unit_start - previous
+        return chunks
+
+    def flush(self) -> bytes:
+        """Devolve o restante como última parte (vazio se não sobrou nada)"""
+        chunk = bytes(self.buffer)
+        self.buffer.clear()
+        self.unit_start = 0
+        return chunk
@@ -0,0 +1,188 @@
+"""
+========================================================================
+Codecs de compressão dos backups
+========================================================================
+Usado por backup_database.py. O codec é escolhido por BACKUP_CODEC e
+gravado nos metadados do objeto no S3, para que a restauração use o
+descompressor correspondente.
+
+Codecs:
+- gzip: zlib em uma única thread (compatível com gunzip/zcat)
+- pigz: gzip em blocos independentes comprimidos em paralelo, no estilo
+  do pigz; a saída são membros gzip concatenados, que gunzip/zcat leem
+  como um arquivo só
+- zstd: zstandard multithread (pacote opcional `zstandard`)
+========================================================================
+"""
+
+import os
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CODECS = ('gzip', 'pigz', 'zstd')
+DEFAULT_LEVELS = {'gzip': 9, 'pigz': 9, 'zstd': 3}
+EXTENSIONS = {'gzip': '.gz', 'pigz': '.gz', 'zstd': '.zst'}
+
+# pigz: cada bloco vira um membro gzip; blocos maiores perdem menos taxa
+# de compressão por reiniciar o dicionário a cada membro
+PIGZ_BLOCK_SIZE = 1024 * 1024
+
+
+def default_threads() -> int:
+    """Threads de compressão: todos os núcleos disponíveis para o processo"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def gzip_member(data: bytes, level: int) -> bytes:
+    """Comprime `data` como um membro gzip completo (libera o GIL no zlib)"""
+    # wbits=31: formato gzip, compatível com gunzip/zcat
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+class GzipCompressor:
+    """gzip em uma única thread"""
+
+    def __init__(self, level: int):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self.compressor.flush()
+
+
+class ParallelGzipCompressor:
+    """
+    gzip em blocos comprimidos em paralelo por um pool de threads
+    Os blocos são devolvidos na ordem de entrada; no máximo 2 blocos por
+    thread ficam em voo, limitando a memória usada
+    """
+
+    def __init__(self, level: int, threads: int, block_size: int = PIGZ_BLOCK_SIZE):
+        self.level = level
+        self.block_size = block_size
+        self.max_pending = 2 * threads
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+        self.buffer = bytearray()
+        self.pending = deque()
+        self.members = 0
+
+    def _submit(self, block: bytes):
+        self.pending.append(self.executor.submit(gzip_member, block, self.level))
+        self.members += 1
+
+    def _collect(self, wait: bool) -> bytes:
+        """Junta os blocos já prontos do início da fila (todos se `wait`)"""
+        output = bytearray()
+        while self.pending and (wait or self.pending[0].done() or len(self.pending) > self.max_pending):
+            output += self.pending.popleft().result()
+        return bytes(output)
+
+    def compress(self, data: bytes) -> bytes:
+        self.buffer += data
+        while len(self.buffer) >= self.block_size:
+            self._submit(bytes(self.buffer[:self.block_size]))
+            del self.buffer[:self.block_size]
+        return self._collect(wait=False)
+
+    def flush(self) -> bytes:
+        # Entrada vazia ainda gera um membro, para o arquivo ser um gzip válido
+        if self.buffer or not self.members:
+            self._submit(bytes(self.buffer))
+            self.buffer.clear()
+        output = self._collect(wait=True)
+        self.executor.shutdown()
+        return output
+
+
+class ZstdCompressor:
+    """zstandard multithread"""
+
+    def __init__(self, level: int, threads: int):
+        if zstandard is None:
+            raise RuntimeError("Codec zstd requer o pacote zstandard (pip3 install zstandard)")
+        self.compressor = zstandard.ZstdCompressor(level=level, threads=threads).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self.compressor.flush()
+
+
+class GzipDecompressor:
+    """Descompressor gzip que aceita vários membros concatenados (pigz)"""
+
+    def __init__(self):
+        self.decompressor = zlib.decompressobj(31)
+
+    def decompress(self, data: bytes) -> bytes:
+        output = bytearray()
+        while data:
+            output += self.decompressor.decompress(data)
+            data = self.decompressor.unused_data
+            if data:
+                self.decompressor = zlib.decompressobj(31)
+        return bytes(output)
+
+    def flush(self) -> bytes:
+        if not self.decompressor.eof:
+            raise ValueError("Arquivo gzip truncado")
+        return self.decompressor.flush()
+
+
+class ZstdDecompressor:
+    """Descompressor zstandard"""
+
+    def __init__(self):
+        if zstandard is None:
+            raise RuntimeError("Codec zstd requer o pacote zstandard (pip3 install zstandard)")
+        self.decompressor = zstandard.ZstdDecompressor().decompressobj()
+
+    def decompress(self, data: bytes) -> bytes:
+        return self.decompressor.decompress(data)
+
+    def flush(self) -> bytes:
+        return self.decompressor.flush()
+
+
+def check_codec(codec: str):
+    """Valida o codec; levanta ValueError/RuntimeError se não puder ser usado"""
+    if codec not in CODECS:
+        raise ValueError(f"Codec não suportado: {codec} (opções: {', '.join(CODECS)})")
+    if codec == 'zstd' and zstandard is None:
+        raise RuntimeError("Codec zstd requer o pacote zstandard (pip3 install zstandard)")
+
+
+def get_compressor(codec: str, level: int = None, threads: int = None):
+    """Cria o compressor do codec (nível e threads padrão se omitidos)"""
+    check_codec(codec)
+    if level is None:
+        level = DEFAULT_LEVELS[codec]
+    if threads is None:
+        threads = default_threads()
+
+    if codec == 'gzip':
+        return GzipCompressor(level)
+    if codec == 'pigz':
+        return ParallelGzipCompressor(level, threads)
+    return ZstdCompressor(level, threads)
+
+
+def get_decompressor(codec: str):
+    """Cria o descompressor do codec gravado nos metadados do backup"""
+    check_codec(codec)
+    if codec == 'zstd':
+        return ZstdDecompressor()
+    return GzipDecompressor()
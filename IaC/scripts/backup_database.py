@@ -5,19 +5,70 @@ Script Python para Backup de Banco de Dados
 ========================================================================
 Este script realiza backup do banco de dados, envia para S3 e 
 notifica o administrador via SNS
+
+Modos (BACKUP_MODE):
+- stream (padrão): a saída do mysqldump/pg_dump é comprimida e enviada ao
+  S3 em multipart upload à medida que é gerada, sem arquivos em disco;
+  dump, compressão e upload acontecem ao mesmo tempo
+- file: gera o .sql em BACKUP_DIR, comprime e só então envia (modo antigo)
+- parallel: o esquema, cada tabela e os objetos pós-dados (índices,
+  constraints, triggers) são exportados por BACKUP_WORKERS processos
+  simultâneos, cada um como um objeto próprio em backups/<backup>/; um
+  manifest.json com tabelas, tamanhos, SHA-256 e codec é gravado por
+  último e marca o backup como completo. No PostgreSQL todas as partes
+  usam o mesmo snapshot; no MySQL cada parte tem o seu snapshot
+  (--single-transaction), a menos que BACKUP_MYSQL_CONSISTENCY=lock, que
+  mantém FLUSH TABLES WITH READ LOCK e bloqueia as escritas até o fim
+- incremental: o dump é dividido em partes definidas pelo conteúdo (ver
+  backup_chunks.py); só as partes que ainda não existem em backups/chunks/
+  são enviadas, e um índice backups/<backup>.index.json lista as partes
+  que formam o dump completo daquele momento
+
+Retenção (ver backup_retention.py): ao final, backups/ é listado por
+completo, os backups fora da política GFS (BACKUP_RETENTION_DAYS, _DAILY,
+_WEEKLY, _MONTHLY) são removidos em lotes de até 1000 chaves e as partes
+incrementais sem referência são apagadas. BACKUP_RETENTION_DRY_RUN=true
+só registra o que seria removido.
+
+Verificação (BACKUP_VERIFY): 'checksum' relê o backup do S3 e confere o
+SHA-256 calculado durante a compressão (gravado nos metadados do objeto,
+no manifesto ou no índice) e a integridade do gzip/zstd; 'restore' também
+carrega o dump em um banco descartável (VERIFY_DB_*) e compara as
+contagens de linhas com as do dump. A duração entra no relatório do SNS.
+
+Métricas (BACKUP_METRICS_FORMAT, ver backup_metrics.py): duração, bytes
+de entrada e saída, MB/s e taxa de compressão de cada etapa, mais o pico
+de memória, gravados como uma linha JSON ou CloudWatch EMF em
+BACKUP_METRICS_FILE ao final de cada execução (inclusive com falha) e
+resumidos no relatório do SNS.
+
+Compressão (BACKUP_CODEC, ver backup_codecs.py): gzip (padrão), pigz
+(gzip em blocos paralelos) ou zstd. O codec e o nível ficam gravados nos
+metadados do objeto no S3 (codec, compression-level).
 ========================================================================
 """
 
+import hashlib
+import io
+import json
 import os
 import sys
 import subprocess
-import gzip
-import shutil
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import ClientError
 import logging
 
+from backup_chunks import CHUNK_PREFIX, INDEX_SUFFIX, ContentDefinedChunker, chunk_key
+from backup_codecs import DEFAULT_LEVELS, EXTENSIONS, check_codec, default_threads, get_compressor, get_decompressor
+from backup_metrics import FORMATS as METRICS_FORMATS, BackupMetrics
+from backup_retention import group_backups, select_backups_to_keep
+
 # Configurar logging
 logging.basicConfig(
     level=logging.INFO,
@@ -42,6 +93,61 @@ BACKUP_BUCKET = os.environ.get('BACKUP_BUCKET')
 SNS_TOPIC_ARN = os.environ.get('SNS_TOPIC_ARN')
 AWS_REGION = os.environ.get('AWS_REGION', 'us-east-1')
 
+# Modo de execução: 'stream' (padrão), 'file', 'parallel' ou 'incremental'
+BACKUP_MODE = os.environ.get('BACKUP_MODE', 'stream')
+BACKUP_MODES = ('stream', 'file', 'parallel', 'incremental')
+
+# Modo parallel: processos de dump simultâneos (padrão: todos os núcleos)
+BACKUP_WORKERS = int(os.environ.get('BACKUP_WORKERS') or default_threads())
+MANIFEST_VERSION = 1
+# Modo parallel no MySQL: 'none' (padrão) exporta cada tabela no seu
+# próprio snapshot, sem bloquear o banco; 'lock' mantém FLUSH TABLES WITH
+# READ LOCK durante todo o backup (mesmo estado em todas as tabelas, mas
+# as escritas ficam bloqueadas até a última parte terminar)
+MYSQL_CONSISTENCY = os.environ.get('BACKUP_MYSQL_CONSISTENCY', 'none')
+MYSQL_CONSISTENCY_MODES = ('none', 'lock')
+
+# Modo incremental: tamanho médio das partes definidas pelo conteúdo
+CHUNK_SIZE_KB = int(os.environ.get('BACKUP_CHUNK_SIZE_KB', '1024'))
+INDEX_VERSION = 1
+
+# Retenção: todos os backups dos últimos N dias, mais o mais recente de cada
+# um dos últimos N dias/semanas/meses (GFS); dry-run só registra
+RETENTION_DAYS = int(os.environ.get('BACKUP_RETENTION_DAYS', '30'))
+RETENTION_DAILY = int(os.environ.get('BACKUP_RETENTION_DAILY', '0'))
+RETENTION_WEEKLY = int(os.environ.get('BACKUP_RETENTION_WEEKLY', '0'))
+RETENTION_MONTHLY = int(os.environ.get('BACKUP_RETENTION_MONTHLY', '0'))
+RETENTION_DRY_RUN = os.environ.get('BACKUP_RETENTION_DRY_RUN', 'false').lower() == 'true'
+# Limite de chaves por chamada do delete_objects
+DELETE_BATCH_SIZE = 1000
+
+# Verificação depois do envio: 'none' (padrão), 'checksum' ou 'restore'
+BACKUP_VERIFY = os.environ.get('BACKUP_VERIFY', 'none')
+BACKUP_VERIFY_MODES = ('none', 'checksum', 'restore')
+# Servidor do banco descartável usado por BACKUP_VERIFY=restore
+VERIFY_DB_HOST = os.environ.get('VERIFY_DB_HOST', 'localhost')
+VERIFY_DB_PORT = os.environ.get('VERIFY_DB_PORT', DB_PORT)
+VERIFY_DB_USER = os.environ.get('VERIFY_DB_USER', DB_USER)
+VERIFY_DB_PASSWORD = os.environ.get('VERIFY_DB_PASSWORD', DB_PASSWORD)
+
+# Streaming: tamanho das partes do multipart upload e partes enviadas em
+# paralelo (o S3 aceita até 10.000 partes: 32 MB permitem dumps de ~320 GB)
+PART_SIZE_MB = int(os.environ.get('BACKUP_PART_SIZE_MB', '32'))
+UPLOAD_CONCURRENCY = int(os.environ.get('BACKUP_UPLOAD_CONCURRENCY', '4'))
+# Bytes lidos do dump por vez antes de passar pelo compressor
+READ_CHUNK_SIZE = 1024 * 1024
+
+# Compressão: codec (gzip, pigz ou zstd), nível (padrão do codec se vazio)
+# e threads dos codecs paralelos (padrão: todos os núcleos)
+BACKUP_CODEC = os.environ.get('BACKUP_CODEC', 'gzip')
+COMPRESSION_LEVEL = int(os.environ.get('BACKUP_COMPRESSION_LEVEL') or DEFAULT_LEVELS.get(BACKUP_CODEC, 9))
+COMPRESSION_THREADS = int(os.environ.get('BACKUP_COMPRESSION_THREADS') or default_threads())
+
+# Métricas por etapa: 'json' (padrão), 'emf' (CloudWatch) ou 'none'
+METRICS_FORMAT = os.environ.get('BACKUP_METRICS_FORMAT', 'json')
+METRICS_FILE = os.environ.get('BACKUP_METRICS_FILE', '/var/log/backup_metrics.log')
+METRICS_NAMESPACE = os.environ.get('BACKUP_METRICS_NAMESPACE', 'BeiraMar/Backup')
+
 # Diretórios
 BACKUP_DIR = '/tmp/backups'
 os.makedirs(BACKUP_DIR, exist_ok=True)
@@ -64,21 +170,52 @@ def send_notification(subject: str, message: str):
         logger.error(f"Erro ao enviar notificação SNS: {e}")
 
 
+def mysql_connection_args(verify: bool = False) -> list:
+    """Argumentos de conexão comuns ao mysql e ao mysqldump (ou do banco de verificação)"""
+    if verify:
+        return ['-h', VERIFY_DB_HOST, '-P', VERIFY_DB_PORT, '-u', VERIFY_DB_USER, f'-p{VERIFY_DB_PASSWORD}']
+    return [
+        '-h', DB_HOST,
+        '-P', DB_PORT,
+        '-u', DB_USER,
+        f'-p{DB_PASSWORD}'
+    ]
+
+
+def postgres_connection_args(verify: bool = False) -> list:
+    """Argumentos de conexão comuns ao psql e ao pg_dump (ou do banco de verificação)"""
+    if verify:
+        return ['-h', VERIFY_DB_HOST, '-p', VERIFY_DB_PORT, '-U', VERIFY_DB_USER]
+    return [
+        '-h', DB_HOST,
+        '-p', DB_PORT,
+        '-U', DB_USER
+    ]
+
+
+def mysql_dump_command(options: list = None, tables: list = None) -> list:
+    """Comando do mysqldump (o dump sai no stdout); sem opções, o dump completo"""
+    if options is None:
+        options = ['--single-transaction', '--routines', '--triggers', '--events']
+    return ['mysqldump', *mysql_connection_args(), *options, DB_NAME, *(tables or [])]
+
+
+def postgres_dump_command(options: list = None) -> list:
+    """Comando do pg_dump em formato texto (sem -f, o dump sai no stdout)"""
+    return ['pg_dump', *postgres_connection_args(), '-F', 'plain', *(options or []), DB_NAME]
+
+
+def postgres_env(verify: bool = False) -> dict:
+    """Ambiente do pg_dump/psql com a senha em PGPASSWORD"""
+    env = os.environ.copy()
+    env['PGPASSWORD'] = VERIFY_DB_PASSWORD if verify else DB_PASSWORD
+    return env
+
+
 def create_mysql_backup(backup_path: str) -> bool:
     """Cria backup do MySQL/MariaDB"""
     try:
-        cmd = [
-            'mysqldump',
-            '-h', DB_HOST,
-            '-P', DB_PORT,
-            '-u', DB_USER,
-            f'-p{DB_PASSWORD}',
-            '--single-transaction',
-            '--routines',
-            '--triggers',
-            '--events',
-            DB_NAME
-        ]
+        cmd = mysql_dump_command()
         
         with open(backup_path, 'w') as f:
             result = subprocess.run(cmd, stdout=f, stderr=subprocess.PIPE, text=True)
@@ -98,18 +235,9 @@ def create_mysql_backup(backup_path: str) -> bool:
 def create_postgres_backup(backup_path: str) -> bool:
     """Cria backup do PostgreSQL"""
     try:
-        env = os.environ.copy()
-        env['PGPASSWORD'] = DB_PASSWORD
-        
-        cmd = [
-            'pg_dump',
-            '-h', DB_HOST,
-            '-p', DB_PORT,
-            '-U', DB_USER,
-            '-F', 'plain',
-            '-f', backup_path,
-            DB_NAME
-        ]
+        env = postgres_env()
+        cmd = postgres_dump_command()
+        cmd[-1:-1] = ['-f', backup_path]
         
         result = subprocess.run(cmd, env=env, stderr=subprocess.PIPE, text=True)
         
@@ -125,29 +253,186 @@ def create_postgres_backup(backup_path: str) -> bool:
         return False
 
 
-def compress_file(source: str, destination: str) -> bool:
-    """Comprime arquivo usando gzip"""
+def new_compressor(threads: int = COMPRESSION_THREADS):
+    """Compressor do codec configurado em BACKUP_CODEC"""
+    return get_compressor(BACKUP_CODEC, COMPRESSION_LEVEL, threads)
+
+
+def backup_metadata() -> dict:
+    """Metadados gravados no objeto para a restauração escolher o descompressor"""
+    return {
+        'codec': BACKUP_CODEC,
+        'compression-level': str(COMPRESSION_LEVEL)
+    }
+
+
+def checksum_metadata(sha256: str, bytes_in: int) -> dict:
+    """Metadados do backup acrescidos do SHA-256 do objeto e do tamanho original"""
+    return {**backup_metadata(), 'sha256': sha256, 'uncompressed-size': str(bytes_in)}
+
+
+def compress_file(source: str, destination: str) -> dict:
+    """
+    Comprime arquivo com o codec configurado
+    O SHA-256 do arquivo comprimido é calculado na mesma passada
+    Retorna {'bytes_in', 'sha256'} ou None em caso de falha
+    """
     try:
-        with open(source, 'rb') as f_in:
-            with gzip.open(destination, 'wb', compresslevel=9) as f_out:
-                shutil.copyfileobj(f_in, f_out)
+        compressor = new_compressor()
+        digest = hashlib.sha256()
+        bytes_in = 0
+        with open(source, 'rb') as f_in, open(destination, 'wb') as f_out:
+            while chunk := f_in.read(READ_CHUNK_SIZE):
+                bytes_in += len(chunk)
+                data = compressor.compress(chunk)
+                digest.update(data)
+                f_out.write(data)
+            data = compressor.flush()
+            digest.update(data)
+            f_out.write(data)
         
-        logger.info(f"Arquivo comprimido: {destination}")
-        return True
+        logger.info(f"Arquivo comprimido ({BACKUP_CODEC}): {destination}")
+        return {'bytes_in': bytes_in, 'sha256': digest.hexdigest()}
     
     except Exception as e:
         logger.error(f"Erro ao comprimir arquivo: {e}")
-        return False
+        return None
+
+
+class CompressedDumpStream(io.RawIOBase):
+    """
+    Leitura da saída de um processo de dump já comprimida pelo codec
+    O upload consome o stream em partes; cada read() lê o stdout do dump e
+    passa pelo compressor, então dump, compressão e envio se sobrepõem
+    O SHA-256 do que foi entregue (o objeto comprimido) é calculado no caminho
+    read_seconds e compress_seconds medem a espera pelo dump e o compressor
+    """
+
+    def __init__(self, process: subprocess.Popen, compressor):
+        self.process = process
+        self.compressor = compressor
+        self.buffer = bytearray()
+        self.finished = False
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.sha256 = hashlib.sha256()
+        self.read_seconds = 0.0
+        self.compress_seconds = 0.0
+
+    def readable(self) -> bool:
+        return True
+
+    def _fill(self, size: int):
+        """Comprime o dump até ter `size` bytes no buffer ou chegar ao fim"""
+        while not self.finished and len(self.buffer) < size:
+            start = time.perf_counter()
+            chunk = self.process.stdout.read(READ_CHUNK_SIZE)
+            read_end = time.perf_counter()
+            self.read_seconds += read_end - start
+            if chunk:
+                self.bytes_in += len(chunk)
+                self.buffer += self.compressor.compress(chunk)
+                self.compress_seconds += time.perf_counter() - read_end
+                continue
+            
+            # Fim do stdout: falha do dump aborta o upload antes de completar
+            returncode = self.process.wait()
+            if returncode != 0:
+                raise RuntimeError(f"Processo de dump terminou com código {returncode}")
+            self.buffer += self.compressor.flush()
+            self.compress_seconds += time.perf_counter() - read_end
+            self.finished = True
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            self._fill(float('inf'))
+            size = len(self.buffer)
+        else:
+            self._fill(size)
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        self.bytes_out += len(data)
+        self.sha256.update(data)
+        return data
+
+    def readinto(self, b) -> int:
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
 
 
-def upload_to_s3(file_path: str, s3_key: str) -> bool:
+def stream_backup_to_s3(s3_key: str) -> dict:
+    """
+    Executa o dump e envia a saída comprimida direto para o S3
+    Retorna as estatísticas do backup ou None em caso de falha
+    """
+    if DB_TYPE == 'mysql':
+        cmd, env = mysql_dump_command(), None
+    else:
+        cmd, env = postgres_dump_command(), postgres_env()
+    
+    return stream_command_to_s3(cmd, env, s3_key, new_compressor())
+
+
+def stream_command_to_s3(cmd: list, env: dict, s3_key: str, compressor) -> dict:
+    """
+    Executa um comando de dump e envia o stdout comprimido direto para o S3
+    Retorna as estatísticas (bytes, SHA-256, duração total e das etapas de
+    leitura e compressão) ou None em caso de falha
+    """
+    transfer_config = TransferConfig(
+        multipart_chunksize=PART_SIZE_MB * 1024 * 1024,
+        max_concurrency=UPLOAD_CONCURRENCY
+    )
+    start = time.perf_counter()
+    
+    # stderr vai para um arquivo temporário para não travar o dump se o
+    # pipe encher enquanto o stdout é consumido
+    with tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_file, env=env)
+        stream = CompressedDumpStream(process, compressor)
+        try:
+            s3_client.upload_fileobj(
+                stream,
+                BACKUP_BUCKET,
+                s3_key,
+                ExtraArgs={'ServerSideEncryption': 'AES256', 'Metadata': backup_metadata()},
+                Config=transfer_config
+            )
+        except Exception as e:
+            process.kill()
+            process.wait()
+            stderr_file.seek(0)
+            stderr = stderr_file.read().decode(errors='replace').strip()
+            logger.error(f"Erro no backup em streaming: {e}")
+            if stderr:
+                logger.error(f"Saída de erro do dump: {stderr}")
+            return None
+    
+    elapsed = time.perf_counter() - start
+    logger.info(
+        f"Backup enviado para S3: s3://{BACKUP_BUCKET}/{s3_key} "
+        f"({format_size(stream.bytes_in)} -> {format_size(stream.bytes_out)} "
+        f"com {BACKUP_CODEC} em {elapsed:.1f}s)"
+    )
+    return {
+        'bytes_in': stream.bytes_in,
+        'bytes_out': stream.bytes_out,
+        'sha256': stream.sha256.hexdigest(),
+        'seconds': elapsed,
+        'read_seconds': round(stream.read_seconds, 3),
+        'compress_seconds': round(stream.compress_seconds, 3)
+    }
+
+
+def upload_to_s3(file_path: str, s3_key: str, metadata: dict = None) -> bool:
     """Faz upload do arquivo para S3"""
     try:
         s3_client.upload_file(
             file_path,
             BACKUP_BUCKET,
             s3_key,
-            ExtraArgs={'ServerSideEncryption': 'AES256'}
+            ExtraArgs={'ServerSideEncryption': 'AES256', 'Metadata': metadata or backup_metadata()}
         )
         
         logger.info(f"Arquivo enviado para S3: s3://{BACKUP_BUCKET}/{s3_key}")
@@ -158,33 +443,752 @@ def upload_to_s3(file_path: str, s3_key: str) -> bool:
         return False
 
 
-def cleanup_old_backups(days: int = 30):
-    """Remove backups antigos do S3"""
-    try:
-        cutoff_date = datetime.now() - timedelta(days=days)
+class SnapshotSession:
+    """
+    Sessão do cliente do banco mantida aberta durante o backup paralelo
+    - mysql com BACKUP_MYSQL_CONSISTENCY=lock: FLUSH TABLES WITH READ LOCK;
+      as escritas ficam bloqueadas até o fim do backup, então todos os
+      dumps por tabela veem o mesmo estado. Com 'none' nenhuma sessão é
+      aberta e cada dump usa só o seu --single-transaction
+    - postgres: transação REPEATABLE READ que exporta o snapshot; cada
+      pg_dump usa --snapshot e nada é bloqueado
+    """
+
+    def __init__(self):
+        self.process = None
+        self.snapshot = None
+
+    def __enter__(self):
+        if DB_TYPE == 'mysql' and MYSQL_CONSISTENCY != 'lock':
+            return self
+        if DB_TYPE == 'mysql':
+            # -n: sem buffer, o resultado sai assim que a consulta termina
+            cmd = ['mysql', *mysql_connection_args(), '-N', '-B', '-n', DB_NAME]
+            env = None
+            statements = "FLUSH TABLES WITH READ LOCK;\nSELECT 'locked';\n"
+        else:
+            cmd = ['psql', *postgres_connection_args(), '-X', '-q', '-A', '-t', '-v', 'ON_ERROR_STOP=1', DB_NAME]
+            env = postgres_env()
+            statements = "BEGIN ISOLATION LEVEL REPEATABLE READ READ ONLY;\nSELECT pg_export_snapshot();\n"
+        
+        self.process = subprocess.Popen(
+            cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=env, text=True
+        )
+        self.process.stdin.write(statements)
+        self.process.stdin.flush()
+        
+        # A sessão só responde depois de obter o lock/snapshot
+        line = self.process.stdout.readline().strip()
+        if not line:
+            self.process.kill()
+            self.process.wait()
+            raise RuntimeError(f"Não foi possível abrir o snapshot (código {self.process.returncode})")
+        if DB_TYPE == 'postgres':
+            self.snapshot = line
+        return self
+
+    def __exit__(self, *exc):
+        if self.process is None:
+            return False
+        statement = "UNLOCK TABLES;\n" if DB_TYPE == 'mysql' else "COMMIT;\n"
+        try:
+            self.process.stdin.write(statement)
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+        self.process.wait()
+        return False
+
+
+def list_tables() -> list:
+    """
+    Lista as tabelas do banco com o tamanho em disco, maiores primeiro
+    Retorna tuplas (nome, bytes, tipo); o tipo 'sequence' só existe no PostgreSQL
+    """
+    if DB_TYPE == 'mysql':
+        query = (
+            "SELECT table_name, COALESCE(data_length + index_length, 0), 'table' "
+            "FROM information_schema.tables "
+            "WHERE table_schema = DATABASE() AND table_type = 'BASE TABLE'"
+        )
+        cmd, env = ['mysql', *mysql_connection_args(), '-N', '-B', '-e', query, DB_NAME], None
+    else:
+        query = (
+            "SELECT format('%I.%I', n.nspname, c.relname), pg_total_relation_size(c.oid), "
+            "CASE c.relkind WHEN 'S' THEN 'sequence' ELSE 'table' END "
+            "FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE c.relkind IN ('r', 'S') "
+            "AND n.nspname NOT IN ('pg_catalog', 'information_schema') "
+            "AND n.nspname NOT LIKE 'pg_toast%'"
+        )
+        cmd = ['psql', *postgres_connection_args(), '-X', '-A', '-t', '-F', '\t', '-c', query, DB_NAME]
+        env = postgres_env()
+    
+    result = subprocess.run(cmd, env=env, capture_output=True, text=True, check=True)
+    tables = []
+    for line in result.stdout.splitlines():
+        name, size, kind = line.split('\t')
+        tables.append((name, int(size), kind))
+    return sorted(tables, key=lambda table: table[1], reverse=True)
+
+
+def backup_pieces(tables: list, snapshot: str = None) -> list:
+    """
+    Partes do backup paralelo: pre-data (esquema), uma parte data por
+    tabela (maiores primeiro) e post-data (índices, constraints, triggers,
+    rotinas), cada uma com o comando de dump que a gera
+    """
+    if DB_TYPE == 'mysql':
+        pre_data = mysql_dump_command(['--single-transaction', '--no-data', '--skip-triggers'])
+        post_data = mysql_dump_command([
+            '--single-transaction', '--no-data', '--no-create-info',
+            '--triggers', '--routines', '--events'
+        ])
+        data_options = ['--single-transaction', '--no-create-info', '--skip-triggers']
+        data = lambda names: mysql_dump_command(data_options, names)
+    else:
+        snapshot_options = ['--snapshot', snapshot]
+        pre_data = postgres_dump_command([*snapshot_options, '--section=pre-data'])
+        post_data = postgres_dump_command([*snapshot_options, '--section=post-data'])
+        data = lambda names: postgres_dump_command(
+            [*snapshot_options, '--section=data', *[arg for name in names for arg in ('-t', name)]]
+        )
+    
+    pieces = [{'name': 'schema', 'kind': 'pre-data', 'command': pre_data}]
+    for name, _, kind in tables:
+        if kind == 'table':
+            pieces.append({'name': name, 'kind': 'data', 'table': name, 'command': data([name])})
+    
+    # Valores atuais das sequências (setval), todas em uma parte só
+    sequences = [name for name, _, kind in tables if kind == 'sequence']
+    if sequences:
+        pieces.append({'name': 'sequences', 'kind': 'data', 'command': data(sequences)})
+    
+    pieces.append({'name': 'post-data', 'kind': 'post-data', 'command': post_data})
+    return pieces
+
+
+def piece_key(prefix: str, index: int, name: str) -> str:
+    """Chave S3 de uma parte do backup paralelo"""
+    safe_name = ''.join(c if c.isalnum() or c in '-_' else '_' for c in name.replace('"', ''))
+    return f"{prefix}{index:04d}_{safe_name}.sql{EXTENSIONS[BACKUP_CODEC]}"
+
+
+def delete_keys(keys: list) -> int:
+    """
+    Remove objetos em lotes de até 1000 chaves por chamada (melhor esforço)
+    Retorna quantos foram removidos
+    """
+    deleted = 0
+    for start in range(0, len(keys), DELETE_BATCH_SIZE):
+        batch = keys[start:start + DELETE_BATCH_SIZE]
+        try:
+            response = s3_client.delete_objects(
+                Bucket=BACKUP_BUCKET,
+                Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True}
+            )
+        except ClientError as e:
+            logger.error(f"Erro ao remover objetos do S3: {e}")
+            continue
         
-        response = s3_client.list_objects_v2(
+        # Com Quiet, a resposta só traz as chaves que falharam
+        errors = response.get('Errors', [])
+        for error in errors:
+            logger.error(f"Erro ao remover {error['Key']}: {error.get('Message', error.get('Code'))}")
+        deleted += len(batch) - len(errors)
+    return deleted
+
+
+def parallel_consistency() -> str:
+    """Garantia de consistência entre as partes do backup paralelo, gravada no manifesto"""
+    if DB_TYPE == 'postgres':
+        return 'snapshot'
+    return 'read-lock' if MYSQL_CONSISTENCY == 'lock' else 'per-table'
+
+
+def parallel_backup_to_s3(prefix: str) -> dict:
+    """
+    Exporta esquema e tabelas em paralelo dentro de um snapshot e envia
+    cada parte comprimida como um objeto em `prefix`
+    Retorna o manifesto (também gravado em `prefix`manifest.json) ou None
+    """
+    env = None if DB_TYPE == 'mysql' else postgres_env()
+    # Os workers já ocupam os núcleos; cada compressor paralelo fica com a sua fatia
+    threads = max(1, COMPRESSION_THREADS // BACKUP_WORKERS)
+    start = time.perf_counter()
+    
+    try:
+        tables = list_tables()
+    except (subprocess.CalledProcessError, ValueError) as e:
+        logger.error(f"Erro ao listar as tabelas: {e}")
+        return None
+    
+    logger.info(
+        f"{len(tables)} tabelas/sequências, {BACKUP_WORKERS} workers, "
+        f"consistência {parallel_consistency()}"
+    )
+    
+    def dump_piece(piece: dict) -> dict:
+        stats = stream_command_to_s3(piece.pop('command'), env, piece['key'], new_compressor(threads))
+        if stats is None:
+            return None
+        return {**piece, **stats}
+    
+    try:
+        with SnapshotSession() as session:
+            pieces = backup_pieces(tables, session.snapshot)
+            for index, piece in enumerate(pieces):
+                piece['key'] = piece_key(prefix, index, piece['name'])
+            
+            with ThreadPoolExecutor(max_workers=BACKUP_WORKERS) as executor:
+                results = list(executor.map(dump_piece, pieces))
+    except RuntimeError as e:
+        logger.error(f"Erro no backup paralelo: {e}")
+        return None
+    
+    if any(result is None for result in results):
+        delete_keys([piece['key'] for piece in pieces])
+        return None
+    
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'database': DB_NAME,
+        'db_type': DB_TYPE,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'codec': BACKUP_CODEC,
+        'compression_level': COMPRESSION_LEVEL,
+        'consistency': parallel_consistency(),
+        'seconds': round(time.perf_counter() - start, 3),
+        'pieces': results
+    }
+    
+    # O manifesto vai por último: sem ele o backup é considerado incompleto
+    try:
+        s3_client.put_object(
+            Bucket=BACKUP_BUCKET,
+            Key=f"{prefix}manifest.json",
+            Body=json.dumps(manifest, indent=2).encode(),
+            ContentType='application/json',
+            ServerSideEncryption='AES256'
+        )
+    except ClientError as e:
+        logger.error(f"Erro ao gravar o manifesto: {e}")
+        delete_keys([piece['key'] for piece in pieces])
+        return None
+    
+    total_in = sum(piece['bytes_in'] for piece in results)
+    total_out = sum(piece['bytes_out'] for piece in results)
+    logger.info(
+        f"Backup paralelo enviado para S3: s3://{BACKUP_BUCKET}/{prefix} "
+        f"({len(results)} partes, {format_size(total_in)} -> {format_size(total_out)} "
+        f"em {manifest['seconds']:.1f}s)"
+    )
+    return manifest
+
+
+def list_backup_objects(prefix: str) -> list:
+    """Lista todos os objetos de um prefixo, página por página"""
+    paginator = s3_client.get_paginator('list_objects_v2')
+    objects = []
+    for page in paginator.paginate(Bucket=BACKUP_BUCKET, Prefix=prefix):
+        objects.extend(page.get('Contents', []))
+    return objects
+
+
+def incremental_dump_command() -> tuple:
+    """
+    Comando e ambiente do dump do modo incremental
+    No MySQL as linhas saem em ordem de chave primária e uma por INSERT: com
+    INSERTs estendidos, uma linha que muda de tamanho desloca o início dos
+    INSERTs seguintes e todas as partes depois dela mudariam
+    """
+    if DB_TYPE == 'mysql':
+        return mysql_dump_command([
+            '--single-transaction', '--routines', '--triggers', '--events',
+            '--order-by-primary', '--skip-extended-insert'
+        ]), None
+    return postgres_dump_command(), postgres_env()
+
+
+def incremental_backup_to_s3(index_key: str) -> dict:
+    """
+    Executa o dump, divide a saída em partes definidas pelo conteúdo e envia
+    só as partes novas; o índice é gravado por último em `index_key`
+    Retorna o índice ou None em caso de falha
+    """
+    cmd, env = incremental_dump_command()
+    extension = EXTENSIONS[BACKUP_CODEC]
+    start = time.perf_counter()
+    
+    try:
+        known = {obj['Key'] for obj in list_backup_objects(CHUNK_PREFIX)}
+    except ClientError as e:
+        logger.error(f"Erro ao listar as partes existentes: {e}")
+        return None
+    
+    chunker = ContentDefinedChunker(CHUNK_SIZE_KB * 1024)
+    chunks = []
+    queued = set()
+    pending = deque()
+    totals = {'bytes_in': 0, 'new_bytes': 0, 'new_raw_bytes': 0}
+    # Tempo esperando o dump, dividindo/resumindo as partes, comprimindo
+    # (somado entre as threads de envio) e esperando os envios pendentes
+    timings = {'read_seconds': 0.0, 'chunk_seconds': 0.0, 'compress_seconds': 0.0, 'upload_wait_seconds': 0.0}
+    
+    def upload_chunk(key: str, data: bytes) -> tuple:
+        compress_start = time.perf_counter()
+        compressor = new_compressor(threads=1)
+        body = compressor.compress(data) + compressor.flush()
+        compress_seconds = time.perf_counter() - compress_start
+        s3_client.put_object(
+            Bucket=BACKUP_BUCKET,
+            Key=key,
+            Body=body,
+            ServerSideEncryption='AES256',
+            Metadata=backup_metadata()
+        )
+        return len(body), compress_seconds
+    
+    def add_chunk(data: bytes):
+        sha256 = hashlib.sha256(data).hexdigest()
+        chunks.append([sha256, len(data)])
+        key = chunk_key(sha256, extension)
+        if key in known or key in queued:
+            return
+        queued.add(key)
+        totals['new_raw_bytes'] += len(data)
+        pending.append(executor.submit(upload_chunk, key, data))
+        # Limita as partes em memória aguardando envio
+        while len(pending) > 2 * UPLOAD_CONCURRENCY:
+            wait_for_upload()
+    
+    def wait_for_upload():
+        wait_start = time.perf_counter()
+        size, compress_seconds = pending.popleft().result()
+        timings['upload_wait_seconds'] += time.perf_counter() - wait_start
+        totals['new_bytes'] += size
+        timings['compress_seconds'] += compress_seconds
+    
+    with tempfile.TemporaryFile() as stderr_file, \
+            ThreadPoolExecutor(max_workers=UPLOAD_CONCURRENCY) as executor:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_file, env=env)
+        try:
+            while True:
+                read_start = time.perf_counter()
+                data = process.stdout.read(READ_CHUNK_SIZE)
+                chunk_start = time.perf_counter()
+                timings['read_seconds'] += chunk_start - read_start
+                if not data:
+                    break
+                totals['bytes_in'] += len(data)
+                waited = timings['upload_wait_seconds']
+                for chunk in chunker.feed(data):
+                    add_chunk(chunk)
+                timings['chunk_seconds'] += (
+                    time.perf_counter() - chunk_start - (timings['upload_wait_seconds'] - waited)
+                )
+            last = chunker.flush()
+            if last:
+                add_chunk(last)
+            
+            returncode = process.wait()
+            if returncode != 0:
+                raise RuntimeError(f"Processo de dump terminou com código {returncode}")
+            while pending:
+                wait_for_upload()
+        except (RuntimeError, ClientError) as e:
+            process.kill()
+            process.wait()
+            for future in pending:
+                future.cancel()
+            stderr_file.seek(0)
+            stderr = stderr_file.read().decode(errors='replace').strip()
+            logger.error(f"Erro no backup incremental: {e}")
+            if stderr:
+                logger.error(f"Saída de erro do dump: {stderr}")
+            return None
+    
+    index = {
+        'version': INDEX_VERSION,
+        'database': DB_NAME,
+        'db_type': DB_TYPE,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'codec': BACKUP_CODEC,
+        'compression_level': COMPRESSION_LEVEL,
+        'chunk_prefix': CHUNK_PREFIX,
+        'extension': extension,
+        'chunk_size': CHUNK_SIZE_KB * 1024,
+        'bytes_in': totals['bytes_in'],
+        'new_chunks': len(queued),
+        'new_bytes': totals['new_bytes'],
+        'new_raw_bytes': totals['new_raw_bytes'],
+        'seconds': round(time.perf_counter() - start, 3),
+        **{name: round(value, 3) for name, value in timings.items()},
+        'chunks': chunks
+    }
+    
+    # O índice vai por último: as partes que ele referencia já estão no S3
+    try:
+        s3_client.put_object(
             Bucket=BACKUP_BUCKET,
-            Prefix='backups/'
+            Key=index_key,
+            Body=json.dumps(index).encode(),
+            ContentType='application/json',
+            ServerSideEncryption='AES256'
         )
+    except ClientError as e:
+        logger.error(f"Erro ao gravar o índice: {e}")
+        return None
+    
+    logger.info(
+        f"Backup incremental enviado para S3: s3://{BACKUP_BUCKET}/{index_key} "
+        f"({format_size(index['bytes_in'])} em {len(chunks)} partes; {len(queued)} novas, "
+        f"{format_size(index['new_bytes'])} enviados em {index['seconds']:.1f}s)"
+    )
+    return index
+
+
+def cleanup_unreferenced_chunks(objects: list = None, dry_run: bool = False, grace_days: int = 1) -> int:
+    """
+    Remove as partes de backups incrementais que nenhum índice referencia
+    `objects` é a listagem de backups/ depois da retenção (lista se omitido)
+    Partes mais novas que `grace_days` ficam: podem ser de um backup que
+    ainda não gravou o índice
+    Retorna quantas partes foram (ou seriam, em dry-run) removidas
+    """
+    try:
+        if objects is None:
+            objects = list_backup_objects('backups/')
+        chunk_objects = [obj for obj in objects if obj['Key'].startswith(CHUNK_PREFIX)]
+        if not chunk_objects:
+            return 0
+        
+        referenced = set()
+        for obj in objects:
+            if obj['Key'].endswith(INDEX_SUFFIX):
+                body = s3_client.get_object(Bucket=BACKUP_BUCKET, Key=obj['Key'])['Body'].read()
+                index = json.loads(body)
+                referenced.update(
+                    chunk_key(sha256, index['extension'], index['chunk_prefix'])
+                    for sha256, _ in index['chunks']
+                )
         
-        if 'Contents' not in response:
+        cutoff_date = datetime.now() - timedelta(days=grace_days)
+        unreferenced = [
+            obj['Key'] for obj in chunk_objects
+            if obj['Key'] not in referenced and obj['LastModified'].replace(tzinfo=None) < cutoff_date
+        ]
+        if unreferenced and not dry_run:
+            delete_keys(unreferenced)
+        if unreferenced:
+            prefix = "[dry-run] " if dry_run else ""
+            logger.info(f"{prefix}{len(unreferenced)} partes sem referência removidas")
+        return len(unreferenced)
+    
+    except ClientError as e:
+        logger.error(f"Erro ao limpar partes sem referência: {e}")
+        return 0
+
+
+def cleanup_old_backups(dry_run: bool = RETENTION_DRY_RUN) -> dict:
+    """
+    Remove do S3 os backups fora da política de retenção
+    backups/ é listado por completo com paginação e as remoções vão em
+    lotes pelo delete_objects: O(páginas) chamadas, não O(objetos)
+    Retorna o resumo da limpeza (ou None em caso de erro)
+    """
+    start = time.perf_counter()
+    prefix = "[dry-run] " if dry_run else ""
+    try:
+        objects = list_backup_objects('backups/')
+        
+        if not objects:
             logger.info("Nenhum backup encontrado no S3")
-            return
+            return None
         
-        for obj in response['Contents']:
-            if obj['LastModified'].replace(tzinfo=None) < cutoff_date:
-                s3_client.delete_object(Bucket=BACKUP_BUCKET, Key=obj['Key'])
-                logger.info(f"Backup antigo removido: {obj['Key']}")
+        # As partes dos backups incrementais saem só quando nenhum índice as usa
+        backups = group_backups([obj for obj in objects if not obj['Key'].startswith(CHUNK_PREFIX)])
+        keep = select_backups_to_keep(
+            backups, datetime.now(),
+            days=RETENTION_DAYS, daily=RETENTION_DAILY,
+            weekly=RETENTION_WEEKLY, monthly=RETENTION_MONTHLY
+        )
+        expired = [backup for backup in backups if backup['name'] not in keep]
+        expired_keys = [key for backup in expired for key in backup['keys']]
+        
+        for backup in expired:
+            logger.info(f"{prefix}Backup antigo removido: {backup['name']} ({len(backup['keys'])} objetos)")
+        if expired_keys and not dry_run:
+            delete_keys(expired_keys)
+        
+        removed = set(expired_keys)
+        remaining = [obj for obj in objects if obj['Key'] not in removed]
+        chunks_removed = cleanup_unreferenced_chunks(remaining, dry_run)
     
     except ClientError as e:
         logger.error(f"Erro ao limpar backups antigos: {e}")
+        return None
+    
+    summary = {
+        'objects': len(objects),
+        'backups': len(backups),
+        'kept': len(backups) - len(expired),
+        'expired': len(expired),
+        'objects_removed': len(expired_keys),
+        'chunks_removed': chunks_removed,
+        'seconds': time.perf_counter() - start
+    }
+    logger.info(
+        f"{prefix}Retenção: {summary['objects']} objetos, {summary['kept']} de "
+        f"{summary['backups']} backups mantidos, {summary['objects_removed']} objetos e "
+        f"{summary['chunks_removed']} partes removidos em {summary['seconds']:.2f}s"
+    )
+    return summary
+
+
+def store_checksum(s3_key: str, sha256: str, bytes_in: int) -> bool:
+    """Grava o SHA-256 nos metadados do objeto com uma cópia sobre ele mesmo"""
+    try:
+        s3_client.copy(
+            {'Bucket': BACKUP_BUCKET, 'Key': s3_key},
+            BACKUP_BUCKET,
+            s3_key,
+            ExtraArgs={
+                'Metadata': checksum_metadata(sha256, bytes_in),
+                'MetadataDirective': 'REPLACE',
+                'ServerSideEncryption': 'AES256'
+            },
+            Config=TransferConfig(
+                multipart_chunksize=PART_SIZE_MB * 1024 * 1024,
+                max_concurrency=UPLOAD_CONCURRENCY
+            )
+        )
+        return True
+    
+    except ClientError as e:
+        logger.error(f"Erro ao gravar o SHA-256 nos metadados: {e}")
+        return False
+
+
+class DumpRowCounter:
+    """
+    Conta as linhas de dados por tabela no dump em texto enquanto ele passa
+    - pg_dump: linhas entre "COPY tabela (...) FROM stdin;" e "\."
+    - mysqldump: linhas de cada INSERT (separadores "),(" + 1); um texto
+      com "),(" dentro de uma string conta a mais
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.pending = b''
+        self.copy_table = None
+
+    def feed(self, data: bytes):
+        buffer = self.pending + data
+        end = buffer.rfind(b'\n') + 1
+        self.pending = buffer[end:]
+        self._scan(buffer[:end])
+
+    def _scan(self, text: bytes):
+        """Processa linhas completas; dentro de um COPY conta em bloco"""
+        position = 0
+        while position < len(text):
+            if self.copy_table is not None:
+                if text.startswith(b'\\.\n', position):
+                    position += 3
+                    self.copy_table = None
+                    continue
+                stop = text.find(b'\n\\.\n', position)
+                if stop == -1:
+                    self.counts[self.copy_table] += text.count(b'\n', position)
+                    return
+                self.counts[self.copy_table] += text.count(b'\n', position, stop + 1)
+                position = stop + 4
+                self.copy_table = None
+                continue
+            
+            end = text.index(b'\n', position) + 1
+            line = text[position:end]
+            position = end
+            if line.startswith(b'COPY ') and line.endswith(b' FROM stdin;\n'):
+                self.copy_table = line[5:].split(b' (')[0].decode()
+                self.counts.setdefault(self.copy_table, 0)
+            elif line.startswith(b'INSERT INTO `'):
+                table = line[13:line.index(b'`', 13)].decode()
+                self.counts[table] = self.counts.get(table, 0) + line.count(b'),(') + 1
+
+
+def verification_segments(s3_key: str) -> tuple:
+    """
+    Objetos que formam o backup, na ordem do dump, com o SHA-256 esperado
+    Retorna ([(chave, sha256, 'stored'|'content')], tamanho original):
+    'stored' confere o objeto comprimido, 'content' o conteúdo descomprimido
+    """
+    if BACKUP_MODE == 'parallel':
+        manifest = json.loads(s3_client.get_object(Bucket=BACKUP_BUCKET, Key=s3_key)['Body'].read())
+        segments = [(piece['key'], piece['sha256'], 'stored') for piece in manifest['pieces']]
+        return segments, sum(piece['bytes_in'] for piece in manifest['pieces'])
+    
+    if BACKUP_MODE == 'incremental':
+        index = json.loads(s3_client.get_object(Bucket=BACKUP_BUCKET, Key=s3_key)['Body'].read())
+        segments = [
+            (chunk_key(sha256, index['extension'], index['chunk_prefix']), sha256, 'content')
+            for sha256, _ in index['chunks']
+        ]
+        return segments, index['bytes_in']
+    
+    metadata = s3_client.head_object(Bucket=BACKUP_BUCKET, Key=s3_key).get('Metadata', {})
+    if 'sha256' not in metadata:
+        raise RuntimeError(f"Objeto sem SHA-256 nos metadados: {s3_key}")
+    return [(s3_key, metadata['sha256'], 'stored')], int(metadata['uncompressed-size'])
+
+
+def verify_client_command(database: str, sql: str = None) -> tuple:
+    """Cliente do banco de verificação; com `sql`, executa só aquele comando"""
+    if DB_TYPE == 'mysql':
+        cmd = ['mysql', *mysql_connection_args(verify=True), '-N', '-B']
+        return cmd + (['-e', sql] if sql else []) + [database], None
+    cmd = ['psql', *postgres_connection_args(verify=True), '-X', '-q', '-A', '-t', '-F', '\t']
+    return cmd + (['-c', sql] if sql else []) + [database], postgres_env(verify=True)
+
+
+def run_verify_sql(sql: str, database: str) -> list:
+    """Executa uma consulta no banco de verificação e devolve as linhas (campos separados)"""
+    cmd, env = verify_client_command(database, sql)
+    result = subprocess.run(cmd, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Erro no banco de verificação: {result.stderr.strip()}")
+    return [line.split('\t') for line in result.stdout.splitlines() if line]
+
+
+def count_restored_rows(database: str) -> dict:
+    """Contagem de linhas de cada tabela do banco de verificação"""
+    if DB_TYPE == 'mysql':
+        tables = [row[0] for row in run_verify_sql(
+            "SELECT table_name FROM information_schema.tables "
+            "WHERE table_schema = DATABASE() AND table_type = 'BASE TABLE'", database
+        )]
+        quote = lambda table: '`' + table.replace('`', '``') + '`'
+    else:
+        tables = [row[0] for row in run_verify_sql(
+            "SELECT format('%I.%I', schemaname, tablename) FROM pg_tables "
+            "WHERE schemaname NOT IN ('pg_catalog', 'information_schema')", database
+        )]
+        quote = lambda table: table
+    if not tables:
+        return {}
+    
+    query = ' UNION ALL '.join(
+        f"SELECT '{table.replace(chr(39), chr(39) * 2)}', COUNT(*) FROM {quote(table)}" for table in tables
+    )
+    return {table: int(count) for table, count in run_verify_sql(query, database)}
+
+
+def verify_backup(s3_key: str, restore: bool) -> dict:
+    """
+    Relê o backup do S3 em uma passada: confere o SHA-256 de cada objeto, a
+    integridade do gzip/zstd e o tamanho original; com `restore`, carrega o
+    dump em um banco descartável e compara as contagens de linhas
+    Retorna o resumo da verificação; levanta RuntimeError se algo não confere
+    """
+    start = time.perf_counter()
+    segments, expected_size = verification_segments(s3_key)
+    counter = DumpRowCounter()
+    bytes_out = 0
+    
+    maintenance_db = 'mysql' if DB_TYPE == 'mysql' else 'postgres'
+    verify_db = f"verify_{DB_NAME}_{os.getpid()}".replace('-', '_')
+    quoted_db = f"`{verify_db}`" if DB_TYPE == 'mysql' else f'"{verify_db}"'
+    process = None
+    
+    with tempfile.TemporaryFile() as stderr_file:
+        try:
+            if restore:
+                run_verify_sql(f"CREATE DATABASE {quoted_db}", maintenance_db)
+                cmd, env = verify_client_command(verify_db)
+                process = subprocess.Popen(
+                    cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=stderr_file, env=env
+                )
+            
+            for key, sha256, hash_of in segments:
+                decompressor = get_decompressor(BACKUP_CODEC)
+                digest = hashlib.sha256()
+                body = s3_client.get_object(Bucket=BACKUP_BUCKET, Key=key)['Body']
+                for chunk in body.iter_chunks(READ_CHUNK_SIZE):
+                    if hash_of == 'stored':
+                        digest.update(chunk)
+                    data = decompressor.decompress(chunk)
+                    if hash_of == 'content':
+                        digest.update(data)
+                    bytes_out += len(data)
+                    counter.feed(data)
+                    if process:
+                        process.stdin.write(data)
+                data = decompressor.flush()
+                if hash_of == 'content':
+                    digest.update(data)
+                bytes_out += len(data)
+                counter.feed(data)
+                if process:
+                    process.stdin.write(data)
+                
+                if digest.hexdigest() != sha256:
+                    raise RuntimeError(f"SHA-256 de {key} não confere")
+            
+            if bytes_out != expected_size:
+                raise RuntimeError(f"Tamanho descomprimido {bytes_out} difere do dump original ({expected_size})")
+            
+            mismatches = []
+            if process:
+                process.stdin.close()
+                if process.wait() != 0:
+                    stderr_file.seek(0)
+                    stderr = stderr_file.read().decode(errors='replace').strip()
+                    raise RuntimeError(f"Falha ao restaurar no banco de verificação: {stderr}")
+                restored = count_restored_rows(verify_db)
+                mismatches = [
+                    f"{table}: {count} no dump, {restored.get(table, 0)} restauradas"
+                    for table, count in counter.counts.items() if restored.get(table, 0) != count
+                ]
+            if mismatches:
+                raise RuntimeError("Contagens de linhas diferentes: " + '; '.join(mismatches))
+        
+        except (OSError, ValueError) as e:
+            raise RuntimeError(f"Backup corrompido ou ilegível: {e}") from e
+        
+        finally:
+            if process and process.poll() is None:
+                process.kill()
+                process.wait()
+            if restore:
+                try:
+                    run_verify_sql(f"DROP DATABASE IF EXISTS {quoted_db}", maintenance_db)
+                except RuntimeError as e:
+                    logger.error(f"Erro ao remover o banco de verificação: {e}")
+    
+    summary = {
+        'mode': 'restore' if restore else 'checksum',
+        'objects': len(segments),
+        'bytes': bytes_out,
+        'tables': len(counter.counts),
+        'rows': sum(counter.counts.values()),
+        'seconds': time.perf_counter() - start
+    }
+    logger.info(
+        f"Verificação ({summary['mode']}) OK: {summary['objects']} objetos, "
+        f"{format_size(summary['bytes'])}, {summary['rows']} linhas em {summary['tables']} tabelas, "
+        f"{summary['seconds']:.1f}s"
+    )
+    return summary
 
 
 def get_file_size(file_path: str) -> str:
     """Retorna tamanho do arquivo em formato legível"""
-    size_bytes = os.path.getsize(file_path)
-    
+    return format_size(os.path.getsize(file_path))
+
+
+def format_size(size_bytes: float) -> str:
+    """Formata um tamanho em bytes de forma legível"""
     for unit in ['B', 'KB', 'MB', 'GB']:
         if size_bytes < 1024.0:
             return f"{size_bytes:.2f} {unit}"
@@ -193,6 +1197,146 @@ def get_file_size(file_path: str) -> str:
     return f"{size_bytes:.2f} TB"
 
 
+def run_stream_backup(s3_key: str, metrics: BackupMetrics) -> str:
+    """
+    Modo stream: dump, compressão e upload em um único fluxo
+    Retorna o tamanho comprimido (legível) ou None em caso de falha
+    """
+    logger.info(f"Criando backup do banco de dados em streaming: {DB_NAME}")
+    logger.info(f"Enviando para S3: s3://{BACKUP_BUCKET}/{s3_key}")
+    stats = stream_backup_to_s3(s3_key)
+    
+    if stats is None:
+        send_notification(
+            "❌ Falha no Backup do Banco de Dados",
+            f"Erro ao gerar ou enviar o backup do banco {DB_NAME} "
+            f"para s3://{BACKUP_BUCKET}/{s3_key}"
+        )
+        return None
+    
+    metrics.record_pipeline(stats)
+    
+    # O upload multipart fixa os metadados no início; o SHA-256 só existe no
+    # fim, então entra por uma cópia no próprio S3 (sem trafegar os dados)
+    if BACKUP_VERIFY != 'none' and not store_checksum(s3_key, stats['sha256'], stats['bytes_in']):
+        send_notification(
+            "❌ Falha no Backup do Banco de Dados",
+            f"Erro ao gravar o SHA-256 de s3://{BACKUP_BUCKET}/{s3_key}"
+        )
+        return None
+    
+    return format_size(stats['bytes_out'])
+
+
+def run_parallel_backup(prefix: str, metrics: BackupMetrics) -> str:
+    """
+    Modo parallel: partes por tabela exportadas e enviadas em paralelo
+    Retorna o tamanho comprimido total (legível) ou None em caso de falha
+    """
+    logger.info(f"Criando backup paralelo do banco de dados: {DB_NAME}")
+    logger.info(f"Enviando para S3: s3://{BACKUP_BUCKET}/{prefix}")
+    manifest = parallel_backup_to_s3(prefix)
+    
+    if manifest is None:
+        send_notification(
+            "❌ Falha no Backup do Banco de Dados",
+            f"Erro ao gerar ou enviar o backup paralelo do banco {DB_NAME} "
+            f"para s3://{BACKUP_BUCKET}/{prefix}"
+        )
+        return None
+    
+    # Tempos somados entre os workers
+    for piece in manifest['pieces']:
+        metrics.record_pipeline(piece)
+    
+    return format_size(sum(piece['bytes_out'] for piece in manifest['pieces']))
+
+
+def run_incremental_backup(index_key: str, metrics: BackupMetrics) -> str:
+    """
+    Modo incremental: só as partes novas do dump são enviadas
+    Retorna o volume enviado (legível) ou None em caso de falha
+    """
+    logger.info(f"Criando backup incremental do banco de dados: {DB_NAME}")
+    logger.info(f"Enviando para S3: s3://{BACKUP_BUCKET}/{index_key}")
+    index = incremental_backup_to_s3(index_key)
+    
+    if index is None:
+        send_notification(
+            "❌ Falha no Backup do Banco de Dados",
+            f"Erro ao gerar ou enviar o backup incremental do banco {DB_NAME} "
+            f"para s3://{BACKUP_BUCKET}/{index_key}"
+        )
+        return None
+    
+    metrics.record('dump', index['read_seconds'], bytes_out=index['bytes_in'])
+    metrics.record('chunk', index['chunk_seconds'], bytes_in=index['bytes_in'])
+    metrics.record('compress', index['compress_seconds'], bytes_in=index['new_raw_bytes'],
+                   bytes_out=index['new_bytes'])
+    metrics.record('upload', index['upload_wait_seconds'], bytes_in=index['new_bytes'])
+    
+    return (
+        f"{format_size(index['new_bytes'])} enviados "
+        f"({index['new_chunks']} de {len(index['chunks'])} partes novas; "
+        f"dump completo: {format_size(index['bytes_in'])})"
+    )
+
+
+def run_file_backup(backup_path: str, backup_path_gz: str, s3_key: str, metrics: BackupMetrics) -> str:
+    """
+    Modo file: gera o .sql em disco, comprime e envia
+    Retorna o tamanho comprimido (legível) ou None em caso de falha
+    """
+    # 1. Criar backup
+    logger.info(f"Criando backup do banco de dados: {DB_NAME}")
+    with metrics.timer('dump') as stage:
+        if DB_TYPE == 'mysql':
+            success = create_mysql_backup(backup_path)
+        else:
+            success = create_postgres_backup(backup_path)
+        if success:
+            stage.bytes_out = os.path.getsize(backup_path)
+    
+    if not success:
+        send_notification(
+            "❌ Falha no Backup do Banco de Dados",
+            f"Erro ao gerar backup do banco {DB_NAME}"
+        )
+        return None
+    
+    # 2. Comprimir backup
+    logger.info("Comprimindo backup...")
+    with metrics.timer('compress') as stage:
+        compression = compress_file(backup_path, backup_path_gz)
+        if compression is not None:
+            stage.bytes_in = compression['bytes_in']
+            stage.bytes_out = os.path.getsize(backup_path_gz)
+    if compression is None:
+        send_notification(
+            "❌ Falha no Backup do Banco de Dados",
+            "Erro ao comprimir o arquivo de backup"
+        )
+        return None
+    
+    backup_size = get_file_size(backup_path_gz)
+    
+    # 3. Upload para S3
+    logger.info(f"Enviando para S3: s3://{BACKUP_BUCKET}/{s3_key}")
+    
+    metadata = checksum_metadata(compression['sha256'], compression['bytes_in'])
+    with metrics.timer('upload') as stage:
+        uploaded = upload_to_s3(backup_path_gz, s3_key, metadata)
+        stage.bytes_in = os.path.getsize(backup_path_gz)
+    if not uploaded:
+        send_notification(
+            "❌ Falha no Upload do Backup para S3",
+            f"Erro ao enviar backup para s3://{BACKUP_BUCKET}/{s3_key}"
+        )
+        return None
+    
+    return backup_size
+
+
 def main():
     """Função principal"""
     logger.info("=" * 60)
@@ -204,20 +1348,25 @@ def main():
     timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
     
     backup_file = f"backup_{DB_NAME}_{date_iso}.sql"
-    backup_file_gz = f"backup_{DB_NAME}_{timestamp}.sql.gz"
+    backup_file_gz = f"backup_{DB_NAME}_{timestamp}.sql{EXTENSIONS.get(BACKUP_CODEC, '.gz')}"
     
     backup_path = os.path.join(BACKUP_DIR, backup_file)
     backup_path_gz = os.path.join(BACKUP_DIR, backup_file_gz)
     
+    s3_key = f"backups/{backup_file_gz}"
+    metrics = BackupMetrics(DB_NAME, BACKUP_MODE, BACKUP_CODEC, METRICS_NAMESPACE)
+    
+    # Modo parallel: as partes ficam em um prefixo próprio, com o manifesto
+    backup_prefix = f"backups/backup_{DB_NAME}_{timestamp}/"
+    if BACKUP_MODE == 'parallel':
+        s3_key = f"{backup_prefix}manifest.json"
+        backup_file_gz = s3_key[len('backups/'):]
+    elif BACKUP_MODE == 'incremental':
+        backup_file_gz = f"backup_{DB_NAME}_{timestamp}{INDEX_SUFFIX}"
+        s3_key = f"backups/{backup_file_gz}"
+    
     try:
-        # 1. Criar backup
-        logger.info(f"Criando backup do banco de dados: {DB_NAME}")
-        
-        if DB_TYPE == 'mysql':
-            success = create_mysql_backup(backup_path)
-        elif DB_TYPE == 'postgres':
-            success = create_postgres_backup(backup_path)
-        else:
+        if DB_TYPE not in ('mysql', 'postgres'):
             logger.error(f"Tipo de banco não suportado: {DB_TYPE}")
             send_notification(
                 "❌ Falha no Backup do Banco de Dados",
@@ -225,36 +1374,80 @@ def main():
             )
             return 1
         
-        if not success:
+        if BACKUP_MODE not in BACKUP_MODES:
+            logger.error(f"Modo de backup não suportado: {BACKUP_MODE}")
             send_notification(
                 "❌ Falha no Backup do Banco de Dados",
-                f"Erro ao gerar backup do banco {DB_NAME}"
+                f"Modo de backup não suportado: {BACKUP_MODE}"
             )
             return 1
         
-        # 2. Comprimir backup
-        logger.info("Comprimindo backup...")
-        if not compress_file(backup_path, backup_path_gz):
+        if BACKUP_VERIFY not in BACKUP_VERIFY_MODES:
+            logger.error(f"Modo de verificação não suportado: {BACKUP_VERIFY}")
             send_notification(
                 "❌ Falha no Backup do Banco de Dados",
-                "Erro ao comprimir o arquivo de backup"
+                f"Modo de verificação não suportado: {BACKUP_VERIFY}"
             )
             return 1
         
-        backup_size = get_file_size(backup_path_gz)
-        
-        # 3. Upload para S3
-        s3_key = f"backups/{backup_file_gz}"
-        logger.info(f"Enviando para S3: s3://{BACKUP_BUCKET}/{s3_key}")
+        if MYSQL_CONSISTENCY not in MYSQL_CONSISTENCY_MODES:
+            logger.error(f"Consistência do MySQL não suportada: {MYSQL_CONSISTENCY}")
+            send_notification(
+                "❌ Falha no Backup do Banco de Dados",
+                f"Consistência do MySQL não suportada: {MYSQL_CONSISTENCY}"
+            )
+            return 1
         
-        if not upload_to_s3(backup_path_gz, s3_key):
+        if METRICS_FORMAT not in METRICS_FORMATS:
+            logger.error(f"Formato de métricas não suportado: {METRICS_FORMAT}")
             send_notification(
-                "❌ Falha no Upload do Backup para S3",
-                f"Erro ao enviar backup para s3://{BACKUP_BUCKET}/{s3_key}"
+                "❌ Falha no Backup do Banco de Dados",
+                f"Formato de métricas não suportado: {METRICS_FORMAT}"
             )
             return 1
         
-        # 4. Enviar notificação de sucesso
+        try:
+            check_codec(BACKUP_CODEC)
+        except (ValueError, RuntimeError) as e:
+            logger.error(str(e))
+            send_notification("❌ Falha no Backup do Banco de Dados", str(e))
+            return 1
+        
+        # 1-3. Gerar, comprimir e enviar o backup para o S3
+        if BACKUP_MODE == 'stream':
+            backup_size = run_stream_backup(s3_key, metrics)
+        elif BACKUP_MODE == 'parallel':
+            backup_size = run_parallel_backup(backup_prefix, metrics)
+        elif BACKUP_MODE == 'incremental':
+            backup_size = run_incremental_backup(s3_key, metrics)
+        else:
+            backup_size = run_file_backup(backup_path, backup_path_gz, s3_key, metrics)
+        
+        if backup_size is None:
+            return 1
+        
+        # 4. Verificar o backup relendo o que foi gravado no S3
+        verification = "não executada"
+        if BACKUP_VERIFY != 'none':
+            logger.info(f"Verificando backup ({BACKUP_VERIFY})...")
+            try:
+                summary = verify_backup(s3_key, restore=BACKUP_VERIFY == 'restore')
+            except (RuntimeError, ClientError) as e:
+                logger.error(f"Falha na verificação do backup: {e}")
+                send_notification(
+                    "❌ Falha na Verificação do Backup",
+                    f"O backup s3://{BACKUP_BUCKET}/{s3_key} não passou na verificação "
+                    f"({BACKUP_VERIFY}): {e}"
+                )
+                return 1
+            metrics.record('verify', summary['seconds'], bytes_in=summary['bytes'])
+            verification = (
+                f"OK ({summary['mode']}, {summary['rows']} linhas em "
+                f"{summary['tables']} tabelas, {summary['seconds']:.1f}s)"
+            )
+        
+        # 5. Enviar notificação de sucesso
+        metrics_summary = "\n".join(metrics.summary_lines())
         hostname = subprocess.run(['hostname'], capture_output=True, text=True).stdout.strip()
         
         success_message = f"""✅ Backup do banco de dados realizado com SUCESSO!
@@ -262,32 +1455,42 @@ def main():
 Detalhes:
 - Banco de Dados: {DB_NAME}
 - Tipo: {DB_TYPE}
+- Modo: {BACKUP_MODE}
+- Compressão: {BACKUP_CODEC} (nível {COMPRESSION_LEVEL})
 - Data: {date_iso}
 - Timestamp: {timestamp}
 - Arquivo: {backup_file_gz}
 - Tamanho: {backup_size}
 - Localização S3: s3://{BACKUP_BUCKET}/{s3_key}
+- Verificação: {verification}
 - Servidor: {hostname}
 
+Métricas:
+{metrics_summary}
+
 O backup foi comprimido e armazenado com sucesso no bucket S3.
         """
         
         logger.info("Backup concluído com sucesso!")
         send_notification("✅ Backup do Banco de Dados - SUCESSO", success_message)
         
-        # 5. Limpar backups antigos
+        # 6. Limpar backups antigos
         logger.info("Limpando backups antigos...")
-        cleanup_old_backups(days=30)
+        retention = cleanup_old_backups()
+        if retention is not None:
+            metrics.record('retention', retention['seconds'])
         
-        # 6. Limpar arquivos temporários
-        os.remove(backup_path)
-        os.remove(backup_path_gz)
-        logger.info("Arquivos temporários removidos")
+        # 7. Limpar arquivos temporários (o modo stream não grava em disco)
+        if BACKUP_MODE == 'file':
+            os.remove(backup_path)
+            os.remove(backup_path_gz)
+            logger.info("Arquivos temporários removidos")
         
         logger.info("=" * 60)
         logger.info("Processo de backup finalizado")
         logger.info("=" * 60)
         
+        metrics.status = 'success'
         return 0
     
     except Exception as e:
@@ -295,6 +1498,14 @@ O backup foi comprimido e armazenado com sucesso no bucket S3.
         logger.error(error_message)
         send_notification("❌ Falha no Backup do Banco de Dados", error_message)
         return 1
+    
+    finally:
+        # Um registro por execução, inclusive com falha, para acompanhar tendências
+        if METRICS_FORMAT in METRICS_FORMATS:
+            try:
+                metrics.emit(METRICS_FORMAT, METRICS_FILE)
+            except OSError as e:
+                logger.warning(f"Não foi possível gravar as métricas em {METRICS_FILE}: {e}")
 
 
 if __name__ == '__main__':
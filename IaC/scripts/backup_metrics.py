@@ -0,0 +1,146 @@
+"""
+========================================================================
+Métricas por etapa do backup
+========================================================================
+Usado por backup_database.py. Cada etapa (dump, compress, upload, verify,
+retention...) registra duração, bytes de entrada e saída, MB/s e taxa de
+compressão; ao final do processo um único registro com todas as etapas,
+o tempo total e o pico de memória (RSS) do script e dos processos de dump
+é gravado como uma linha em BACKUP_METRICS_FILE:
+- json: uma linha JSON por execução
+- emf: CloudWatch Embedded Metric Format; o agente do CloudWatch lendo o
+  arquivo com o formato EMF habilitado transforma os campos em métricas
+  (namespace BACKUP_METRICS_NAMESPACE, dimensões Database e Mode)
+- none: não grava
+
+Nos modos stream, parallel e incremental dump, compressão e envio
+acontecem ao mesmo tempo: dump e compress são o tempo gasto esperando o
+stdout do dump e dentro do compressor, e upload é o restante do tempo do
+fluxo. No modo parallel os tempos são somados entre os workers.
+========================================================================
+"""
+
+import json
+import resource
+import time
+
+FORMATS = ('json', 'emf', 'none')
+
+
+def peak_rss_mb(who: int) -> float:
+    """Pico de memória residente em MB (ru_maxrss vem em KB no Linux)"""
+    return resource.getrusage(who).ru_maxrss / 1024
+
+
+class BackupMetrics:
+    """Acumula as métricas das etapas de uma execução do backup"""
+
+    def __init__(self, database: str, mode: str, codec: str, namespace: str = 'BeiraMar/Backup'):
+        self.dimensions = {'Database': database, 'Mode': mode}
+        self.namespace = namespace
+        self.codec = codec
+        self.stages = {}
+        self.status = 'failure'
+        self.start = time.perf_counter()
+
+    def record(self, stage: str, seconds: float, bytes_in: int = None, bytes_out: int = None):
+        """Registra (ou acumula) uma etapa"""
+        entry = self.stages.setdefault(stage, {'seconds': 0.0})
+        entry['seconds'] += seconds
+        for field, value in (('bytes_in', bytes_in), ('bytes_out', bytes_out)):
+            if value is not None:
+                entry[field] = entry.get(field, 0) + value
+
+        # Vazão sobre o maior volume que passou pela etapa
+        volume = max(entry.get('bytes_in', 0), entry.get('bytes_out', 0))
+        if volume and entry['seconds'] > 0:
+            entry['mb_per_s'] = round(volume / 1024 / 1024 / entry['seconds'], 2)
+        if entry.get('bytes_in') and entry.get('bytes_out') and stage == 'compress':
+            entry['ratio'] = round(entry['bytes_in'] / entry['bytes_out'], 2)
+
+    def timer(self, stage: str):
+        """Context manager que registra a duração do bloco como uma etapa"""
+        return _StageTimer(self, stage)
+
+    def record_pipeline(self, stats: dict):
+        """Etapas dump/compress/upload a partir das estatísticas de um fluxo de streaming"""
+        read = stats['read_seconds']
+        compress = stats['compress_seconds']
+        self.record('dump', read, bytes_out=stats['bytes_in'])
+        self.record('compress', compress, bytes_in=stats['bytes_in'], bytes_out=stats['bytes_out'])
+        self.record('upload', max(0.0, stats['seconds'] - read - compress), bytes_in=stats['bytes_out'])
+
+    def to_record(self) -> dict:
+        """Registro único da execução com todas as etapas"""
+        record = {
+            **self.dimensions,
+            'codec': self.codec,
+            'status': self.status,
+            'total_seconds': round(time.perf_counter() - self.start, 3),
+            'peak_rss_mb': round(peak_rss_mb(resource.RUSAGE_SELF), 1),
+            'peak_rss_children_mb': round(peak_rss_mb(resource.RUSAGE_CHILDREN), 1),
+        }
+        for stage, entry in self.stages.items():
+            for field, value in entry.items():
+                record[f"{stage}_{field}"] = round(value, 3) if isinstance(value, float) else value
+        return record
+
+    def to_emf(self) -> dict:
+        """Registro no CloudWatch Embedded Metric Format"""
+        record = self.to_record()
+        units = {'seconds': 'Seconds', 'bytes_in': 'Bytes', 'bytes_out': 'Bytes', 'mb_per_s': 'None',
+                 'ratio': 'None', 'rss_mb': 'Megabytes', 'children_mb': 'Megabytes'}
+        metrics = [
+            {'Name': name, 'Unit': next(unit for suffix, unit in units.items() if name.endswith(suffix))}
+            for name, value in record.items()
+            if isinstance(value, (int, float)) and any(name.endswith(suffix) for suffix in units)
+        ]
+        record['_aws'] = {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': self.namespace,
+                'Dimensions': [list(self.dimensions)],
+                'Metrics': metrics
+            }]
+        }
+        return record
+
+    def emit(self, output_format: str, path: str):
+        """Grava o registro como uma linha JSON (ou EMF) no arquivo de métricas"""
+        if output_format == 'none':
+            return
+        record = self.to_emf() if output_format == 'emf' else self.to_record()
+        with open(path, 'a') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def summary_lines(self) -> list:
+        """Linhas legíveis das etapas para o relatório do SNS"""
+        lines = []
+        for stage, entry in self.stages.items():
+            details = [f"{entry['seconds']:.1f}s"]
+            if 'mb_per_s' in entry:
+                details.append(f"{entry['mb_per_s']:.1f} MB/s")
+            if 'ratio' in entry:
+                details.append(f"taxa {entry['ratio']:.2f}x")
+            lines.append(f"- {stage}: {', '.join(details)}")
+        lines.append(f"- pico de memória: {peak_rss_mb(resource.RUSAGE_SELF):.0f} MB (script), "
+                     f"{peak_rss_mb(resource.RUSAGE_CHILDREN):.0f} MB (dump)")
+        return lines
+
+
+class _StageTimer:
+    """Mede um bloco; bytes_in/bytes_out podem ser preenchidos dentro dele"""
+
+    def __init__(self, metrics: BackupMetrics, stage: str):
+        self.metrics = metrics
+        self.stage = stage
+        self.bytes_in = None
+        self.bytes_out = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.record(self.stage, time.perf_counter() - self.start, self.bytes_in, self.bytes_out)
+        return False
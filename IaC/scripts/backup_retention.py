@@ -0,0 +1,72 @@
+"""
+========================================================================
+Política de retenção dos backups
+========================================================================
+Usado por backup_database.py. Os objetos de backups/ são agrupados por
+backup (um objeto único, o prefixo de um backup paralelo ou o índice de
+um backup incremental) e cada backup é mantido ou removido inteiro.
+
+Política (GFS), todas as regras somadas:
+- days: todos os backups dos últimos N dias
+- daily: o mais recente de cada um dos últimos N dias com backup
+- weekly: o mais recente de cada uma das últimas N semanas (ISO)
+- monthly: o mais recente de cada um dos últimos N meses
+O backup mais recente nunca é removido.
+========================================================================
+"""
+
+import re
+from datetime import datetime, timedelta
+
+# backup_<banco>_<AAAA-MM-DD_HH-MM-SS> no início do nome (objeto ou prefixo)
+BACKUP_NAME = re.compile(r'^backups/(backup_.*_(\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}))')
+
+
+def group_backups(objects: list) -> list:
+    """
+    Agrupa os objetos do list_objects_v2 por backup
+    Retorna dicts com name, time (hora local do nome, ou LastModified se o
+    nome não tiver data) e keys
+    """
+    backups = {}
+    for obj in objects:
+        match = BACKUP_NAME.match(obj['Key'])
+        if match:
+            name = match.group(1)
+            backup_time = datetime.strptime(match.group(2), '%Y-%m-%d_%H-%M-%S')
+        else:
+            name = obj['Key']
+            backup_time = obj['LastModified'].astimezone().replace(tzinfo=None)
+        backup = backups.setdefault(name, {'name': name, 'time': backup_time, 'keys': []})
+        backup['keys'].append(obj['Key'])
+    return list(backups.values())
+
+
+def select_backups_to_keep(backups: list, now: datetime, days: int = 30,
+                           daily: int = 0, weekly: int = 0, monthly: int = 0) -> set:
+    """Nomes dos backups mantidos pela política; os demais expiraram"""
+    ordered = sorted(backups, key=lambda backup: backup['time'], reverse=True)
+    if not ordered:
+        return set()
+
+    keep = {ordered[0]['name']}
+    cutoff_date = now - timedelta(days=days)
+    keep.update(backup['name'] for backup in ordered if backup['time'] >= cutoff_date)
+
+    periods = (
+        (daily, lambda t: t.date()),
+        (weekly, lambda t: tuple(t.isocalendar())[:2]),
+        (monthly, lambda t: (t.year, t.month)),
+    )
+    for count, period_of in periods:
+        seen = set()
+        for backup in ordered:
+            period = period_of(backup['time'])
+            if period in seen:
+                continue
+            if len(seen) >= count:
+                break
+            # O primeiro de cada período na ordem decrescente é o mais recente
+            seen.add(period)
+            keep.add(backup['name'])
+    return keep
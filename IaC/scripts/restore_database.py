@@ -0,0 +1,489 @@
+#!/usr/bin/env python3
+"""
+========================================================================
+Script Python para Restauração de Backup do Banco de Dados
+========================================================================
+Par do backup_database.py: lê o backup do S3 em streaming, descomprime
+com o codec gravado nos metadados/manifesto e alimenta o mysql/psql pelo
+stdin, sem gravar nada em disco. O banco de destino deve estar vazio.
+
+Backups:
+- objeto único (.sql.gz/.sql.zst, modos stream e file): um só fluxo
+- prefixo com manifest.json (modo parallel):
+  1. pre-data: esquema, sem índices secundários nem chaves estrangeiras
+  2. data: uma tabela por worker, RESTORE_WORKERS ao mesmo tempo
+  3. índices e constraints em paralelo, depois chaves estrangeiras,
+     triggers e rotinas
+  O SHA-256 de cada parte é conferido com o manifesto durante a leitura.
+- índice .index.json (modo incremental): as partes listadas são baixadas
+  e descomprimidas em paralelo, conferidas pelo SHA-256 e enviadas em
+  ordem ao cliente, reconstruindo o dump completo daquele backup
+
+Ao final informa bytes restaurados, duração e MB/s por etapa (RTO).
+
+Uso:
+    restore_database.py s3://bucket/backups/backup_db_2024-01-01_03-00-00.sql.gz
+    restore_database.py backups/backup_db_2024-01-01_03-00-00/ [--tables a b] [--workers 8]
+    restore_database.py backups/backup_db_2024-01-01_03-00-00.index.json
+========================================================================
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import boto3
+from botocore.exceptions import ClientError
+import logging
+
+from backup_chunks import INDEX_SUFFIX, chunk_key
+from backup_codecs import default_threads, get_decompressor
+
+# Configurar logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler('/var/log/restore_database.log'),
+        logging.StreamHandler(sys.stdout)
+    ]
+)
+logger = logging.getLogger(__name__)
+
+# Configurações do banco de dados de destino
+DB_TYPE = os.environ.get('DB_TYPE', 'mysql')
+DB_HOST = os.environ.get('DB_HOST', 'localhost')
+DB_PORT = os.environ.get('DB_PORT', '3306')
+DB_NAME = os.environ.get('DB_NAME', 'database')
+DB_USER = os.environ.get('DB_USER', 'root')
+DB_PASSWORD = os.environ.get('DB_PASSWORD', '')
+
+# Configurações AWS
+BACKUP_BUCKET = os.environ.get('BACKUP_BUCKET')
+AWS_REGION = os.environ.get('AWS_REGION', 'us-east-1')
+
+# Tabelas carregadas ao mesmo tempo (padrão: todos os núcleos)
+RESTORE_WORKERS = int(os.environ.get('RESTORE_WORKERS') or default_threads())
+# Bytes lidos do S3 por vez antes de passar pelo descompressor
+READ_CHUNK_SIZE = 1024 * 1024
+
+MANIFEST_NAME = 'manifest.json'
+
+# Cliente AWS
+s3_client = boto3.client('s3', region_name=AWS_REGION)
+
+
+def client_command(database: str) -> tuple:
+    """Comando e ambiente do cliente que executa o SQL lido do stdin"""
+    if DB_TYPE == 'mysql':
+        cmd = ['mysql', '-h', DB_HOST, '-P', DB_PORT, '-u', DB_USER, f'-p{DB_PASSWORD}', database]
+        return cmd, None
+
+    cmd = ['psql', '-h', DB_HOST, '-p', DB_PORT, '-U', DB_USER, '-X', '-q', '-v', 'ON_ERROR_STOP=1', database]
+    env = os.environ.copy()
+    env['PGPASSWORD'] = DB_PASSWORD
+    return cmd, env
+
+
+def codec_from_object(key: str) -> str:
+    """Codec gravado nos metadados do objeto; sem metadados, deduz pela extensão"""
+    metadata = s3_client.head_object(Bucket=BACKUP_BUCKET, Key=key).get('Metadata', {})
+    if 'codec' in metadata:
+        return metadata['codec']
+    return 'zstd' if key.endswith('.zst') else 'gzip'
+
+
+def stream_object_to_client(key: str, codec: str, database: str, sha256: str = None) -> dict:
+    """
+    Lê o objeto do S3, descomprime e envia ao cliente do banco pelo stdin
+    Download, descompressão e carga acontecem ao mesmo tempo
+    Retorna as estatísticas da carga; levanta RuntimeError em caso de falha
+    """
+    cmd, env = client_command(database)
+    decompressor = get_decompressor(codec)
+    digest = hashlib.sha256()
+    bytes_in = 0
+    bytes_out = 0
+    start = time.perf_counter()
+
+    # stderr vai para um arquivo temporário para não travar o cliente se o
+    # pipe encher enquanto o stdin é alimentado
+    with tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(
+            cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=stderr_file, env=env
+        )
+        try:
+            body = s3_client.get_object(Bucket=BACKUP_BUCKET, Key=key)['Body']
+            for chunk in body.iter_chunks(READ_CHUNK_SIZE):
+                bytes_in += len(chunk)
+                digest.update(chunk)
+                data = decompressor.decompress(chunk)
+                bytes_out += len(data)
+                process.stdin.write(data)
+            data = decompressor.flush()
+            bytes_out += len(data)
+            process.stdin.write(data)
+            process.stdin.close()
+            returncode = process.wait()
+        except (ClientError, OSError, ValueError) as e:
+            process.kill()
+            process.wait()
+            returncode = None
+            error = e
+
+        stderr_file.seek(0)
+        stderr = stderr_file.read().decode(errors='replace').strip()
+
+    if returncode is None:
+        raise RuntimeError(f"Erro ao restaurar {key}: {error} {stderr}".strip())
+    if returncode != 0:
+        raise RuntimeError(f"Cliente do banco terminou com código {returncode} em {key}: {stderr}")
+    if sha256 and digest.hexdigest() != sha256:
+        raise RuntimeError(f"SHA-256 de {key} não confere com o manifesto")
+
+    elapsed = time.perf_counter() - start
+    logger.info(
+        f"Restaurado {key}: {format_size(bytes_in)} -> {format_size(bytes_out)} "
+        f"em {elapsed:.1f}s ({bytes_out / 1024 / 1024 / max(elapsed, 1e-9):.1f} MB/s)"
+    )
+    return {'key': key, 'bytes_in': bytes_in, 'bytes_out': bytes_out, 'seconds': elapsed}
+
+
+def run_sql(sql: str, database: str):
+    """Executa um bloco de SQL no cliente do banco; levanta RuntimeError em caso de falha"""
+    cmd, env = client_command(database)
+    result = subprocess.run(
+        cmd, input=sql.encode(), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, env=env
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Erro ao executar SQL: {result.stderr.decode(errors='replace').strip()}")
+
+
+def read_object_text(key: str, codec: str) -> str:
+    """Lê e descomprime um objeto pequeno (esquema) inteiro em memória"""
+    decompressor = get_decompressor(codec)
+    body = s3_client.get_object(Bucket=BACKUP_BUCKET, Key=key)['Body'].read()
+    return (decompressor.decompress(body) + decompressor.flush()).decode()
+
+
+# Linhas de índice/chave do CREATE TABLE do mysqldump que podem ser adiadas
+MYSQL_KEY_LINE = re.compile(r'^\s+(UNIQUE KEY|KEY|FULLTEXT KEY|SPATIAL KEY) ')
+MYSQL_FK_LINE = re.compile(r'^\s+CONSTRAINT .* FOREIGN KEY ')
+MYSQL_CREATE_TABLE = re.compile(r'^CREATE TABLE `((?:[^`]|``)+)` \($')
+MYSQL_AUTO_INCREMENT_COLUMN = re.compile(r'^\s+(`(?:[^`]|``)+`) .*AUTO_INCREMENT')
+
+
+def split_mysql_schema(sql: str) -> tuple:
+    """
+    Tira índices secundários e chaves estrangeiras dos CREATE TABLE do
+    mysqldump para serem criados depois da carga dos dados
+    A PRIMARY KEY fica (é o índice clusterizado do InnoDB), assim como os
+    índices da coluna AUTO_INCREMENT, que o MySQL exige na criação
+    Retorna (esquema, [(fase, ALTER TABLE)]): fase 1 índices, fase 2 FKs
+    """
+    output = []
+    deferred = []
+    table = None
+    body = []
+
+    for line in sql.splitlines():
+        if table is None:
+            match = MYSQL_CREATE_TABLE.match(line)
+            if match:
+                table, body = match.group(1), []
+            output.append(line)
+            continue
+
+        if not line.startswith(')'):
+            body.append(line[:-1] if line.endswith(',') else line)
+            continue
+
+        # Fim do CREATE TABLE: separa o que pode ser adiado e refaz as vírgulas
+        auto_columns = [m.group(1) for m in map(MYSQL_AUTO_INCREMENT_COLUMN.match, body) if m]
+        kept, keys, foreign_keys = [], [], []
+        for definition in body:
+            if MYSQL_KEY_LINE.match(definition) and not any(col in definition for col in auto_columns):
+                keys.append(definition.strip())
+            elif MYSQL_FK_LINE.match(definition):
+                foreign_keys.append(definition.strip())
+            else:
+                kept.append(definition)
+        output.append(',\n'.join(kept))
+        output.append(line)
+
+        if keys:
+            deferred.append((1, f"ALTER TABLE `{table}` {', '.join('ADD ' + key for key in keys)};"))
+        if foreign_keys:
+            deferred.append((2, f"ALTER TABLE `{table}` {', '.join('ADD ' + fk for fk in foreign_keys)};"))
+        table = None
+
+    return '\n'.join(output) + '\n', deferred
+
+
+# Cabeçalho de cada entrada do pg_dump em texto
+POSTGRES_ENTRY_HEADER = re.compile(r'^--\n-- Name: [^\n]*; Type: ([^;\n]+);[^\n]*\n--\n', re.MULTILINE)
+
+
+def split_postgres_post_data(sql: str) -> tuple:
+    """
+    Separa a seção post-data do pg_dump em entradas
+    Índices e constraints (PK, UNIQUE, CHECK) são independentes entre si
+    e vão para a fase 1; chaves estrangeiras, triggers e o resto ficam na
+    fase 2, na ordem original
+    Retorna (preâmbulo com os SET, [(fase, SQL)])
+    """
+    # \restrict/\unrestrict protegem contra dumps de terceiros; os nossos
+    # trechos rodam em sessões separadas e não usam meta-comandos
+    sql = '\n'.join(line for line in sql.splitlines() if not line.startswith(('\\restrict', '\\unrestrict')))
+
+    headers = list(POSTGRES_ENTRY_HEADER.finditer(sql))
+    if not headers:
+        return sql, []
+
+    preamble = sql[:headers[0].start()]
+    entries = []
+    for header, following in zip(headers, headers[1:] + [None]):
+        end = following.start() if following else len(sql)
+        phase = 1 if header.group(1) in ('INDEX', 'CONSTRAINT') else 2
+        entries.append((phase, sql[header.end():end]))
+    return preamble, entries
+
+
+def run_deferred(preamble: str, deferred: list, database: str, workers: int) -> dict:
+    """Executa a fase 1 em paralelo e a fase 2 em uma única sessão, em ordem"""
+    start = time.perf_counter()
+    first = [sql for phase, sql in deferred if phase == 1]
+    second = [sql for phase, sql in deferred if phase == 2]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(lambda sql: run_sql(preamble + sql, database), first))
+    if second:
+        run_sql(preamble + '\n'.join(second), database)
+
+    elapsed = time.perf_counter() - start
+    logger.info(f"{len(first)} índices/constraints e {len(second)} objetos finais criados em {elapsed:.1f}s")
+    return {'seconds': elapsed}
+
+
+def matches_tables(piece: dict, tables: list) -> bool:
+    """Verifica se a parte de dados é de uma das tabelas pedidas (com ou sem schema)"""
+    table = piece.get('table')
+    if table is None:
+        # Valores das sequências: só na restauração completa
+        return not tables
+    return not tables or table in tables or table.split('.')[-1] in tables
+
+
+def restore_manifest(prefix: str, database: str, tables: list, workers: int) -> dict:
+    """
+    Restaura um backup do modo parallel a partir do manifesto
+    Retorna os tempos de cada etapa
+    """
+    manifest = json.loads(
+        s3_client.get_object(Bucket=BACKUP_BUCKET, Key=f"{prefix}{MANIFEST_NAME}")['Body'].read()
+    )
+    codec = manifest['codec']
+    pieces = manifest['pieces']
+    if manifest['db_type'] != DB_TYPE:
+        raise RuntimeError(f"Backup de {manifest['db_type']} não pode ser restaurado em {DB_TYPE}")
+
+    pre_data = next(piece for piece in pieces if piece['kind'] == 'pre-data')
+    post_data = next(piece for piece in pieces if piece['kind'] == 'post-data')
+    data = [piece for piece in pieces if piece['kind'] == 'data' and matches_tables(piece, tables)]
+    stages = {}
+
+    # 1. Esquema (no MySQL sem os índices secundários e FKs, adiados para o fim)
+    start = time.perf_counter()
+    if DB_TYPE == 'mysql':
+        schema, deferred = split_mysql_schema(read_object_text(pre_data['key'], codec))
+        run_sql(schema, database)
+        stages['pre-data'] = {'bytes_out': len(schema), 'seconds': time.perf_counter() - start}
+    else:
+        deferred = []
+        stages['pre-data'] = stream_object_to_client(pre_data['key'], codec, database, pre_data.get('sha256'))
+
+    # 2. Dados, uma tabela por worker (o manifesto já vem com as maiores primeiro)
+    start = time.perf_counter()
+    logger.info(f"Carregando {len(data)} partes com {workers} workers")
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        loaded = list(executor.map(
+            lambda piece: stream_object_to_client(piece['key'], codec, database, piece.get('sha256')),
+            data
+        ))
+    stages['data'] = {
+        'bytes_in': sum(piece['bytes_in'] for piece in loaded),
+        'bytes_out': sum(piece['bytes_out'] for piece in loaded),
+        'seconds': time.perf_counter() - start
+    }
+
+    # 3. Índices e constraints em paralelo, depois FKs, triggers e rotinas
+    if DB_TYPE == 'mysql':
+        post_sql = read_object_text(post_data['key'], codec)
+        stages['post-data'] = run_deferred('SET FOREIGN_KEY_CHECKS=0;\n', deferred, database, workers)
+        start = time.perf_counter()
+        run_sql(post_sql, database)
+        stages['post-data']['seconds'] += time.perf_counter() - start
+    else:
+        preamble, entries = split_postgres_post_data(read_object_text(post_data['key'], codec))
+        stages['post-data'] = run_deferred(preamble, entries, database, workers)
+
+    return stages
+
+
+def fetch_chunk(key: str, codec: str, sha256: str) -> tuple:
+    """Baixa e descomprime uma parte do backup incremental, conferindo o SHA-256"""
+    body = s3_client.get_object(Bucket=BACKUP_BUCKET, Key=key)['Body'].read()
+    decompressor = get_decompressor(codec)
+    data = decompressor.decompress(body) + decompressor.flush()
+    if hashlib.sha256(data).hexdigest() != sha256:
+        raise RuntimeError(f"SHA-256 de {key} não confere com o conteúdo")
+    return len(body), data
+
+
+def restore_index(key: str, database: str, workers: int) -> dict:
+    """
+    Restaura um backup incremental: as partes são baixadas em paralelo
+    (no máximo 2 por worker em memória) e enviadas em ordem ao cliente
+    """
+    index = json.loads(s3_client.get_object(Bucket=BACKUP_BUCKET, Key=key)['Body'].read())
+    if index['db_type'] != DB_TYPE:
+        raise RuntimeError(f"Backup de {index['db_type']} não pode ser restaurado em {DB_TYPE}")
+
+    codec = index['codec']
+    chunks = iter(index['chunks'])
+    cmd, env = client_command(database)
+    bytes_in = 0
+    bytes_out = 0
+    start = time.perf_counter()
+    logger.info(f"Restaurando {len(index['chunks'])} partes com {workers} workers")
+
+    with tempfile.TemporaryFile() as stderr_file, ThreadPoolExecutor(max_workers=workers) as executor:
+        process = subprocess.Popen(
+            cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=stderr_file, env=env
+        )
+        pending = deque()
+
+        def submit_next():
+            for sha256, _ in chunks:
+                chunk = chunk_key(sha256, index['extension'], index['chunk_prefix'])
+                pending.append(executor.submit(fetch_chunk, chunk, codec, sha256))
+                return
+
+        try:
+            # No MySQL o dump incremental tem um INSERT por linha: uma única
+            # transação evita um commit (e um fsync) por linha
+            if DB_TYPE == 'mysql':
+                process.stdin.write(b"SET autocommit=0;\n")
+            for _ in range(2 * workers):
+                submit_next()
+            while pending:
+                size, data = pending.popleft().result()
+                submit_next()
+                bytes_in += size
+                bytes_out += len(data)
+                process.stdin.write(data)
+            if DB_TYPE == 'mysql':
+                process.stdin.write(b"\nCOMMIT;\n")
+            process.stdin.close()
+            returncode = process.wait()
+        except (ClientError, OSError, ValueError, RuntimeError) as e:
+            process.kill()
+            process.wait()
+            for future in pending:
+                future.cancel()
+            returncode = None
+            error = e
+
+        stderr_file.seek(0)
+        stderr = stderr_file.read().decode(errors='replace').strip()
+
+    if returncode is None:
+        raise RuntimeError(f"Erro ao restaurar {key}: {error} {stderr}".strip())
+    if returncode != 0:
+        raise RuntimeError(f"Cliente do banco terminou com código {returncode} em {key}: {stderr}")
+
+    elapsed = time.perf_counter() - start
+    return {'data': {'key': key, 'bytes_in': bytes_in, 'bytes_out': bytes_out, 'seconds': elapsed}}
+
+
+def restore_object(key: str, database: str) -> dict:
+    """Restaura um backup de objeto único (modos stream e file)"""
+    return {'data': stream_object_to_client(key, codec_from_object(key), database)}
+
+
+def format_size(size_bytes: float) -> str:
+    """Formata um tamanho em bytes de forma legível"""
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size_bytes < 1024.0:
+            return f"{size_bytes:.2f} {unit}"
+        size_bytes /= 1024.0
+
+    return f"{size_bytes:.2f} TB"
+
+
+def report(stages: dict, elapsed: float):
+    """Registra o tempo e a vazão de cada etapa e do total"""
+    logger.info(f"{'Etapa':<12}{'Restaurado':>14}{'Duração':>10}{'Vazão':>14}")
+    for stage, stats in stages.items():
+        restored = stats.get('bytes_out')
+        size = format_size(restored) if restored is not None else '-'
+        rate = f"{restored / 1024 / 1024 / max(stats['seconds'], 1e-9):.1f} MB/s" if restored is not None else '-'
+        logger.info(f"{stage:<12}{size:>14}{stats['seconds']:>9.1f}s{rate:>14}")
+
+    total = sum(stats.get('bytes_out', 0) for stats in stages.values())
+    logger.info(
+        f"Restauração concluída em {elapsed:.1f}s: {format_size(total)} "
+        f"({total / 1024 / 1024 / max(elapsed, 1e-9):.1f} MB/s)"
+    )
+
+
+def parse_location(location: str) -> str:
+    """Aceita s3://bucket/chave ou só a chave; devolve a chave e ajusta o bucket"""
+    global BACKUP_BUCKET
+    if location.startswith('s3://'):
+        BACKUP_BUCKET, _, location = location[len('s3://'):].partition('/')
+    return location
+
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('backup', help='Objeto .sql.gz/.sql.zst, prefixo do backup paralelo, manifest.json ou .index.json')
+    parser.add_argument('--database', default=DB_NAME, help='Banco de destino (padrão: DB_NAME)')
+    parser.add_argument('--tables', nargs='+', help='Carrega os dados só destas tabelas (modo parallel)')
+    parser.add_argument('--workers', type=int, default=RESTORE_WORKERS)
+    args = parser.parse_args()
+
+    key = parse_location(args.backup)
+    if key.endswith(MANIFEST_NAME):
+        key = key[:-len(MANIFEST_NAME)]
+
+    logger.info("=" * 60)
+    logger.info(f"Restaurando s3://{BACKUP_BUCKET}/{key} em {DB_TYPE}:{args.database}")
+    logger.info("=" * 60)
+
+    start = time.perf_counter()
+    try:
+        if key.endswith('/'):
+            stages = restore_manifest(key, args.database, args.tables, args.workers)
+        elif key.endswith(INDEX_SUFFIX):
+            stages = restore_index(key, args.database, args.workers)
+        else:
+            stages = restore_object(key, args.database)
+    except (RuntimeError, ClientError, ValueError) as e:
+        logger.error(f"Falha na restauração: {e}")
+        return 1
+
+    report(stages, time.perf_counter() - start)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
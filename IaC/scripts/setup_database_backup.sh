@@ -65,8 +65,8 @@ fi
 echo "Instalando Python 3 e pip..."
 sudo yum install -y python3 python3-pip
 
-echo "Instalando boto3..."
-sudo pip3 install boto3
+echo "Instalando boto3 e zstandard..."
+sudo pip3 install boto3 zstandard
 
 # ------------------------------------------------------
 # 5. Criar diretórios necessários
@@ -0,0 +1,92 @@
+"""
+========================================================================
+Transferências S3 concorrentes das Lambdas Beira Mar
+========================================================================
+Cliente S3 com pool de conexões dimensionado para transferências em
+paralelo, download/upload com multipart automático para corpos grandes
+e execução concorrente de leituras e gravações independentes, com o
+tempo de cada objeto registrado no log.
+========================================================================
+"""
+
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+
+# Threads por transferência multipart e objetos transferidos ao mesmo tempo
+THREADS_POR_TRANSFERENCIA = 8
+TRANSFERENCIAS_SIMULTANEAS = 4
+
+# Corpos acima do limite são transferidos em partes paralelas
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=16 * 1024 * 1024,
+    multipart_chunksize=16 * 1024 * 1024,
+    max_concurrency=THREADS_POR_TRANSFERENCIA,
+    use_threads=True
+)
+
+
+def criar_cliente_s3():
+    """
+    Cria o cliente S3 compartilhado pela Lambda
+    O pool comporta todas as partes de todas as transferências simultâneas,
+    para que nenhuma thread espere por conexão livre
+    """
+    return boto3.client(
+        's3',
+        config=Config(
+            max_pool_connections=THREADS_POR_TRANSFERENCIA * TRANSFERENCIAS_SIMULTANEAS,
+            retries={'max_attempts': 5, 'mode': 'adaptive'},
+            tcp_keepalive=True
+        )
+    )
+
+
+def _registrar_tempo(operacao, bucket, key, tamanho, inicio):
+    """Imprime tamanho, duração e vazão de uma transferência"""
+    duracao = time.perf_counter() - inicio
+    megabytes = tamanho / (1024 * 1024)
+    vazao = megabytes / duracao if duracao > 0 else 0.0
+    print(f"   ⏱️  {operacao} s3://{bucket}/{key}: {megabytes:.2f} MB em {duracao:.3f}s ({vazao:.1f} MB/s)")
+
+
+def baixar_bytes(cliente, bucket, key):
+    """Baixa um objeto inteiro para memória (em partes paralelas se for grande)"""
+    inicio = time.perf_counter()
+    destino = io.BytesIO()
+    cliente.download_fileobj(bucket, key, destino, Config=TRANSFER_CONFIG)
+    _registrar_tempo('GET', bucket, key, destino.tell(), inicio)
+    return destino.getvalue()
+
+
+def enviar_bytes(cliente, bucket, key, corpo, **extra_args):
+    """Envia um corpo em memória (em partes paralelas se for grande)"""
+    if isinstance(corpo, str):
+        corpo = corpo.encode('utf-8')
+    inicio = time.perf_counter()
+    cliente.upload_fileobj(
+        io.BytesIO(corpo),
+        bucket,
+        key,
+        ExtraArgs=extra_args or None,
+        Config=TRANSFER_CONFIG
+    )
+    _registrar_tempo('PUT', bucket, key, len(corpo), inicio)
+
+
+def executar_em_paralelo(tarefas):
+    """
+    Executa tarefas de E/S independentes ao mesmo tempo
+    Recebe {nome: função sem argumentos} e devolve {nome: resultado};
+    se alguma tarefa falhar, a primeira exceção (na ordem informada) é propagada
+    """
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(len(tarefas), TRANSFERENCIAS_SIMULTANEAS) or 1) as executor:
+        futuros = {nome: executor.submit(tarefa) for nome, tarefa in tarefas.items()}
+    resultados = {nome: futuro.result() for nome, futuro in futuros.items()}
+    print(f"   ⏱️  {len(tarefas)} transferência(s) concorrente(s) em {time.perf_counter() - inicio:.3f}s")
+    return resultados
@@ -5,6 +5,66 @@ variable "cidr_qualquer_ip" {
   
 }
 
+variable "formato_arquivo" {
+  description = "Formato dos arquivos nas zonas trusted e refined (parquet ou csv)"
+  type        = string
+  default     = "parquet"
+}
+
+variable "modo_processamento" {
+  description = "Modo do ETL: completo (tudo em memória), streaming (em lotes) ou incremental (só partições novas)"
+  type        = string
+  default     = "completo"
+}
+
+variable "tamanho_lote" {
+  description = "Quantidade de linhas por lote no modo streaming"
+  type        = number
+  default     = 100000
+}
+
+variable "processos_tratamento" {
+  description = "Processos da cadeia de limpeza da Lambda de tratamento: 0 = um por vCPU, 1 = sem paralelismo"
+  type        = number
+  default     = 0
+}
+
+variable "memoria_tratamento_mb" {
+  description = "Memória da Lambda de tratamento em MB; define também as vCPUs (2 a partir de 1769, até 6 com 10240)"
+  type        = number
+  default     = 512
+}
+
+variable "estrategia_juncao" {
+  description = "Junção consultas x clima na Lambda REFINED: exata, anterior ou proxima"
+  type        = string
+  default     = "anterior"
+}
+
+variable "tolerancia_juncao_min" {
+  description = "Distância máxima (minutos) entre a consulta e a leitura de clima nas junções anterior/proxima"
+  type        = number
+  default     = 120
+}
+
+variable "importacao_tardia" {
+  description = "Importa pandas/pyarrow em segundo plano nas Lambdas para reduzir o cold start"
+  type        = bool
+  default     = true
+}
+
+variable "formato_metricas" {
+  description = "Registro de métricas por etapa das Lambdas no log: json, emf (CloudWatch) ou nenhum"
+  type        = string
+  default     = "json"
+}
+
+variable "perfil_cprofile" {
+  description = "Grava um perfil do cProfile de cada invocação das Lambdas em _perfis/ no bucket de saída"
+  type        = bool
+  default     = false
+}
+
 # ========================================================================
 # Variáveis para Backup do Banco de Dados
 # ========================================================================